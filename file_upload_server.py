@@ -3,14 +3,27 @@
 """
 文件上传服务器
 功能：接收客户端文件上传，保存到指定文件夹
+      支持分块续传：init -> 按偏移 PUT 分块 -> finalize，边写边计算 SHA-256，完成后原子改名
+      内容寻址去重：文件内容按 SHA-256 只存一份（.blobs），文件名是指向它的硬链接；
+      上传前可先查询服务器是否已有该哈希，已有则直接按哈希登记文件名，不再传输数据
+      文件列表来自 SQLite 元数据索引（上传/删除时更新，后台定期与目录对账），支持分页、排序、筛选
+      下载支持 Range 断点续传与 ETag 协商缓存，文件经 wsgi.file_wrapper 流式发送，不整体读入内存
 端口：8094
 默认上传路径：/home/a214/result
 """
 
 import os
+import re
+import json
+import time
+import uuid
+import sqlite3
 import shutil
+import hashlib
+import threading
+from collections import Counter
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
@@ -19,6 +32,17 @@ UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', '/home/a214/result')
 PORT = int(os.environ.get('PORT', 8094))
 ALLOWED_EXTENSIONS = set(os.environ.get('ALLOWED_EXTENSIONS', 'zip,rar,7z,tar.gz,tgz,txt,pdf,jpg,jpeg,png,gif,docx,xlsx,pptx').split(','))
 MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 1000 * 1024 * 1024))  # 1GB
+MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 20 * 1024 * 1024 * 1024))  # 分块上传单文件上限 20GB
+STAGING_FOLDER = os.path.join(UPLOAD_FOLDER, '.uploads')   # 未完成的分块上传
+STREAM_BLOCK = 1024 * 1024                                   # 读取请求体的块大小
+BLOB_FOLDER = os.path.join(UPLOAD_FOLDER, '.blobs')         # 按 SHA-256 存放的文件内容
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+INDEX_DB = os.path.join(UPLOAD_FOLDER, '.index.db')         # 文件元数据索引
+INDEX_RESCAN_INTERVAL = int(os.environ.get('INDEX_RESCAN_INTERVAL', 10))   # 目录对账间隔（秒）
+STAGING_TTL = int(os.environ.get('STAGING_TTL', 7 * 24 * 3600))   # 分块上传暂存文件多久未更新视为放弃（秒）
+STAGING_SWEEP_INTERVAL = 3600                                      # 清理放弃的暂存文件的间隔（秒）
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
 # 创建Flask应用
 app = Flask(__name__)
@@ -36,6 +60,7 @@ if not os.path.exists(UPLOAD_FOLDER):
     except Exception as e:
         print(f"❌ 创建上传文件夹失败: {e}")
         exit(1)
+os.makedirs(STAGING_FOLDER, exist_ok=True)
 
 
 def allowed_file(filename):
@@ -44,6 +69,435 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+# ===================== 内容寻址存储 =====================
+_publish_lock = threading.Lock()    # 内容块的存入、登记、释放、清理互斥
+_pending_blobs = Counter()          # 内容块 -> 已存入但尚未登记文件名的上传数
+
+
+def blob_path(digest):
+    return os.path.join(BLOB_FOLDER, digest[:2], digest)
+
+
+def has_blob(digest):
+    return bool(SHA256_RE.match(digest or '')) and os.path.exists(blob_path(digest))
+
+
+def store_blob(tmp_path, digest):
+    """
+    把已算好哈希的临时文件存为内容块；相同内容已存在时丢弃临时文件
+    存入后记为待登记，登记完成（或失败）后调用方须调用 release_pending，期间不会被清理
+    """
+    path = blob_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _publish_lock:
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+        _pending_blobs[digest] += 1
+    return path
+
+
+def release_pending(digest):
+    with _publish_lock:
+        _pending_blobs[digest] -= 1
+        if _pending_blobs[digest] <= 0:
+            del _pending_blobs[digest]
+
+
+def _blob_unreferenced(digest):
+    """内容块没有任何文件名引用（调用方需持有 _publish_lock）"""
+    path = blob_path(digest)
+    return (digest not in _pending_blobs
+            and not file_index.references(digest)
+            and os.stat(path).st_nlink <= 1)   # 硬链接引用；复制方式登记的文件靠索引判断
+
+
+def _release_blob(digest):
+    """文件名被删除或覆盖后，若该内容块已无引用则删除（调用方需持有 _publish_lock）"""
+    if not digest or not os.path.exists(blob_path(digest)):
+        return
+    if _blob_unreferenced(digest):
+        os.remove(blob_path(digest))
+
+
+def split_ext(filename):
+    """拆分文件名与扩展名，tar.gz 视为一个扩展名；返回 (stem, '.ext')"""
+    for suffix in ('.tar.gz',) + tuple(f'.{e}' for e in ALLOWED_EXTENSIONS):
+        if filename.lower().endswith(suffix) and len(filename) > len(suffix):
+            return filename[:-len(suffix)], filename[-len(suffix):]
+    stem, dot, ext = filename.rpartition('.')
+    return (stem, dot + ext) if stem else (filename, '')
+
+
+def unique_filename(filename):
+    """同名文件已存在时生成 name_1.ext、name_2.ext ..."""
+    stem, ext = split_ext(filename)
+    index = 1
+    while os.path.exists(os.path.join(UPLOAD_FOLDER, f'{stem}_{index}{ext}')):
+        index += 1
+    return f'{stem}_{index}{ext}'
+
+
+def publish_blob(digest, filename, overwrite=False):
+    """
+    为内容块登记文件名（硬链接，不复制数据），返回最终文件名
+    同名文件内容相同时直接返回；内容不同且不覆盖时自动改名，不再静默覆盖旧文件
+    """
+    source = blob_path(digest)
+    with _publish_lock:
+        if not os.path.exists(source):
+            raise FileNotFoundError(f'内容块不存在: {digest}')
+        target = os.path.join(UPLOAD_FOLDER, filename)
+        replaced = None
+        if os.path.exists(target):
+            if os.path.samefile(target, source):
+                return filename
+            if overwrite:
+                entry = file_index.get(filename)
+                replaced = entry and entry.get('sha256')
+            else:
+                filename = unique_filename(filename)
+                target = os.path.join(UPLOAD_FOLDER, filename)
+        tmp_link = os.path.join(STAGING_FOLDER, f'{uuid.uuid4().hex}.link')
+        try:
+            os.link(source, tmp_link)
+        except OSError:
+            shutil.copyfile(source, tmp_link)   # 文件系统不支持硬链接时退化为复制
+        os.replace(tmp_link, target)
+        file_index.upsert(filename, digest)
+        if replaced and replaced != digest:
+            _release_blob(replaced)
+    return filename
+
+
+def sweep_blobs():
+    """
+    清理没有任何文件名引用的内容块（异常退出等遗留），返回删除数量
+    待登记的内容块、索引中仍有文件引用的内容块、仍有硬链接的内容块都会保留
+    """
+    removed = 0
+    with _publish_lock:
+        for prefix in os.scandir(BLOB_FOLDER):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if SHA256_RE.match(entry.name) and _blob_unreferenced(entry.name):
+                    os.remove(entry.path)
+                    removed += 1
+    return removed
+
+
+def save_stream(stream):
+    """把上传流边写边算哈希地存入内容块，返回 (digest, size)"""
+    hasher = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(STAGING_FOLDER, f'{uuid.uuid4().hex}.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            for block in iter(lambda: stream.read(STREAM_BLOCK), b''):
+                f.write(block)
+                hasher.update(block)
+                size += len(block)
+        digest = hasher.hexdigest()
+        store_blob(tmp_path, digest)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest, size
+
+
+# ===================== 文件元数据索引 =====================
+class FileIndex:
+    """
+    上传目录的元数据索引（文件名、大小、修改时间、扩展名、SHA-256）
+    上传/删除时同步更新；后台线程在目录有变化时与磁盘对账，覆盖外部直接拷入/删除的文件
+    """
+
+    SORT_COLUMNS = {'mtime': 'mtime', 'size': 'size', 'filename': 'filename'}
+
+    def __init__(self, folder, db_path):
+        self.folder = folder
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._watcher = None
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    filename TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    ext TEXT NOT NULL,
+                    sha256 TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_files_mtime ON files (mtime)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_files_size ON files (size)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_files_ext ON files (ext, mtime)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files (sha256)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _ext(filename):
+        return split_ext(filename)[1].lstrip('.').lower()
+
+    def upsert(self, filename, sha256=None):
+        st = os.stat(os.path.join(self.folder, filename))
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (filename, size, mtime, ext, sha256) VALUES (?, ?, ?, ?, ?)",
+                (filename, st.st_size, st.st_mtime, self._ext(filename), sha256)
+            )
+
+    def remove(self, filename):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE filename = ?", (filename,))
+
+    def references(self, sha256):
+        """是否还有文件指向该内容"""
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM files WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone() is not None
+
+    def get(self, filename):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM files WHERE filename = ?", (filename,)).fetchone()
+        return dict(row) if row else None
+
+    def rescan(self):
+        """与目录对账：新增/变化的文件写入索引（哈希置空），已不存在的移除，返回变化条数"""
+        on_disk = {}
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and not entry.name.startswith('.'):
+                st = entry.stat()
+                on_disk[entry.name] = (st.st_size, st.st_mtime)
+        with self._lock, self._connect() as conn:
+            indexed = {row[0]: (row[1], row[2]) for row in conn.execute("SELECT filename, size, mtime FROM files")}
+            changed = [(name, size, mtime, self._ext(name)) for name, (size, mtime) in on_disk.items()
+                       if indexed.get(name) != (size, mtime)]
+            removed = [(name,) for name in indexed.keys() - on_disk.keys()]
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (filename, size, mtime, ext, sha256) VALUES (?, ?, ?, ?, NULL)",
+                changed
+            )
+            conn.executemany("DELETE FROM files WHERE filename = ?", removed)
+        return len(changed) + len(removed)
+
+    def query(self, page=1, page_size=DEFAULT_PAGE_SIZE, sort='mtime', order='desc', exts=None,
+              since=None, until=None):
+        """分页查询，返回 (当前页文件列表, 总数)"""
+        where, params = [], []
+        if exts:
+            where.append(f"ext IN ({', '.join('?' * len(exts))})")
+            params.extend(exts)
+        if since is not None:
+            where.append("mtime >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("mtime < ?")
+            params.append(until)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ''
+        column = self.SORT_COLUMNS.get(sort, 'mtime')
+        direction = 'ASC' if order == 'asc' else 'DESC'
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM files {where_sql}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT filename, size, mtime, sha256 FROM files {where_sql} "
+                f"ORDER BY {column} {direction}, filename LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size]
+            ).fetchall()
+        return [dict(row) for row in rows], total
+
+    def _watch(self, interval):
+        while True:
+            try:
+                dir_mtime = os.stat(self.folder).st_mtime
+                if dir_mtime != self._dir_mtime:
+                    self._dir_mtime = dir_mtime
+                    changed = self.rescan()
+                    if changed:
+                        print(f'ℹ️  文件索引已与目录对账，更新 {changed} 条')
+            except Exception as e:
+                print(f'❌ 文件索引对账失败: {e}')
+            time.sleep(interval)
+
+    def start_watcher(self, interval=INDEX_RESCAN_INTERVAL):
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+            self._watcher.start()
+        return self
+
+
+def parse_time_arg(value):
+    """时间筛选参数：Unix 时间戳或 ISO 日期（如 2025-10-01）"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+os.makedirs(BLOB_FOLDER, exist_ok=True)
+file_index = FileIndex(UPLOAD_FOLDER, INDEX_DB)
+file_index.rescan()
+file_index.start_watcher()
+sweep_blobs()
+
+
+# ===================== 分块续传 =====================
+class UploadSession:
+    """
+    一次分块上传：数据追加写入 <upload_id>.part，同时增量计算 SHA-256，
+    元数据保存在 <upload_id>.json，服务重启后可继续
+    """
+
+    def __init__(self, upload_id, filename, size):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size                  # 客户端声明的总大小，未知时为 None
+        self.offset = 0
+        self.hasher = hashlib.sha256()
+        self.lock = threading.Lock()
+
+    @property
+    def part_path(self):
+        return os.path.join(STAGING_FOLDER, f'{self.upload_id}.part')
+
+    @property
+    def meta_path(self):
+        return os.path.join(STAGING_FOLDER, f'{self.upload_id}.json')
+
+    def save_meta(self):
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'filename': self.filename, 'size': self.size}, f, ensure_ascii=False)
+
+    @classmethod
+    def restore(cls, upload_id):
+        """服务重启后从暂存目录恢复：只在这里重新读一遍已收到的数据以恢复哈希状态"""
+        session = cls(upload_id, None, None)
+        with open(session.meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        session.filename, session.size = meta['filename'], meta.get('size')
+        with open(session.part_path, 'rb') as f:
+            for block in iter(lambda: f.read(STREAM_BLOCK), b''):
+                session.hasher.update(block)
+                session.offset += len(block)
+        return session
+
+    def status(self):
+        return {'upload_id': self.upload_id, 'filename': self.filename, 'size': self.size, 'offset': self.offset}
+
+    def append(self, stream):
+        """
+        把请求体流式追加到分块文件，边写边计算哈希，返回写入字节数
+        连接中途断开时已写入的部分保留，偏移随之前进，客户端从新偏移续传
+        """
+        written = 0
+        with open(self.part_path, 'ab') as f:
+            for block in iter(lambda: stream.read(STREAM_BLOCK), b''):
+                if self.size is not None and self.offset + len(block) > self.size:
+                    raise ValueError('写入数据超过声明的文件大小')
+                f.write(block)
+                f.flush()
+                self.hasher.update(block)
+                self.offset += len(block)
+                written += len(block)
+        return written
+
+    def discard(self):
+        for path in (self.part_path, self.meta_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+_upload_sessions = {}
+_upload_sessions_lock = threading.Lock()
+
+
+def get_upload_session(upload_id):
+    """
+    按 upload_id 取上传会话，内存中没有时尝试从暂存目录恢复
+    恢复要重读整个分块文件，在全局锁外进行，不阻塞其它上传；并发恢复同一会话时保留先登记的一份
+    """
+    upload_id = secure_filename(upload_id)
+    with _upload_sessions_lock:
+        session = _upload_sessions.get(upload_id)
+    if session is not None or not os.path.exists(os.path.join(STAGING_FOLDER, f'{upload_id}.json')):
+        return session
+    try:
+        restored = UploadSession.restore(upload_id)
+    except FileNotFoundError:
+        return None   # 恢复过程中会话已完成或被清理
+    with _upload_sessions_lock:
+        return _upload_sessions.setdefault(upload_id, restored)
+
+
+def expire_staging(ttl=STAGING_TTL):
+    """
+    清理超过 ttl 秒未更新的暂存文件（放弃的分块上传、异常退出遗留的临时文件），返回删除数量
+    分块上传按会话的 .part/.json 中最近的修改时间判断；正在写入的会话跳过
+    """
+    cutoff = time.time() - ttl
+    sessions = {}   # upload_id -> [(路径, 修改时间)]
+    stale = []
+    for entry in os.scandir(STAGING_FOLDER):
+        try:
+            if not entry.is_file():
+                continue
+            mtime = entry.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        upload_id, ext = os.path.splitext(entry.name)
+        if ext in ('.part', '.json'):
+            sessions.setdefault(upload_id, []).append((entry.path, mtime))
+        elif mtime < cutoff:
+            stale.append(entry.path)
+
+    for upload_id, files in sessions.items():
+        if max(mtime for _, mtime in files) >= cutoff:
+            continue
+        with _upload_sessions_lock:
+            session = _upload_sessions.get(upload_id)
+            if session is not None:
+                if not session.lock.acquire(blocking=False):
+                    continue
+                _upload_sessions.pop(upload_id, None)
+                session.lock.release()
+        stale.extend(path for path, _ in files)
+
+    removed = 0
+    for path in stale:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _staging_janitor(interval=STAGING_SWEEP_INTERVAL):
+    while True:
+        try:
+            removed = expire_staging()
+            if removed:
+                print(f'ℹ️  已清理 {removed} 个过期的分块上传暂存文件')
+        except Exception as e:
+            print(f'❌ 清理分块上传暂存文件失败: {e}')
+        time.sleep(interval)
+
+
+threading.Thread(target=_staging_janitor, daemon=True).start()
+
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """处理文件上传请求"""
@@ -76,18 +530,23 @@ def upload_file():
 
         # 确保文件名安全
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
 
-        # 保存文件
-        file.save(file_path)
-        print(f'✅ 文件上传成功: {filename}，保存路径: {file_path}，大小: {os.path.getsize(file_path)} bytes')
+        # 保存文件：边写边算哈希存入内容块，再登记文件名
+        digest, size = save_stream(file.stream)
+        try:
+            filename = publish_blob(digest, filename, overwrite=request.args.get('overwrite') == '1')
+        finally:
+            release_pending(digest)
+        file_path = os.path.join(UPLOAD_FOLDER, filename)
+        print(f'✅ 文件上传成功: {filename}，保存路径: {file_path}，大小: {size} bytes')
 
         return jsonify({
             'success': True,
             'message': '文件上传成功',
             'filename': filename,
             'file_path': file_path,
-            'size': os.path.getsize(file_path),
+            'size': size,
+            'sha256': digest,
             'upload_folder': UPLOAD_FOLDER
         }), 200
 
@@ -99,6 +558,150 @@ def upload_file():
         }), 500
 
 
+@app.route('/blobs/<digest>', methods=['GET', 'HEAD'])
+def blob_exists(digest):
+    """上传前预检：服务器是否已有该 SHA-256 的内容（有则可用 /upload/by-hash 直接登记）"""
+    digest = digest.lower()
+    if not SHA256_RE.match(digest):
+        return jsonify({'success': False, 'message': '无效的 SHA-256'}), 400
+    if not has_blob(digest):
+        return jsonify({'success': True, 'exists': False, 'sha256': digest}), 404
+    return jsonify({
+        'success': True,
+        'exists': True,
+        'sha256': digest,
+        'size': os.path.getsize(blob_path(digest))
+    }), 200
+
+
+@app.route('/upload/by-hash', methods=['POST'])
+def upload_by_hash():
+    """按哈希登记文件名：服务器已有相同内容时无需再传输数据"""
+    data = request.get_json(silent=True) or {}
+    digest = (data.get('sha256') or '').lower()
+    filename = secure_filename(data.get('filename') or '')
+    if not filename or not allowed_file(filename):
+        return jsonify({
+            'success': False,
+            'message': f'不允许的文件类型，仅允许: {ALLOWED_EXTENSIONS}'
+        }), 400
+    if not has_blob(digest):
+        return jsonify({'success': False, 'message': '服务器没有该内容，请上传文件', 'sha256': digest}), 404
+
+    try:
+        filename = publish_blob(digest, filename, overwrite=bool(data.get('overwrite')))
+    except FileNotFoundError:
+        # 预检之后内容块恰好被删除
+        return jsonify({'success': False, 'message': '服务器没有该内容，请上传文件', 'sha256': digest}), 404
+    print(f'✅ 秒传成功: {filename}，SHA-256: {digest}')
+    return jsonify({
+        'success': True,
+        'message': '文件上传成功（服务器已有相同内容）',
+        'filename': filename,
+        'file_path': os.path.join(UPLOAD_FOLDER, filename),
+        'size': os.path.getsize(blob_path(digest)),
+        'sha256': digest,
+        'upload_folder': UPLOAD_FOLDER
+    }), 200
+
+
+@app.route('/upload/init', methods=['POST'])
+def upload_init():
+    """开始一次分块上传，返回 upload_id"""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+    if not filename or not allowed_file(filename):
+        return jsonify({
+            'success': False,
+            'message': f'不允许的文件类型，仅允许: {ALLOWED_EXTENSIONS}'
+        }), 400
+    if size is not None and (not isinstance(size, int) or size < 0 or size > MAX_UPLOAD_SIZE):
+        return jsonify({
+            'success': False,
+            'message': f'文件大小无效或超过上限 {MAX_UPLOAD_SIZE} bytes'
+        }), 400
+
+    session = UploadSession(uuid.uuid4().hex, filename, size)
+    open(session.part_path, 'wb').close()
+    session.save_meta()
+    with _upload_sessions_lock:
+        _upload_sessions[session.upload_id] = session
+    print(f'ℹ️  开始分块上传: {filename}，upload_id: {session.upload_id}，大小: {size}')
+    return jsonify(dict(session.status(), success=True)), 200
+
+
+@app.route('/upload/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """查询已接收的字节数，客户端从该偏移继续上传"""
+    session = get_upload_session(upload_id)
+    if session is None:
+        return jsonify({'success': False, 'message': '上传会话不存在'}), 404
+    return jsonify(dict(session.status(), success=True)), 200
+
+
+@app.route('/upload/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """
+    上传一个分块：请求体为原始字节，offset 参数必须等于服务器已接收的字节数
+    偏移不一致时返回 409 和当前偏移，客户端据此续传
+    """
+    session = get_upload_session(upload_id)
+    if session is None:
+        return jsonify({'success': False, 'message': '上传会话不存在'}), 404
+    offset = request.args.get('offset', type=int)
+
+    with session.lock:
+        if offset != session.offset:
+            return jsonify(dict(session.status(), success=False, message='偏移不一致，请从 offset 处续传')), 409
+        try:
+            session.append(request.stream)
+        except ValueError as e:
+            return jsonify(dict(session.status(), success=False, message=str(e))), 400
+        return jsonify(dict(session.status(), success=True)), 200
+
+
+@app.route('/upload/<upload_id>/finalize', methods=['POST'])
+def upload_finalize(upload_id):
+    """完成分块上传：校验大小和哈希（可选），原子改名为正式文件"""
+    session = get_upload_session(upload_id)
+    if session is None:
+        return jsonify({'success': False, 'message': '上传会话不存在'}), 404
+    data = request.get_json(silent=True) or {}
+    expected_hash = (data.get('sha256') or '').lower()
+
+    with session.lock:
+        if session.size is not None and session.offset != session.size:
+            return jsonify(dict(session.status(), success=False, message='文件尚未上传完整')), 409
+        digest = session.hasher.hexdigest()
+        if expected_hash and expected_hash != digest:
+            session.discard()
+            with _upload_sessions_lock:
+                _upload_sessions.pop(session.upload_id, None)
+            return jsonify({'success': False, 'message': '文件校验失败，请重新上传', 'sha256': digest}), 422
+
+        store_blob(session.part_path, digest)
+        try:
+            filename = publish_blob(digest, session.filename, overwrite=bool(data.get('overwrite')))
+        finally:
+            release_pending(digest)
+        file_path = os.path.join(UPLOAD_FOLDER, filename)
+        session.discard()
+        with _upload_sessions_lock:
+            _upload_sessions.pop(session.upload_id, None)
+
+    print(f'✅ 分块上传完成: {filename}，大小: {session.offset} bytes，SHA-256: {digest}')
+    return jsonify({
+        'success': True,
+        'message': '文件上传成功',
+        'filename': filename,
+        'file_path': file_path,
+        'size': session.offset,
+        'sha256': digest,
+        'upload_folder': UPLOAD_FOLDER
+    }), 200
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """健康检查接口"""
@@ -116,23 +719,30 @@ def health_check():
 
 @app.route('/files', methods=['GET'])
 def list_files():
-    """列出上传文件夹中的文件"""
+    """
+    分页列出上传文件夹中的文件（读元数据索引，不遍历目录）
+    参数：page、page_size、sort=mtime|size|filename、order=asc|desc、
+          ext=zip,pdf、since/until（时间戳或 ISO 日期，按修改时间筛选）
+    """
     try:
-        files = []
-        for filename in os.listdir(UPLOAD_FOLDER):
-            file_path = os.path.join(UPLOAD_FOLDER, filename)
-            if os.path.isfile(file_path):
-                files.append({
-                    'filename': filename,
-                    'size': os.path.getsize(file_path),
-                    'mtime': os.path.getmtime(file_path)
-                })
-        
-        print(f'ℹ️  列出文件成功，共 {len(files)} 个文件')
+        page = max(1, request.args.get('page', 1, type=int))
+        page_size = min(max(1, request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int)), MAX_PAGE_SIZE)
+        exts = [e.strip().lower().lstrip('.') for e in request.args.get('ext', '').split(',') if e.strip()]
+        try:
+            since = parse_time_arg(request.args.get('since'))
+            until = parse_time_arg(request.args.get('until'))
+        except ValueError:
+            return jsonify({'success': False, 'message': '时间参数格式错误'}), 400
+
+        files, total = file_index.query(page=page, page_size=page_size, sort=request.args.get('sort', 'mtime'),
+                                        order=request.args.get('order', 'desc'), exts=exts,
+                                        since=since, until=until)
         return jsonify({
             'success': True,
             'upload_folder': UPLOAD_FOLDER,
-            'file_count': len(files),
+            'file_count': total,
+            'page': page,
+            'page_size': page_size,
             'files': files
         }), 200
     except Exception as e:
@@ -143,13 +753,47 @@ def list_files():
         }), 500
 
 
+@app.route('/download/<filename>', methods=['GET', 'HEAD'])
+def download_file(filename):
+    """
+    下载文件
+    支持 Range（断点续传/分段下载，返回 206）、If-None-Match / If-Modified-Since（未变化返回 304）
+    已知内容哈希时以 SHA-256 作为强 ETag，同一内容不论文件名都能命中客户端缓存
+    文件对象交给 WSGI 服务器的 file_wrapper 发送（gunicorn 等会走 sendfile 零拷贝）
+    参数：attachment=1 时以附件形式下载
+    """
+    filename = secure_filename(filename)
+    file_path = os.path.join(UPLOAD_FOLDER, filename)
+    if not filename or not os.path.isfile(file_path):
+        return jsonify({'success': False, 'message': '文件不存在'}), 404
+
+    entry = file_index.get(filename)
+    etag = entry['sha256'] if entry and entry.get('sha256') else True
+    response = send_file(
+        file_path,
+        as_attachment=request.args.get('attachment') in ('1', 'true'),
+        download_name=filename,
+        conditional=True,
+        etag=etag,
+        max_age=0,
+    )
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+
 @app.route('/delete/<filename>', methods=['DELETE'])
 def delete_file(filename):
     """删除指定文件"""
     try:
-        file_path = os.path.join(UPLOAD_FOLDER, secure_filename(filename))
+        filename = secure_filename(filename)
+        file_path = os.path.join(UPLOAD_FOLDER, filename)
         if os.path.exists(file_path):
-            os.remove(file_path)
+            with _publish_lock:
+                entry = file_index.get(filename)
+                os.remove(file_path)
+                file_index.remove(filename)
+                # 只释放该文件引用的内容块，其他上传中的内容块不受影响
+                _release_blob(entry and entry.get('sha256'))
             print(f'✅ 文件删除成功: {filename}')
             return jsonify({
                 'success': True,
@@ -182,8 +826,14 @@ if __name__ == '__main__':
     print(f"🚀 服务器启动成功！")
     print(f"📌 API端点:")
     print(f"   POST   http://0.0.0.0:{PORT}/upload       # 文件上传")
+    print(f"   POST   http://0.0.0.0:{PORT}/upload/init  # 分块上传：开始")
+    print(f"   PUT    http://0.0.0.0:{PORT}/upload/{'{id}'}?offset=N  # 分块上传：写入分块")
+    print(f"   POST   http://0.0.0.0:{PORT}/upload/{'{id}'}/finalize  # 分块上传：完成")
+    print(f"   GET    http://0.0.0.0:{PORT}/blobs/{'{sha256}'}  # 查询服务器是否已有该内容")
+    print(f"   POST   http://0.0.0.0:{PORT}/upload/by-hash  # 按哈希登记文件（秒传）")
     print(f"   GET    http://0.0.0.0:{PORT}/health      # 健康检查")
-    print(f"   GET    http://0.0.0.0:{PORT}/files       # 列出文件")
+    print(f"   GET    http://0.0.0.0:{PORT}/files?page=1&page_size=100&sort=mtime&order=desc&ext=zip&since=2025-10-01  # 分页列出文件")
+    print(f"   GET    http://0.0.0.0:{PORT}/download/{'{filename}'}  # 下载文件（支持 Range / ETag）")
     print(f"   DELETE http://0.0.0.0:{PORT}/delete/{'{filename}'}  # 删除文件")
     print("=" * 60)
     print("按 Ctrl+C 停止服务器")
@@ -1,3 +1,9 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
 from pathlib import Path
 
 class Global_Config:
@@ -9,16 +15,26 @@ class Global_Config:
     #data
     rule_path = ProjectRoot/'data'/'rules'
     test_rule = ProjectRoot/'data'/'rules'/'长动.json'
+    active_rule = ProjectRoot/'data'/'rules'/'final_rule.json'   # /api/set_rule 选定的规则，评分时优先使用
+    rule_csv_path = str(ProjectRoot/'data'/'rules'/'rule.csv')      # 规则编辑器自动保存的连线表
+    rule_json_path = str(ProjectRoot/'data'/'rules'/'rule1.json')   # 规则编辑器自动导出的规则
     label_csv = str(ProjectRoot/'data'/'label.csv')
     default_result = ProjectRoot / 'data' / 'result' /"result.json"
     new_result_json = ProjectRoot / 'data' / 'result' / 'new'/ "result.json"
     old_result_json = ProjectRoot / 'data' / 'result' / 'old'/ "result.json"
+    wiring_history_spill = ProjectRoot / 'data' / 'result' / 'wiring_history.jsonl'   # 被挤出内存的接线记录
+    question_bank_db = ProjectRoot / 'data' / 'question_bank.db'   # 预生成题库
+    student_roster_db = ProjectRoot / 'data' / 'student_roster.db'   # 教师端学生名册
+    score_uplink_spool = ProjectRoot / 'data' / 'result' / 'score_uplink_spool.jsonl'   # 教师端不可达时暂存的成绩事件
     #weights
     Hand_and_switch = ProjectRoot/'weights'/'hand_and_switch.pt'
 
     # rule server
     rule_server_ip = '127.0.0.1'  # 默认教师端IP
     rule_server_port = 8000       # 默认端口号
+    teacher_server_port = 8090    # 教师端 Web 服务端口（成绩上报）
+    # 服务间内部接口（如登录服务的 /api/invalidate_credentials）的共享令牌；为空时只接受本机请求
+    internal_api_token = os.getenv('INTERNAL_API_TOKEN', '')
 
     switch_status = True
     error_wiring_count = 0
@@ -36,7 +52,10 @@ class Global_Config:
     #撤回触点对，列表形式，例如:[{'pair': ['FU1-1', 'QS1-1'], 'score': 0.0}, {'pair': ['SB3-3/NO', 'SB3-4/NO'], 'score': 0.0}, {'pair': ['SB3-3/NO', 'XT2-5'], 'score': 0.0}, {'pair': ['SB3-4/NO', 'XT2-5'], 'score': 0.0}]
     undo_pairs = []
 
-    wiring_results = []           # 接线结果历史
+    wiring_history_size = 500     # 内存中保留的接线记录条数
+    wiring_results = deque(maxlen=wiring_history_size)   # 接线结果历史（环形缓冲区）
+    wiring_seq = 0                # 接线记录序号，单调递增（重置分数时归零）
+    wiring_epoch = time.time_ns() // 1_000_000   # 接线记录所属会话：进程启动和重置分数时更换，客户端据此识别序号归零
     score_history = []            # 分数历史记录
     is_first_score = False
 
@@ -46,12 +65,25 @@ class Login_Session:
     account_name = ''
     sno = ''
 
+_wiring_lock = threading.Lock()
+_spill_lock = threading.Lock()   # 落盘写入互斥；在 _wiring_lock 内取得，写盘时已释放 _wiring_lock
+
 # 分数管理函数
 def reset_global_score():
     """重置全局分数 - 每次启动程序时调用"""
     Global_Config.total_score = 0
     Global_Config.current_session_score = 0
-    Global_Config.wiring_results = []
+    with _wiring_lock, _spill_lock:
+        Global_Config.wiring_results.clear()
+        Global_Config.wiring_seq = 0
+        Global_Config.wiring_epoch = time.time_ns() // 1_000_000
+        # 落盘的记录属于上一个会话，序号会与新会话重复，一并清空
+        try:
+            Path(Global_Config.wiring_history_spill).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"清空接线记录落盘文件失败: {e}")
     Global_Config.score_history = []
     print("全局分数已重置为0")
 
@@ -70,21 +102,86 @@ def get_current_session_score():
     """获取当前会话得分"""
     return Global_Config.current_session_score
 
+def _spill_wiring_result(result):
+    """把被挤出环形缓冲区的记录追加到磁盘（记录带所属会话 epoch，调用方需持有 _spill_lock）"""
+    try:
+        with open(Global_Config.wiring_history_spill, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result, ensure_ascii=False) + '\n')
+    except OSError as e:
+        print(f"接线记录落盘失败: {e}")
+
 def add_wiring_result(end1, end2, score):
-    """添加接线结果到全局记录"""
+    """添加接线结果到全局记录，超出容量的最旧记录落盘"""
     import time
-    result = {
-        'end1': end1,
-        'end2': end2,
-        'score': score,
-        'timestamp': time.time()
-    }
-    Global_Config.wiring_results.append(result)
+    evicted = None
+    with _wiring_lock:
+        Global_Config.wiring_seq += 1
+        result = {
+            'seq': Global_Config.wiring_seq,
+            'end1': end1,
+            'end2': end2,
+            'score': score,
+            'timestamp': time.time()
+        }
+        history = Global_Config.wiring_results
+        if history.maxlen is not None and len(history) == history.maxlen:
+            evicted = dict(history[0], epoch=Global_Config.wiring_epoch)
+            # 先占住落盘锁再放开 _wiring_lock：读落盘记录的请求会等这条写完，普通轮询不等磁盘
+            _spill_lock.acquire()
+        history.append(result)
+    if evicted is not None:
+        try:
+            _spill_wiring_result(evicted)
+        finally:
+            _spill_lock.release()
     return result
 
 def get_wiring_results():
-    """获取所有接线结果"""
-    return Global_Config.wiring_results.copy()
+    """获取内存中的所有接线结果"""
+    with _wiring_lock:
+        return list(Global_Config.wiring_results)
+
+def _read_spilled_results(epoch, since, before, limit):
+    """从落盘文件读取本会话（epoch）中 since < seq < before 的最多 limit 条记录，其它会话遗留的记录跳过"""
+    results = []
+    with _spill_lock:
+        try:
+            f = open(Global_Config.wiring_history_spill, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return results
+        with f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                if result.pop('epoch', None) == epoch and since < result.get('seq', 0) < before:
+                    results.append(result)
+                    if len(results) >= limit:
+                        break
+    return results
+
+def get_wiring_results_since(since=0, limit=100, epoch=None):
+    """
+    按序号游标获取接线结果：返回 seq > since 的最多 limit 条记录
+    - epoch 与当前会话不同或 since 超过最新序号时，说明分数已重置、序号已归零，从头返回
+    - 已挤出内存（早于 oldest_seq）的记录从落盘文件读取
+    返回 (results, oldest_seq, latest_seq, epoch)，oldest_seq 为内存中最早记录的序号
+    """
+    limit = max(0, limit)
+    with _wiring_lock:
+        history = Global_Config.wiring_results
+        latest_seq = Global_Config.wiring_seq
+        current_epoch = Global_Config.wiring_epoch
+        if since > latest_seq or (epoch is not None and epoch != current_epoch):
+            since = 0
+        oldest_seq = history[0]['seq'] if history else latest_seq + 1
+        # 序号连续，可直接换算为缓冲区下标
+        start = max(0, since - oldest_seq + 1)
+        results = list(islice(history, start, start + limit))
+    if since < oldest_seq - 1 and limit:
+        results = (_read_spilled_results(current_epoch, since, oldest_seq, limit) + results)[:limit]
+    return results, oldest_seq, latest_seq, current_epoch
 
 def save_session_to_history():
     """保存当前会话到历史记录"""
@@ -92,7 +189,7 @@ def save_session_to_history():
     if Global_Config.current_session_score > 0:
         session_record = {
             'score': Global_Config.current_session_score,
-            'wiring_results': Global_Config.wiring_results.copy(),
+            'wiring_results': get_wiring_results(),
             'timestamp': time.time()
         }
         Global_Config.score_history.append(session_record)
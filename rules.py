@@ -2,6 +2,8 @@ import sys
 import csv
 import json
 import os
+import threading
+import time
 
 
 # 并查集算法用于识别相连的触点组
@@ -48,11 +50,13 @@ from PyQt5.QtWidgets import (
     QMenu, QAction, QPushButton, QVBoxLayout, QWidget, QLabel, QMessageBox
 )
 from PyQt5.QtGui import QPen, QBrush, QColor, QPainter, QFont
-from PyQt5.QtCore import Qt, QPointF, QTimer
+from PyQt5.QtCore import Qt, QPointF
 from global_config import Global_Config
 
 CONFIG_FILE = "component_config.json"
 RULE_FILE = Global_Config.rule_csv_path  # 使用全局变量
+RULE_JSON_FILE = Global_Config.rule_json_path
+RULE_AUTOSAVE_DELAY = 0.5  # 最后一次编辑后多久落盘（秒），期间的连续编辑合并为一次写入
 
 
 def load_component_config():
@@ -67,19 +71,34 @@ def save_component_config(config):
         json.dump(config, f, ensure_ascii=False, indent=2)
 
 
-def save_rules_to_csv(wires):
-    with open(RULE_FILE, "w", newline='', encoding="utf-8") as f:
+def wire_rows(wires):
+    """导线快照：[(起点, 终点, 分值)]，可交给后台线程使用"""
+    return [(wire.start_item.name, wire.end_item.name, wire.score) for wire in wires]
+
+
+def _replace_atomically(filename, write):
+    """先写同目录临时文件再替换，读取方不会看到写了一半的文件"""
+    directory = os.path.dirname(os.path.abspath(filename))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{filename}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", newline='', encoding="utf-8") as f:
+        write(f)
+    os.replace(tmp_path, filename)
+
+
+def write_rules_csv(rows, filename):
+    def write(f):
         writer = csv.writer(f)
         writer.writerow(["起点", "终点", "分值"])
-        for wire in wires:
-            writer.writerow([wire.start_item.name, wire.end_item.name, wire.score])
+        writer.writerows(rows)
+    _replace_atomically(filename, write)
 
 
-def export_rules_to_json(wires, filename):
+def write_rules_json(rows, filename):
     # 使用并查集识别相连的触点组
     uf = UnionFind()
-    for wire in wires:
-        uf.union(wire.start_item.name, wire.end_item.name, wire.score)
+    for start, end, score in rows:
+        uf.union(start, end, score)
 
     # 获取合并后的触点组和对应的分值
     groups, scores = uf.get_groups()
@@ -96,9 +115,111 @@ def export_rules_to_json(wires, filename):
             })
             rule_id += 1
 
-    # 写入JSON文件
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(rules, f, ensure_ascii=False, indent=2)
+    _replace_atomically(filename, lambda f: json.dump(rules, f, ensure_ascii=False, indent=2))
+
+
+def save_rules_to_csv(wires):
+    write_rules_csv(wire_rows(wires), RULE_FILE)
+
+
+def export_rules_to_json(wires, filename):
+    write_rules_json(wire_rows(wires), filename)
+
+
+def compile_rule_pack(filename):
+    """
+    把规则JSON编译为规则包（.rpk），失败不影响JSON本身
+    编译需要 numpy 和读取标签表，只在自动保存线程中调用，按需导入
+    """
+    try:
+        script_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'script')
+        if script_dir not in sys.path:
+            sys.path.append(script_dir)
+        from rule_pack import compile_rule_file
+        compile_rule_file(filename, print_console=False)
+    except Exception as e:
+        print(f"⚠️ 规则包编译失败: {e}")
+
+
+class RuleAutosaver:
+    """
+    规则自动保存
+    界面线程只记录导线快照，后台线程在编辑停止 delay 秒后写一次 CSV（需要时再写 JSON 并编译规则包），
+    连续的连线、删线、改分值合并为一次写入，界面线程不再做文件 IO
+    """
+
+    def __init__(self, csv_path=RULE_FILE, json_path=RULE_JSON_FILE, delay=RULE_AUTOSAVE_DELAY):
+        self.csv_path = csv_path
+        self.json_path = json_path
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._rows = None          # 待写入的快照，None 表示没有待保存的修改
+        self._export_json = False
+        self._compile = set()      # 待编译规则包的 JSON 文件
+        self._due = 0.0
+        self._thread = None
+
+    def schedule(self, wires, export_json=False):
+        """记录最新快照并推迟落盘时间；export_json 在本轮写入前一直保留"""
+        rows = wire_rows(wires)
+        with self._cond:
+            self._rows = rows
+            self._export_json = self._export_json or export_json
+            self._due = time.monotonic() + self.delay
+            self._ensure_thread()
+            self._cond.notify()
+
+    def request_compile(self, json_path):
+        """在后台线程为已写出的规则JSON编译规则包（手动导出时使用）"""
+        with self._cond:
+            self._compile.add(json_path)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def _ensure_thread(self):
+        # 调用方需持有 _cond
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _take(self):
+        rows, export_json, compile_targets = self._rows, self._export_json, self._compile
+        self._rows, self._export_json, self._compile = None, False, set()
+        return rows, export_json, compile_targets
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._rows is None and not self._compile:
+                    self._cond.wait()
+                # 等到最后一次修改后 delay 秒仍无新修改
+                while self._rows is not None and self._due > time.monotonic():
+                    self._cond.wait(self._due - time.monotonic())
+            self._write_pending()
+
+    def _write_pending(self):
+        """
+        取出快照并写入，整个过程持有 _write_lock：
+        先取出的快照一定先写完，flush 也会等正在进行的写入结束后再返回
+        """
+        with self._write_lock:
+            with self._cond:
+                rows, export_json, compile_targets = self._take()
+            if rows is not None:
+                try:
+                    write_rules_csv(rows, self.csv_path)
+                    if export_json:
+                        write_rules_json(rows, self.json_path)
+                        compile_targets.add(self.json_path)
+                except Exception as e:
+                    print(f"❌ 规则自动保存失败: {e}")
+            for json_path in compile_targets:
+                compile_rule_pack(json_path)
+
+    def flush(self):
+        """立即写入尚未保存的修改（关闭窗口前调用），返回时所有修改都已落盘"""
+        self._write_pending()
 
 
 class ContactItem(QGraphicsEllipseItem):
@@ -198,12 +319,9 @@ class WireItem(QGraphicsLineItem):
                     self.scene_ref.removeItem(self.text)
                     self.text = None
 
-            # 更新规则文件
+            # 更新规则文件（设置了分值时同时更新JSON规则文件）
             if self.scene_ref:
-                save_rules_to_csv(self.scene_ref.wires)
-                # 如果设置了分值，更新JSON规则文件
-                if score != 0:
-                    self.scene_ref.export_current_rules_to_json()
+                self.scene_ref.schedule_save(export_json=score != 0)
 
     def delete_self(self):
         scene = self.scene()
@@ -224,6 +342,8 @@ class ComponentItem(QGraphicsRectItem):
         self.setBrush(QBrush(QColor(245, 245, 250)))
         self.setFlag(QGraphicsRectItem.ItemIsMovable)
         self.setFlag(QGraphicsRectItem.ItemIsSelectable)
+        # 位置变化时发出 itemChange 通知，用于只刷新与本元件相连的导线
+        self.setFlag(QGraphicsRectItem.ItemSendsGeometryChanges)
         self.comp_id = comp_id
         self.config = config
         self.name = config.get(comp_id, {}).get('name', name)
@@ -240,6 +360,13 @@ class ComponentItem(QGraphicsRectItem):
             contact = ContactItem(w - 20, cy, contact_name, self, comp_id, cid, config)
             self.contacts.append(contact)
 
+    def itemChange(self, change, value):
+        if change == QGraphicsRectItem.ItemPositionHasChanged:
+            scene = self.scene()
+            if scene is not None and hasattr(scene, 'update_wires_of'):
+                scene.update_wires_of(self)
+        return super().itemChange(change, value)
+
     def mouseDoubleClickEvent(self, event):
         new_name, ok = QInputDialog.getText(None, "修改元件名称", "输入新名称：", text=self.name)
         if ok and new_name:
@@ -258,12 +385,11 @@ class PanelScene(QGraphicsScene):
         self.setSceneRect(0, 0, 1800, 1200)
         self.contacts = []
         self.wires = []
+        self.contact_wires = {}  # 触点 -> 连到该触点的导线，元件移动时只刷新这些导线
         self.temp_start = None
         self.config = load_component_config()
+        self.autosaver = RuleAutosaver()
         self.init_layout()
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_all_wires)
-        self.timer.start(50)
         # 新增：用于跟踪当前连线组
         self.active_group_id = None
 
@@ -365,12 +491,23 @@ class PanelScene(QGraphicsScene):
     def add_wire(self, wire):
         self.addItem(wire)
         self.wires.append(wire)
-        save_rules_to_csv(self.wires)
+        for contact in (wire.start_item, wire.end_item):
+            self.contact_wires.setdefault(contact, []).append(wire)
+        self.schedule_save()
 
     def remove_wire(self, wire):
         if wire in self.wires:
             self.wires.remove(wire)
-            save_rules_to_csv(self.wires)
+            for contact in (wire.start_item, wire.end_item):
+                attached = self.contact_wires.get(contact, [])
+                if wire in attached:
+                    attached.remove(wire)
+                if not attached:
+                    self.contact_wires.pop(contact, None)
+            self.schedule_save()
+
+    def schedule_save(self, export_json=False):
+        self.autosaver.schedule(self.wires, export_json=export_json)
 
     def mousePressEvent(self, event):
         item = self.itemAt(event.scenePos(), self.views()[0].transform())
@@ -416,6 +553,15 @@ class PanelScene(QGraphicsScene):
                 self.active_group_id = None
         super().mousePressEvent(event)
 
+    def update_wires_of(self, component):
+        """元件移动后只刷新连到其触点上的导线（两端在同一元件上的导线只刷新一次）"""
+        updated = set()
+        for contact in component.contacts:
+            for wire in self.contact_wires.get(contact, ()):
+                if id(wire) not in updated:
+                    updated.add(id(wire))
+                    wire.update_position()
+
     def update_all_wires(self):
         for wire in self.wires:
             wire.update_position()
@@ -424,18 +570,14 @@ class PanelScene(QGraphicsScene):
         # 检查文件扩展名，如果是json则使用JSON格式导出
         if filename.lower().endswith('.json'):
             export_rules_to_json(self.wires, filename)
+            self.autosaver.request_compile(filename)
         else:
             # 保持原有的CSV格式导出功能
-            with open(filename, "w", newline='', encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(["起点", "终点", "分值"])
-                for wire in self.wires:
-                    writer.writerow([wire.start_item.name, wire.end_item.name, wire.score])
+            write_rules_csv(wire_rows(self.wires), filename)
 
     def export_current_rules_to_json(self):
-        # 将当前的所有连线规则导出到指定的rule1.json文件
-        rule_file = "d:\\videoProject\\data\\rules\\rule1.json"
-        export_rules_to_json(self.wires, rule_file)
+        # 将当前的所有连线规则导出到rule1.json文件（后台合并写入）
+        self.schedule_save(export_json=True)
 
 
 class MainWindow(QMainWindow):
@@ -477,6 +619,11 @@ class MainWindow(QMainWindow):
         if filename:
             self.scene.export_csv(filename)
 
+    def closeEvent(self, event):
+        # 关闭前写入尚未落盘的修改
+        self.scene.autosaver.flush()
+        super().closeEvent(event)
+
     # 移除了评测和得分功能
 
 
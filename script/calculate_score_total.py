@@ -12,13 +12,8 @@ def _load_json(path: str) -> Any:
         return json.load(f)
 
 
-def _build_answer_map(answer_json_path: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
-    """
-    从参考答案（长动.json）建立映射：
-    key: (node1, node2) 的规范化二元组
-    value: { "score": int/float, "id": 可选, "nodes": [..] }
-    若存在重复 key，默认保留 score 更高的一条。
-    """
+def load_rule_items(answer_json_path: str) -> List[Dict[str, Any]]:
+    """读取参考答案JSON中的规则条目列表：[{id, nodes:[...], score}, ...]"""
     data = _load_json(answer_json_path)
 
     # 长动.json通常是 list[ {id, nodes:[a,b], score} ]；也兼容 dict 包裹的情况
@@ -35,7 +30,17 @@ def _build_answer_map(answer_json_path: str) -> Dict[Tuple[str, str], Dict[str,
             raise ValueError(f"无法识别参考答案JSON结构：{answer_json_path}")
     else:
         raise ValueError(f"参考答案JSON必须为list或dict：{answer_json_path}")
+    return items
 
+
+def _build_answer_map(answer_json_path: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    从参考答案（长动.json）建立映射：
+    key: (node1, node2) 的规范化二元组（触点名去掉首尾空白，与标签表、规则包一致）
+    value: { "score": int/float, "id": 可选, "nodes": [..] }
+    若存在重复 key，默认保留 score 更高的一条。
+    """
+    items = load_rule_items(answer_json_path)
     answer_map: Dict[Tuple[str, str], Dict[str, Any]] = {}
 
     for item in items:
@@ -43,7 +48,7 @@ def _build_answer_map(answer_json_path: str) -> Dict[Tuple[str, str], Dict[str,
         if not isinstance(nodes, list) or len(nodes) != 2:
             continue
 
-        a, b = str(nodes[0]), str(nodes[1])
+        a, b = str(nodes[0]).strip(), str(nodes[1]).strip()
         key = _canonical_pair(a, b)
 
         score = item.get("score", 0)
@@ -62,13 +67,28 @@ def _build_answer_map(answer_json_path: str) -> Dict[Tuple[str, str], Dict[str,
     return answer_map
 
 
+def _resolve_answer_map(
+    answer_json_path: Optional[str],
+    answer_map: Optional[Dict[Tuple[str, str], Dict[str, Any]]],
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """优先使用传入的映射；未指定参考答案文件时使用当前生效的规则（rule_registry）"""
+    if answer_map is not None:
+        return answer_map
+    if answer_json_path is None:
+        from rule_registry import rule_registry
+        return rule_registry.answer_map()
+    return _build_answer_map(answer_json_path)
+
+
 def evaluate_pairs(
     output_json_path: str,
-    answer_json_path: str,
-    print_console: bool = True
+    answer_json_path: Optional[str] = None,
+    print_console: bool = True,
+    answer_map: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None,
 ) -> Dict[str, Any]:
     """
     以 answer_json_path 为参考答案，对比 output_json_path 中的 pairs。
+    - 未指定 answer_json_path / answer_map 时使用当前生效的规则
     - 忽略顺序：a-b 与 b-a 视为同一对
     - 匹配到则获得对应 score 分数
     返回：
@@ -80,7 +100,7 @@ def evaluate_pairs(
       "matched_count": int
     }
     """
-    answer_map = _build_answer_map(answer_json_path)
+    answer_map = _resolve_answer_map(answer_json_path, answer_map)
     out = _load_json(output_json_path)
 
     if not isinstance(out, dict) or "pairs" not in out:
@@ -125,7 +145,7 @@ def evaluate_pairs(
 
     if print_console:
         print("======== Pairs评分结果 ========")
-        print(f"参考答案: {answer_json_path}")
+        print(f"参考答案: {answer_json_path or '当前生效规则'}")
         print(f"待评估:   {output_json_path}")
         print(f"pairs总数: {result['pairs_count']}，匹配数: {result['matched_count']}，总分: {result['total_score']}")
         print("\n-- 匹配到的pairs（pair -> score）--")
@@ -142,7 +162,7 @@ def evaluate_pairs(
 
 def score_pairs_to_list(
     pairs_input: Union[List[Any], Tuple[Any, ...]],
-    answer_json_path: str,
+    answer_json_path: Optional[str] = None,
     answer_map: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None,
 ) -> List[Dict[str, Any]]:
     """
@@ -150,6 +170,7 @@ def score_pairs_to_list(
     - 输入可以是单个触点对：["a","b"] 或 ("a","b")
     - 也可以是多个触点对：[[ "a","b" ],[ "c","d" ]] 或 [("a","b"),("c","d")]
     - 也支持空列表/空元组：[] / ()，直接返回 []
+    - 未指定 answer_json_path / answer_map 时使用当前生效的规则
 
     返回示例：
     [
@@ -178,8 +199,7 @@ def score_pairs_to_list(
         pairs_list = [pairs_input]
 
     # 构建/复用标准答案映射
-    if answer_map is None:
-        answer_map = _build_answer_map(answer_json_path)
+    answer_map = _resolve_answer_map(answer_json_path, answer_map)
 
     results: List[Dict[str, Any]] = []
 
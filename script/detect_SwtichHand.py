@@ -4,12 +4,14 @@ import time
 from dataclasses import dataclass
 from typing import Optional, Callable
 from ultralytics import YOLO
-from global_config import Global_Config
+from global_config import Global_Config, Login_Session
 from serial_tools import STM32Tool
-from calculate_score_total import evaluate_pairs
+from calculate_score_total import evaluate_pairs, score_pairs_to_list
 from deal_StmResult import generate_by_name_json
 from tools.Python.MvImport.MvCameraControl_class import *
 from update_pairs import diff_json_pairs
+from score_uplink import score_uplink
+from rule_registry import rule_registry
 import numpy as np
 
 # ========= 你原先程序里的可配置项 =========
@@ -74,6 +76,13 @@ class YoloDetector:
         self._hand_absent_since: Optional[float] = None  # 手掌开始“完全消失”的时间
         self._snapshot_done_this_absence: bool = False  # 当前这次“消失周期”是否已经截过图
 
+        # 最近一次读到的接线（触点序号对），切换规则后用它立即重新打分
+        self._last_wiring = None
+        # 检测线程与规则切换回调都会改写 Global_Config 中的分数，用同一把锁串行化
+        self._score_lock = threading.Lock()
+        rule_registry.on_switch(self._rescore)
+        rule_registry.start_watcher()
+
     # =============== 公共接口 ===============
     def start(self, blocking: bool = False):
         """启动采集与检测线程；与 app-backup.py 的约定兼容"""
@@ -106,6 +115,34 @@ class YoloDetector:
             except Exception:
                 pass
 
+    @staticmethod
+    def _total_score(wiring, active):
+        """
+        接线总分：规则包可用时直接用 STM32 触点序号查表；
+        没有规则包或触点序号与标签表不符时，退回按结果文件中的触点名逐对比对
+        """
+        if active.pack is not None:
+            try:
+                return active.pack.score_pairs(wiring)
+            except ValueError as e:
+                print(f"[WARN] 规则包评分失败，按触点名评分：{e}")
+        return evaluate_pairs(Global_Config.new_result_json, answer_map=active.answer_map,
+                              print_console=False)["total_score"]
+
+    def _rescore(self, active):
+        """规则切换后用新规则给当前接线重新打分（规则包可用时只做一次向量化查表）"""
+        with self._score_lock:
+            if self._last_wiring is None:
+                return
+            total = self._total_score(self._last_wiring, active)
+            Global_Config.total_score = total
+            # add_pairs/undo_pairs 可能是计分结果 [{"pair", "score"}] 或触点对 [[a, b]]
+            pairs_of = lambda items: [p["pair"] if isinstance(p, dict) else p for p in items or []]
+            Global_Config.add_pairs = score_pairs_to_list(pairs_of(Global_Config.add_pairs), answer_map=active.answer_map)
+            Global_Config.undo_pairs = score_pairs_to_list(pairs_of(Global_Config.undo_pairs), answer_map=active.answer_map)
+            score_uplink.push_score(Login_Session.sno or score_uplink.bench_id, total)
+        print(f"[INFO] 已按新规则重新评分：{total}")
+
     # =============== 内部线程 ===============
     def _capture_worker(self):
         """使用海康工业相机取帧"""
@@ -277,10 +314,16 @@ class YoloDetector:
 
                         result = stm32_tool.query_and_parse()
                         print(result)
-                        generate_by_name_json(result, Global_Config.label_csv, Global_Config.new_result_json)
-                        score = evaluate_pairs(Global_Config.new_result_json, Global_Config.test_rule)
-                        Global_Config.total_score = score["total_score"]
-                        Global_Config.add_pairs, Global_Config.undo_pairs = diff_json_pairs(Global_Config.old_result_json, Global_Config.new_result_json)
+                        with self._score_lock:
+                            self._last_wiring = result
+                            generate_by_name_json(result, Global_Config.label_csv, Global_Config.new_result_json)
+                            Global_Config.total_score = self._total_score(result, rule_registry.current())
+                            Global_Config.add_pairs, Global_Config.undo_pairs = diff_json_pairs(Global_Config.old_result_json, Global_Config.new_result_json)
+                            # 上报到教师端（后台批量发送，不阻塞检测）
+                            bench_sno = Login_Session.sno or score_uplink.bench_id
+                            score_uplink.push_wiring(bench_sno, Global_Config.add_pairs, Global_Config.undo_pairs,
+                                                     Global_Config.total_score)
+                            score_uplink.push_score(bench_sno, Global_Config.total_score)
 
 
                         ####################################################################################################################################################################################
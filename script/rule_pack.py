@@ -0,0 +1,271 @@
+# rule_pack.py
+# -*- coding: utf-8 -*-
+"""
+规则包编译
+把参考答案（data/rules/*.json，触点名）按标签表解析为触点序号，编译成紧凑的二进制规则包（.rpk）：
+- 评分查找表：按上三角序号（触点对 i<j 在 N*(N-1)/2 向量中的位置）排序的键与分值
+- 接线组：每条规则涉及的触点序号
+- 标签表摘要与 CRC32 校验，标签表变化或文件损坏时拒绝加载
+评分时触点对直接换算成上三角序号，对查找表做一次向量化取值，不再逐对处理字符串
+
+命令行：
+    python script/rule_pack.py data/rules/长动.json [更多规则文件...] [-l 标签表] [-o 输出文件]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from global_config import Global_Config
+from calculate_score_total import load_rule_items
+
+RULE_PACK_MAGIC = b"RPK1"
+RULE_PACK_VERSION = 1
+RULE_PACK_SUFFIX = ".rpk"
+# 魔数、版本、保留位、触点数、评分对数、接线组数、标签表摘要
+_HEADER = struct.Struct("<4sHHIII32s")
+_CRC = struct.Struct("<I")
+
+_label_cache: Dict[str, Tuple[Tuple[float, int], Dict[int, str]]] = {}
+
+
+class RulePackError(ValueError):
+    """规则包格式错误、校验失败或与标签表不匹配"""
+
+
+def pack_path_for(rule_path: Union[str, Path]) -> Path:
+    """规则文件对应的规则包路径：长动.json -> 长动.rpk"""
+    return Path(rule_path).with_suffix(RULE_PACK_SUFFIX)
+
+
+def load_label_table(label_path: Union[str, Path] = Global_Config.label_csv) -> Dict[int, str]:
+    """读取标签表（行号 -> 触点名），文件未变化时复用上次结果"""
+    from deal_StmResult import load_labels
+
+    label_path = str(label_path)
+    st = os.stat(label_path)
+    stamp = (st.st_mtime, st.st_size)
+    cached = _label_cache.get(label_path)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, load_labels(label_path))
+        _label_cache[label_path] = cached
+    return cached[1]
+
+
+def label_digest(labels: Dict[int, str]) -> bytes:
+    """标签表摘要：按行号顺序的触点名 SHA-256"""
+    names = "\n".join(labels[i] for i in sorted(labels))
+    return hashlib.sha256(names.encode("utf-8")).digest()
+
+
+def pair_indices(a: np.ndarray, b: np.ndarray, n: int) -> np.ndarray:
+    """0 起始触点序号对 (a, b)（a != b，顺序任意）-> 上三角序号，与 np.triu_indices(n, 1) 的顺序一致"""
+    i = np.minimum(a, b).astype(np.int64)
+    j = np.maximum(a, b).astype(np.int64)
+    return i * (2 * n - i - 1) // 2 + (j - i - 1)
+
+
+@dataclass
+class RulePack:
+    pin_count: int
+    keys: np.ndarray                # uint32，已排序的上三角序号
+    scores: np.ndarray              # float32，与 keys 一一对应
+    net_offsets: np.ndarray         # uint32，第 g 组触点为 net_pins[net_offsets[g]:net_offsets[g + 1]]
+    net_pins: np.ndarray            # uint16，0 起始触点序号
+    label_digest: bytes
+    _table: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+
+    # ---------- 评分 ----------
+    @property
+    def table(self) -> np.ndarray:
+        """稠密查找表：上三角序号 -> 分值，首次使用时展开"""
+        if self._table is None:
+            table = np.zeros(self.pin_count * (self.pin_count - 1) // 2, dtype=np.float32)
+            table[self.keys] = self.scores
+            self._table = table
+        return self._table
+
+    def pair_keys(self, pairs: Sequence[Sequence[int]], start_index: int = 1) -> np.ndarray:
+        """
+        触点序号对（STM32 返回的行号，默认 1 起始）-> 去重后的上三角序号
+        与 deal_StmResult.normalize_pairs 一致：忽略顺序、去重、过滤自环
+        """
+        arr = np.asarray(pairs, dtype=np.int64).reshape(-1, 2) - start_index
+        arr = arr[arr[:, 0] != arr[:, 1]]
+        if arr.size and (arr.min() < 0 or arr.max() >= self.pin_count):
+            raise ValueError(f"触点序号超出标签表范围（标签行数={self.pin_count}，起始行号={start_index}）")
+        return np.unique(pair_indices(arr[:, 0], arr[:, 1], self.pin_count))
+
+    def score_pairs(self, pairs: Sequence[Sequence[int]], start_index: int = 1) -> float:
+        """接线对总分"""
+        return float(self.table[self.pair_keys(pairs, start_index)].sum())
+
+    def score_bits(self, bits: np.ndarray) -> float:
+        """接线矩阵上三角展开的 0/1 向量（np.triu_indices(N, 1) 顺序）的总分"""
+        return float(np.dot(np.asarray(bits, dtype=np.float32), self.table))
+
+    def score_matrix(self, matrix: np.ndarray) -> float:
+        """N×N 接线邻接矩阵的总分（只看上三角）"""
+        return self.score_bits(np.asarray(matrix)[np.triu_indices(self.pin_count, 1)])
+
+    def nets(self) -> List[np.ndarray]:
+        return [self.net_pins[self.net_offsets[g]:self.net_offsets[g + 1]] for g in range(len(self.net_offsets) - 1)]
+
+    def matches_labels(self, labels: Dict[int, str]) -> bool:
+        return len(labels) == self.pin_count and label_digest(labels) == self.label_digest
+
+    # ---------- 序列化 ----------
+    def to_bytes(self) -> bytes:
+        body = b"".join((
+            _HEADER.pack(RULE_PACK_MAGIC, RULE_PACK_VERSION, 0, self.pin_count, len(self.keys),
+                         len(self.net_offsets) - 1, self.label_digest),
+            self.keys.astype("<u4").tobytes(),
+            self.scores.astype("<f4").tobytes(),
+            self.net_offsets.astype("<u4").tobytes(),
+            self.net_pins.astype("<u2").tobytes(),
+        ))
+        return body + _CRC.pack(zlib.crc32(body))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "RulePack":
+        if len(data) < _HEADER.size + _CRC.size:
+            raise RulePackError("规则包长度不足")
+        body, (crc,) = data[:-_CRC.size], _CRC.unpack(data[-_CRC.size:])
+        if zlib.crc32(body) != crc:
+            raise RulePackError("规则包校验失败")
+        magic, version, _, pin_count, pair_count, net_count, digest = _HEADER.unpack_from(body)
+        if magic != RULE_PACK_MAGIC or version != RULE_PACK_VERSION:
+            raise RulePackError(f"不支持的规则包格式：{magic!r} v{version}")
+
+        offset = _HEADER.size
+
+        def take(dtype: str, count: int) -> np.ndarray:
+            nonlocal offset
+            arr = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+            offset += arr.nbytes
+            return arr
+
+        keys = take("<u4", pair_count)
+        scores = take("<f4", pair_count)
+        net_offsets = take("<u4", net_count + 1)
+        net_pins = take("<u2", int(net_offsets[-1]) if net_count else 0)
+        if offset != len(body):
+            raise RulePackError("规则包长度与头部记录不一致")
+        return cls(pin_count, keys, scores, net_offsets, net_pins, digest)
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """先写临时文件再替换，加载方不会读到写了一半的规则包"""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_bytes(self.to_bytes())
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path], labels: Optional[Dict[int, str]] = None) -> "RulePack":
+        """读取规则包；传入 labels 时同时检查是否按同一张标签表编译"""
+        pack = cls.from_bytes(Path(path).read_bytes())
+        if labels is not None and not pack.matches_labels(labels):
+            raise RulePackError(f"规则包与当前标签表不匹配，请重新编译：{path}")
+        return pack
+
+
+def compile_rules(items: Sequence[dict], labels: Dict[int, str]) -> Tuple[RulePack, List[str]]:
+    """
+    把规则条目按标签表编译为规则包，返回 (规则包, 标签表中找不到的触点名)
+    评分表只收录两个触点的规则，与 evaluate_pairs 一致：重复的触点对保留分值更高的一条，
+    标签表中同名的多行触点都按该名字计分；
+    所有触点都能解析的规则（含多触点接线组）按顺序记入接线组（同名取第一行）
+    """
+    rows_of: Dict[str, List[int]] = {}
+    for row in sorted(labels):
+        rows_of.setdefault(labels[row], []).append(row - 1)
+    pin_count = len(labels)
+    if pin_count > 0xFFFF:
+        raise RulePackError(f"标签表触点数过多：{pin_count}")
+
+    best: Dict[int, float] = {}
+    nets: List[List[int]] = []
+    unresolved: List[str] = []
+    for item in items:
+        nodes = item.get("nodes")
+        if not isinstance(nodes, list) or len(nodes) < 2:
+            continue
+        names = [str(n).strip() for n in nodes]
+        missing = [n for n in names if n not in rows_of]
+        if missing:
+            unresolved.extend(n for n in missing if n not in unresolved)
+            continue
+        nets.append([rows_of[n][0] for n in names])
+
+        if len(names) != 2:
+            continue
+        try:
+            score = float(item.get("score", 0) or 0)
+        except (TypeError, ValueError):
+            score = 0.0
+        for a in rows_of[names[0]]:
+            for b in rows_of[names[1]]:
+                if a == b:
+                    continue
+                key = int(pair_indices(np.int64(a), np.int64(b), pin_count))
+                if key not in best or score > best[key]:
+                    best[key] = score
+
+    keys = np.array(sorted(best), dtype=np.uint32)
+    scores = np.array([best[k] for k in sorted(best)], dtype=np.float32)
+    net_offsets = np.cumsum([0] + [len(net) for net in nets]).astype(np.uint32)
+    net_pins = np.array([pin for net in nets for pin in net], dtype=np.uint16)
+    return RulePack(pin_count, keys, scores, net_offsets, net_pins, label_digest(labels)), unresolved
+
+
+def compile_rule_file(
+    rule_path: Union[str, Path],
+    label_path: Union[str, Path] = Global_Config.label_csv,
+    out_path: Optional[Union[str, Path]] = None,
+    print_console: bool = True,
+) -> Path:
+    """编译单个规则文件，默认输出到同目录同名 .rpk，返回输出路径"""
+    labels = load_label_table(label_path)
+    pack, unresolved = compile_rules(load_rule_items(str(rule_path)), labels)
+    out = pack.save(out_path or pack_path_for(rule_path))
+    if print_console:
+        print(f"✅ 规则包已生成：{out}（触点 {pack.pin_count}，评分对 {len(pack.keys)}，"
+              f"接线组 {len(pack.net_offsets) - 1}）")
+        if unresolved:
+            print(f"⚠️ 标签表中找不到以下触点，相关规则已跳过：{', '.join(unresolved)}")
+    return out
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="把参考答案 JSON 编译为二进制规则包（.rpk）")
+    parser.add_argument("rules", nargs="+", help="规则文件（data/rules/*.json）")
+    parser.add_argument("-l", "--labels", default=Global_Config.label_csv, help="标签表（行号 -> 触点名）")
+    parser.add_argument("-o", "--output", help="输出文件，仅编译单个规则文件时可用")
+    args = parser.parse_args(argv)
+    if args.output and len(args.rules) > 1:
+        parser.error("编译多个规则文件时不能指定 --output")
+
+    failed = 0
+    for rule_path in args.rules:
+        try:
+            compile_rule_file(rule_path, args.labels, args.output)
+        except Exception as e:
+            failed += 1
+            print(f"❌ 编译规则失败：{rule_path}，{e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
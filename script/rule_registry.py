@@ -0,0 +1,190 @@
+# rule_registry.py
+# -*- coding: utf-8 -*-
+"""
+当前生效的评分规则
+规则文件在后台读取、校验（并按标签表编译为规则包）后，整体替换当前规则的引用：
+评分线程任何时刻看到的都是一份完整的规则，切换过程中不会读到一半新一半旧的状态
+- 后台线程监视规则文件（默认 final_rule.json，/api/set_rule 写入的就是它），变化后自动切换
+- 切换成功后通知订阅者（检测器据此立即用新规则重新给当前接线打分）
+- 新规则校验失败时保留旧规则继续评分
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from global_config import Global_Config
+from calculate_score_total import _build_answer_map, load_rule_items
+
+RULE_WATCH_INTERVAL = 1.0   # 检查规则文件变化的间隔（秒）
+
+
+@dataclass(frozen=True)
+class ActiveRule:
+    path: str
+    answer_map: Dict[Tuple[str, str], Dict[str, Any]]   # 与 _build_answer_map 结构相同
+    pack: Optional[Any]                                 # RulePack；标签表不可用时为 None
+    stamp: Tuple[float, int]                            # 加载时规则文件的 (修改时间, 大小)
+    version: int
+
+
+def default_rule_path() -> str:
+    """优先使用 /api/set_rule 选定的 final_rule.json，不存在时使用默认规则"""
+    active = Path(Global_Config.active_rule)
+    return str(active if active.exists() else Global_Config.test_rule)
+
+
+def _file_stamp(path: str) -> Tuple[float, int]:
+    st = os.stat(path)
+    return st.st_mtime, st.st_size
+
+
+class RuleRegistry:
+    def __init__(self, rule_path: Optional[Union[str, Path]] = None,
+                 label_path: Union[str, Path] = Global_Config.label_csv,
+                 interval: float = RULE_WATCH_INTERVAL):
+        self.rule_path = str(rule_path or default_rule_path())
+        self._follow_default = rule_path is None   # 未指定路径时跟随 default_rule_path（final_rule.json 出现后改用它）
+        self.label_path = str(label_path)
+        self.interval = interval
+        self._active: Optional[ActiveRule] = None
+        self._version = 0
+        self._load_lock = threading.Lock()
+        self._listeners: List[Callable[[ActiveRule], None]] = []
+        self._rejected: Optional[Tuple[str, Tuple[float, int]]] = None   # 校验失败的 (路径, 文件状态)，未再变化前不重试
+        self._watcher: Optional[threading.Thread] = None
+
+    # ---------- 读取 ----------
+    def current(self) -> ActiveRule:
+        """当前生效的规则；首次调用时同步加载"""
+        active = self._active
+        if active is None:
+            with self._load_lock:
+                if self._active is None:
+                    self._active = self._initial_load()
+            active = self._active
+        return active
+
+    def _initial_load(self) -> ActiveRule:
+        """
+        首次加载；规则文件损坏（例如正在被覆盖）时改用默认规则，
+        并像监视线程一样记下失败的文件状态，文件再次变化后由监视线程切换过去
+        """
+        try:
+            return self._build(self.rule_path)
+        except Exception as e:
+            fallback = str(Global_Config.test_rule)
+            if os.path.abspath(self.rule_path) == os.path.abspath(fallback):
+                raise
+            try:
+                self._rejected = (self.rule_path, _file_stamp(self.rule_path))
+            except OSError:
+                pass
+            print(f"[ERROR] 加载规则失败，改用默认规则：{self.rule_path}，{e}")
+            return self._build(fallback)
+
+    def answer_map(self) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        return self.current().answer_map
+
+    # ---------- 切换 ----------
+    def _build(self, path: str) -> ActiveRule:
+        """读取并校验规则文件，成功才返回；此时尚未替换当前规则"""
+        stamp = _file_stamp(path)
+        answer_map = _build_answer_map(path)
+        if not answer_map:
+            raise ValueError(f"规则文件中没有有效的触点对规则：{path}")
+        pack = self._load_pack(path, stamp)
+        self._version += 1
+        return ActiveRule(str(path), answer_map, pack, stamp, self._version)
+
+    def _load_pack(self, path: str, stamp: Tuple[float, int]):
+        """
+        优先读取规则文件旁已编译的 .rpk（不早于规则文件且按当前标签表编译），
+        否则在内存中重新编译；都失败时返回 None，评分退回按触点名比对
+        """
+        try:
+            from rule_pack import RulePack, RulePackError, compile_rules, load_label_table, pack_path_for
+            labels = load_label_table(self.label_path)
+        except Exception as e:
+            print(f"[WARN] 标签表不可用，评分将按触点名比对：{e}")
+            return None
+        pack_path = pack_path_for(path)
+        try:
+            if os.stat(pack_path).st_mtime >= stamp[0]:
+                return RulePack.load(pack_path, labels)
+        except (OSError, RulePackError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"[WARN] 规则包不可用，重新编译：{pack_path}，{e}")
+        try:
+            pack, _ = compile_rules(load_rule_items(path), labels)
+            return pack
+        except Exception as e:
+            print(f"[WARN] 规则包编译失败，评分将按触点名比对：{e}")
+            return None
+
+    def _switch(self, path: str) -> Optional[ActiveRule]:
+        with self._load_lock:
+            try:
+                active = self._build(path)
+            except Exception as e:
+                print(f"[ERROR] 加载规则失败，继续使用原规则：{path}，{e}")
+                return None
+            # 整体替换引用，评分线程下一次读取即为新规则
+            self._active = active
+            self.rule_path = path
+        print(f"[INFO] 评分规则已切换：{path}（v{active.version}，{len(active.answer_map)} 条触点对）")
+        for callback in list(self._listeners):
+            try:
+                callback(active)
+            except Exception as e:
+                print(f"[WARN] 规则切换回调异常：{e}")
+        return active
+
+    def switch(self, path: Optional[Union[str, Path]] = None, background: bool = True):
+        """
+        切换到 path（默认重新加载当前规则文件）
+        background=True 时在后台线程加载并立即返回线程；否则同步加载，返回新规则（失败为 None）
+        """
+        if path is not None:
+            self._follow_default = False
+        path = str(path or self.rule_path)
+        if not background:
+            return self._switch(path)
+        t = threading.Thread(target=self._switch, args=(path,), daemon=True)
+        t.start()
+        return t
+
+    def on_switch(self, callback: Callable[[ActiveRule], None]):
+        """注册规则切换成功后的回调，参数为新的 ActiveRule"""
+        self._listeners.append(callback)
+
+    # ---------- 监视 ----------
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                path = default_rule_path() if self._follow_default else self.rule_path
+                active = self._active
+                stamp = _file_stamp(path)
+                changed = active is None or active.path != path or stamp != active.stamp
+                if changed and (path, stamp) != self._rejected:
+                    if self._switch(path) is None:
+                        self._rejected = (path, stamp)
+            except FileNotFoundError:
+                pass   # 规则文件正在被替换，下一轮再看
+            except Exception as e:
+                print(f"[WARN] 检查规则文件失败：{e}")
+
+    def start_watcher(self):
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, daemon=True)
+            self._watcher.start()
+        return self
+
+
+rule_registry = RuleRegistry()
@@ -0,0 +1,182 @@
+# score_uplink.py
+"""
+考台 -> 教师端 成绩上报
+检测线程只把成绩/接线变化放入内存队列立即返回，后台线程按批次 POST 到教师端：
+- 同一学生未发出的多次成绩只保留最后一次
+- 发送失败按指数退避重试，期间事件追加到本地暂存文件，教师端恢复后按顺序补发
+- 每个事件带考台标识、启动标识和递增序号，教师端据此丢弃重试造成的重复事件
+"""
+
+import json
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+
+import requests
+
+from global_config import Global_Config
+
+UPLINK_PATH = '/api/bench/events'
+BATCH_INTERVAL = 1.0        # 批次间隔（秒）
+MAX_BATCH = 200             # 每次最多发送的事件数
+RETRY_MIN_DELAY = 1
+RETRY_MAX_DELAY = 30
+REQUEST_TIMEOUT = 5
+
+
+def default_teacher_url():
+    return os.getenv('TEACHER_SERVER_URL',
+                     f"http://{Global_Config.rule_server_ip}:{Global_Config.teacher_server_port}")
+
+
+def _is_finite(score):
+    try:
+        return math.isfinite(float(score))
+    except (TypeError, ValueError):
+        return False
+
+
+class ScoreUplink:
+    def __init__(self, base_url=None, bench_id=None, spool_path=Global_Config.score_uplink_spool,
+                 batch_interval=BATCH_INTERVAL, max_batch=MAX_BATCH):
+        self.url = (base_url or default_teacher_url()).rstrip('/') + UPLINK_PATH
+        self.bench_id = bench_id or os.getenv('BENCH_ID') or socket.gethostname()
+        self.boot_id = uuid.uuid4().hex[:8]       # 每次启动不同，序号从 1 重新开始
+        self.spool_path = str(spool_path)
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._seq = 0
+        self._events = []             # 按顺序发送的接线事件
+        self._scores = {}             # 学号 -> 最新成绩事件
+        self._thread = None
+        self.last_error = None
+
+    # ---------- 入队 ----------
+    def _event(self, kind, sno, **fields):
+        self._seq += 1
+        return dict(fields, seq=self._seq, type=kind, sno=str(sno), ts=time.time())
+
+    def push_score(self, sno, score):
+        """上报学生当前总分，未发出的旧成绩会被覆盖"""
+        if not _is_finite(score):
+            print(f"[WARN] 忽略无效成绩：{sno} -> {score!r}")
+            return
+        with self._lock:
+            self._scores[str(sno)] = self._event('score', sno, score=score)
+        self.start()
+
+    def push_wiring(self, sno, add_pairs, undo_pairs, score=None):
+        """上报一次接线变化（新增/撤回的触点对）"""
+        if not add_pairs and not undo_pairs:
+            return
+        if score is not None and not _is_finite(score):
+            score = None   # 教师端会拒绝 NaN/Infinity，整批事件将无法送达
+        with self._lock:
+            self._events.append(self._event(
+                'wiring', sno, score=score,
+                add=[item.get('pair') for item in add_pairs],
+                undo=[item.get('pair') for item in undo_pairs]
+            ))
+        self.start()
+
+    def _take_pending(self):
+        with self._lock:
+            batch = self._events + list(self._scores.values())
+            self._events, self._scores = [], {}
+        batch.sort(key=lambda e: e['seq'])
+        return batch
+
+    # ---------- 暂存 ----------
+    def _spool(self, events):
+        if not events:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+            with open(self.spool_path, 'a', encoding='utf-8') as f:
+                for event in events:
+                    f.write(json.dumps(dict(event, bench=self.bench_id, boot=self.boot_id),
+                                       ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"[WARN] 成绩事件暂存失败：{e}")
+
+    def _load_spool(self):
+        try:
+            with open(self.spool_path, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            print(f"[WARN] 读取成绩暂存文件失败：{e}")
+            return []
+
+    def _rewrite_spool(self, events):
+        tmp_path = self.spool_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.spool_path)
+
+    # ---------- 发送 ----------
+    def _post(self, events):
+        """按 (考台, 启动标识) 分组发送，全部成功才返回"""
+        groups = {}
+        for event in events:
+            key = (event.pop('bench', self.bench_id), event.pop('boot', self.boot_id))
+            groups.setdefault(key, []).append(event)
+        for (bench_id, boot_id), group in groups.items():
+            for start in range(0, len(group), self.max_batch):
+                resp = self.session.post(self.url, json={
+                    'bench_id': bench_id, 'boot_id': boot_id, 'events': group[start:start + self.max_batch]
+                }, timeout=REQUEST_TIMEOUT)
+                resp.raise_for_status()
+
+    def _flush_spool(self):
+        """补发暂存文件中的事件，成功后清空"""
+        spooled = self._load_spool()
+        if not spooled:
+            return
+        self._post([dict(e) for e in spooled])
+        self._rewrite_spool([])
+        print(f"[INFO] 已补发 {len(spooled)} 条暂存的成绩事件")
+
+    def flush(self):
+        """发送一轮；失败时把本轮事件写入暂存文件并抛出异常"""
+        batch = self._take_pending()
+        try:
+            self._flush_spool()
+            if batch:
+                self._post([dict(e) for e in batch])
+        except Exception:
+            self._spool(batch)
+            raise
+
+    def _run(self):
+        delay = RETRY_MIN_DELAY
+        while True:
+            self._wakeup.wait(self.batch_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                self.last_error = None
+                delay = RETRY_MIN_DELAY
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[WARN] 成绩上报失败，{delay}s 后重试（事件已暂存）：{e}")
+                time.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+
+score_uplink = ScoreUplink()
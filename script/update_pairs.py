@@ -84,8 +84,9 @@ def diff_json_pairs(
     add_pairs = [list(p) for p in sorted(add_set, key=lambda x: (x[0], x[1]))]
     undo_pairs = [list(p) for p in sorted(undo_set, key=lambda x: (x[0], x[1]))]
 
-    Global_Config.add_pairs = score_pairs_to_list(add_pairs,Global_Config.test_rule)
-    Global_Config.undo_pairs = score_pairs_to_list(undo_pairs,Global_Config.test_rule)
+    # 按当前生效的规则计分（切换规则后无需重启）
+    Global_Config.add_pairs = score_pairs_to_list(add_pairs)
+    Global_Config.undo_pairs = score_pairs_to_list(undo_pairs)
 
     shutil.copy(Global_Config.new_result_json, Global_Config.old_result_json)
 
@@ -21,8 +21,9 @@ if ! command -v pip3 &> /dev/null; then
 fi
 
 # 安装依赖
-pip3 install flask flask-cors werkzeug
+pip3 install flask flask-cors werkzeug gunicorn
 
 # 启动服务器
+# 与 file_upload.service 相同：gunicorn 单进程多线程（下载走 sendfile；内容块清理、上传会话都在进程内，不能多进程）
 echo "🚀 启动文件上传服务器..."
-python3 file_upload_server.py
\ No newline at end of file
+exec python3 -m gunicorn -w 1 --threads 8 -b "0.0.0.0:${PORT:-8094}" file_upload_server:app
\ No newline at end of file
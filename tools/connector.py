@@ -1,8 +1,65 @@
 # connector.py
 
+import threading
+from contextlib import contextmanager
+
 import mysql.connector
-from mysql.connector import Error
-from tools.config import DB_CONFIG
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
+from tools.config import DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT
+
+
+class Transaction:
+    """
+    事务内的操作句柄，由 transaction() 提供
+    所有语句共用同一个连接和游标，出错时抛出异常，由 transaction() 统一回滚
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor()
+
+    def query(self, sql, params=None):
+        """执行 SELECT 查询，返回全部结果"""
+        self.cursor.execute(sql, params or ())
+        return self.cursor.fetchall()
+
+    def execute(self, sql, params=None):
+        """执行单条写操作，返回 lastrowid（INSERT 自增ID）"""
+        self.cursor.execute(sql, params or ())
+        return self.cursor.lastrowid
+
+    def executemany(self, sql, seq_params):
+        """批量执行同一条写语句，INSERT 会被合并为一条多行语句，返回影响行数"""
+        seq_params = list(seq_params)
+        if not seq_params:
+            return 0
+        self.cursor.executemany(sql, seq_params)
+        return self.cursor.rowcount
+
+    def close(self):
+        try:
+            self.cursor.close()
+        except Exception as e:
+            print(f"❌ 关闭游标失败：{e}")
+
+
+@contextmanager
+def _run_transaction(connection):
+    """在 connection 上开启事务：正常退出提交，异常回滚并继续抛出"""
+    tx = Transaction(connection)
+    try:
+        yield tx
+        connection.commit()
+    except Exception:
+        try:
+            connection.rollback()
+        except Exception as rollback_error:
+            print(f"❌ 事务回滚失败：{rollback_error}")
+        raise
+    finally:
+        tx.close()
+
 
 class MySQLConnector:
     def __init__(self, config=DB_CONFIG):
@@ -53,7 +110,157 @@ class MySQLConnector:
         finally:
             cursor.close()
 
+    def insert(self, sql, params=None):
+        """
+        执行单条 INSERT，直接返回自增ID，失败返回 None
+        """
+        try:
+            with self.transaction() as tx:
+                return tx.execute(sql, params)
+        except Error as e:
+            print(f"❌ SQL 执行失败：{e}")
+            return None
+
+    def executemany(self, sql, seq_params):
+        """
+        批量执行同一条写语句（一次往返、一次提交）
+        返回影响行数，失败返回 -1
+        """
+        try:
+            with self.transaction() as tx:
+                return tx.executemany(sql, seq_params)
+        except Error as e:
+            print(f"❌ 批量 SQL 执行失败：{e}")
+            return -1
+
+    @contextmanager
+    def transaction(self):
+        """
+        事务上下文，块内所有语句在同一事务中执行，退出时一次提交
+        用法：
+            with connector.transaction() as tx:
+                user_id = tx.execute("INSERT ...", params)
+                tx.executemany("INSERT ...", rows)
+        """
+        if self.connection is None or not self.connection.is_connected():
+            self.connect()
+        if self.connection is None or not self.connection.is_connected():
+            raise Error("数据库未连接，无法开启事务")
+        with _run_transaction(self.connection) as tx:
+            yield tx
+
     def close(self):
         if self.connection and self.connection.is_connected():
             self.connection.close()
             print("🔌 数据库连接已关闭")
+
+
+class PooledMySQLConnector:
+    """
+    基于 mysql.connector.pooling 的连接器，query / execute 接口与 MySQLConnector 一致
+    每次调用从连接池借出连接，用完立即归还；同一配置的所有实例共享一个连接池
+    """
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, config=DB_CONFIG, pool_size=DB_POOL_SIZE, pool_timeout=DB_POOL_TIMEOUT):
+        self.config = config
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+
+    def _get_pool(self):
+        key = (tuple(sorted(self.config.items())), self.pool_size)
+        with PooledMySQLConnector._pools_lock:
+            entry = PooledMySQLConnector._pools.get(key)
+            if entry is None:
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f"multivideo_{len(PooledMySQLConnector._pools)}",
+                    pool_size=self.pool_size,
+                    pool_reset_session=True,
+                    **self.config
+                )
+                # mysql.connector 的连接池耗尽时直接抛错，用信号量让调用方排队等待
+                entry = (pool, threading.BoundedSemaphore(self.pool_size))
+                PooledMySQLConnector._pools[key] = entry
+                print(f"✅ 数据库连接池已创建，大小：{self.pool_size}")
+        return entry
+
+    def connect(self):
+        """预先创建连接池（可选，首次查询时也会自动创建）"""
+        try:
+            self._get_pool()
+        except Error as e:
+            print(f"❌ 数据库连接池创建失败：{e}")
+
+    @contextmanager
+    def connection(self):
+        """
+        从连接池借出一个经过健康检查的连接，with 块结束后自动归还
+        用法：
+            with connector.connection() as conn:
+                cursor = conn.cursor()
+        """
+        pool, slots = self._get_pool()
+        if not slots.acquire(timeout=self.pool_timeout):
+            raise PoolError(f"等待数据库连接超时（{self.pool_timeout}s）")
+        conn = None
+        try:
+            conn = pool.get_connection()
+            # 健康检查：空闲期间被服务端断开的连接在这里重连
+            conn.ping(reconnect=True, attempts=2, delay=0)
+            yield conn
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()  # 归还到连接池
+                except Exception as e:
+                    print(f"❌ 归还数据库连接失败：{e}")
+            slots.release()
+
+    def query(self, sql, params=None):
+        """
+        执行 SELECT 查询
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(sql, params or ())
+                    return cursor.fetchall()
+                finally:
+                    cursor.close()
+        except Error as e:
+            print(f"❌ 查询出错：{e}")
+            return []
+
+    def execute(self, sql, params=None):
+        """
+        执行 INSERT、UPDATE、DELETE 操作
+        返回 True 表示成功，False 表示失败
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(sql, params or ())
+                    conn.commit()
+                    return True
+                except Error:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        except Error as e:
+            print(f"❌ SQL 执行失败：{e}")
+            return False
+
+    @contextmanager
+    def transaction(self):
+        """借出一个连接开启事务，用法同 MySQLConnector.transaction"""
+        with self.connection() as conn:
+            with _run_transaction(conn) as tx:
+                yield tx
+
+    def close(self):
+        """连接在每次调用后已归还连接池，这里无需操作，保留以兼容 MySQLConnector"""
+        pass
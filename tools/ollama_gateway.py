@@ -0,0 +1,148 @@
+# ollama_gateway.py
+"""
+Ollama 大模型调用网关
+- 复用连接池的 HTTP 会话，避免每次请求重新建连
+- 限制同时发往 Ollama 主机的请求数，排队超时返回繁忙
+- 相同 (主机, 模型, prompt) 的并发请求合并为一次调用，结果缓存复用
+- 支持流式输出，逐段返回生成的文本
+"""
+
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tools.ttl_cache import TTLCache
+
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))   # 同时发往 Ollama 的请求数
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "30"))    # 排队等待的最长秒数
+OLLAMA_REQUEST_TIMEOUT = 60
+OLLAMA_CACHE_TTL = 600
+OLLAMA_CACHE_SIZE = 256
+
+
+class OllamaBusyError(Exception):
+    """排队超时，Ollama 主机繁忙"""
+
+
+class _InFlight:
+    """一次正在进行中的生成调用，供相同请求等待结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class OllamaGateway:
+    def __init__(self, max_concurrency=OLLAMA_MAX_CONCURRENCY, queue_timeout=OLLAMA_QUEUE_TIMEOUT,
+                 cache_ttl=OLLAMA_CACHE_TTL):
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._cache = TTLCache(ttl=cache_ttl, max_size=OLLAMA_CACHE_SIZE)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(4, max_concurrency))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @staticmethod
+    def _url(ip, port):
+        return f"http://{ip}:{port}/api/generate"
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise OllamaBusyError(f"大模型服务繁忙，排队超过 {self.queue_timeout:.0f} 秒")
+
+    def _post(self, url, model_name, prompt, timeout):
+        self._acquire()
+        try:
+            payload = {"model": model_name, "prompt": prompt, "stream": False}
+            response = self.session.post(url, json=payload, timeout=timeout)
+            response.raise_for_status()
+            return response.json().get('response', '')
+        finally:
+            self._slots.release()
+
+    def generate(self, ip, port, model_name, prompt, timeout=OLLAMA_REQUEST_TIMEOUT, use_cache=True):
+        """
+        非流式生成，返回完整文本
+        命中缓存直接返回；已有相同请求在进行中则等待其结果
+        use_cache=False 时每次都真实调用（如题库需要同一 prompt 的不同结果）
+        """
+        url = self._url(ip, port)
+        if not use_cache:
+            return self._post(url, model_name, prompt, timeout)
+        key = (url, model_name, prompt)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = _InFlight()
+                self._inflight[key] = flight
+
+        if not is_leader:
+            if not flight.event.wait(self.queue_timeout + timeout):
+                raise OllamaBusyError("等待相同请求的生成结果超时")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            text = self._post(url, model_name, prompt, timeout)
+            if text:
+                self._cache.set(key, text)
+            flight.result = text
+            return text
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def stream_generate(self, ip, port, model_name, prompt, timeout=OLLAMA_REQUEST_TIMEOUT):
+        """
+        流式生成，逐段 yield 文本；完整结果写入缓存
+        命中缓存时一次性返回缓存内容
+        """
+        url = self._url(ip, port)
+        key = (url, model_name, prompt)
+        cached = self._cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        self._acquire()
+        try:
+            payload = {"model": model_name, "prompt": prompt, "stream": True}
+            parts = []
+            with self.session.post(url, json=payload, timeout=timeout, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    token = chunk.get('response', '')
+                    if token:
+                        parts.append(token)
+                        yield token
+                    if chunk.get('done'):
+                        break
+            if parts:
+                self._cache.set(key, ''.join(parts))
+        finally:
+            # 客户端中途断开时生成器被关闭，同样会走到这里释放名额
+            self._slots.release()
+
+
+ollama_gateway = OllamaGateway()
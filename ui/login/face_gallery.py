@@ -0,0 +1,186 @@
+# face_gallery.py
+"""
+人脸库本地镜像
+后台线程定期读取 Nginx autoindex 目录，根据列表中的修改时间和大小判断新增/变化的图片，
+只下载变化的部分到本地目录；登录时直接读本地文件，不再阻塞在网络上
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import quote, urljoin, unquote
+
+import cv2
+from bs4 import BeautifulSoup
+
+FACES_MIRROR_DIR = os.getenv(
+    "FACES_MIRROR_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "faces")
+)
+GALLERY_SYNC_INTERVAL = 30
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+# autoindex 每行格式：<a href="1001.jpg">1001.jpg</a>      10-Oct-2025 20:27     123456
+_LISTING_META_RE = re.compile(r"(\d{2}-\w{3}-\d{4} \d{2}:\d{2})\s+(\d+)")
+
+
+class GalleryMirror:
+    def __init__(self, faces_url, session, mirror_dir=FACES_MIRROR_DIR, interval=GALLERY_SYNC_INTERVAL,
+                 timeout=10, on_change=None):
+        """
+        faces_url: Nginx autoindex 目录地址
+        session: 复用的 requests 会话
+        on_change: 镜像有变化时的回调，参数为 GalleryMirror 本身（用于刷新特征索引）
+        """
+        self.faces_url = faces_url
+        self.session = session
+        self.mirror_dir = mirror_dir
+        self.interval = interval
+        self.timeout = timeout
+        self.on_change = on_change
+        self.last_sync = 0
+        self._manifest_path = os.path.join(mirror_dir, "manifest.json")
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        os.makedirs(mirror_dir, exist_ok=True)
+        # 文件名 -> {"version": 列表中的 "修改时间|大小", "etag": 下载时的 ETag}
+        self._manifest = self._load_manifest()
+
+    # ---------- 清单 ----------
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            # 只保留本地文件仍然存在的条目
+            return {n: m for n, m in manifest.items() if os.path.exists(self.path_of(n))}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest):
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self._manifest_path)
+
+    # ---------- 读取 ----------
+    def path_of(self, name):
+        return os.path.join(self.mirror_dir, name)
+
+    def files(self):
+        """本地镜像中的人脸文件名"""
+        with self._lock:
+            return sorted(self._manifest)
+
+    def version_of(self, name):
+        with self._lock:
+            meta = self._manifest.get(name)
+        return meta and (meta.get("version") or meta.get("etag"))
+
+    def load(self, name):
+        return cv2.imread(self.path_of(name), cv2.IMREAD_COLOR)
+
+    # ---------- 同步 ----------
+    def list_remote(self):
+        """读取远端目录，返回 {文件名: 版本号}；无法解析修改时间/大小时版本号为 None"""
+        html = self.session.get(self.faces_url, timeout=self.timeout).text
+        soup = BeautifulSoup(html, "html.parser")
+        listing = {}
+        for a in soup.find_all("a"):
+            href = (a.get("href") or "").strip()
+            if not href or href in ("../", "./") or href.endswith("/"):
+                continue
+            if not href.lower().endswith(IMAGE_EXTS):
+                continue
+            # 去掉链接中的目录部分后解码；解码后仍含分隔符（%2F、%5C 编码）或以点开头的文件名不同步
+            name = unquote(href.rsplit("/", 1)[-1])
+            if not name or name.startswith(".") or os.path.basename(name) != name or "/" in name or "\\" in name:
+                continue
+            meta = _LISTING_META_RE.search(str(a.next_sibling or ""))
+            listing[name] = f"{meta.group(1)}|{meta.group(2)}" if meta else None
+        return listing
+
+    def _download(self, name, etag=None):
+        """下载单张图片到镜像目录（先写临时文件再替换），未变化（304）时返回 None"""
+        headers = {"If-None-Match": etag} if etag else {}
+        resp = self.session.get(urljoin(self.faces_url, quote(name)), headers=headers, timeout=self.timeout)
+        if resp.status_code == 304:
+            return None
+        resp.raise_for_status()
+        tmp_path = self.path_of(name) + ".part"
+        with open(tmp_path, "wb") as f:
+            f.write(resp.content)
+        os.replace(tmp_path, self.path_of(name))
+        return resp.headers.get("ETag", "")
+
+    def sync(self):
+        """增量同步一次，返回是否有变化"""
+        listing = self.list_remote()
+        with self._lock:
+            manifest = dict(self._manifest)
+        changed = False
+
+        for name, version in listing.items():
+            meta = manifest.get(name)
+            if meta and version is not None and meta.get("version") == version:
+                continue
+            try:
+                etag = self._download(name, meta.get("etag") if meta else None)
+            except Exception as e:
+                print(f"[警告] 同步人脸图片 {name} 失败: {e}")
+                continue
+            if etag is None:
+                continue  # 304 未变化
+            manifest[name] = {"version": version, "etag": etag}
+            changed = True
+
+        for name in set(manifest) - set(listing):
+            manifest.pop(name)
+            try:
+                os.remove(self.path_of(name))
+            except OSError:
+                pass
+            changed = True
+
+        with self._lock:
+            self._manifest = manifest
+        if changed:
+            self._save_manifest(manifest)
+        self.last_sync = time.time()
+        if changed and self.on_change:
+            self.on_change(self)
+        return changed
+
+    def _sync_loop(self):
+        # 先用已有的本地镜像对齐特征索引，再开始增量同步
+        if self.on_change and self.files():
+            try:
+                self.on_change(self)
+            except Exception as e:
+                print(f"[警告] 人脸库变更回调失败: {e}")
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"[警告] 人脸库同步失败: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """启动后台同步线程；本地已有镜像时立即可用"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sync_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def index_fetcher(self, name, known_version):
+        """供 FaceIndex.refresh 使用：版本未变化时不读取图片"""
+        version = self.version_of(name)
+        if known_version is not None and known_version == version:
+            return version, None
+        return version, self.load(name)
@@ -0,0 +1,208 @@
+# face_index.py
+"""
+人脸特征索引
+人脸库中每张图片只提取一次特征向量并持久化（记录版本号，图片变化时才重新提取）；
+登录时只对截图提取一次特征，再与全部向量做一次矩阵运算求余弦最近邻，
+替代逐张 DeepFace.verify（每次都要重新检测、提取两张图的特征）
+提取特征前先缩小图片并用 Haar 级联快速裁出人脸，DeepFace 只处理裁好的小图
+"""
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+MODEL_NAME = os.getenv("MODEL_NAME", "VGG-Face")
+FACE_INDEX_PATH = os.getenv(
+    "FACE_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "face_index.npz")
+)
+FACE_MAX_DIM = int(os.getenv("FACE_MAX_DIM", "480"))   # 提取特征前图片最长边
+FACE_CROP_MARGIN = 0.25                                # 裁剪人脸时四周保留的比例
+FACE_PIPELINE = "haar-crop-v1"                         # 预处理流程标识，变化后旧索引需要重建
+
+_cascade = None
+_cascade_lock = threading.Lock()
+
+
+def _face_cascade():
+    global _cascade
+    with _cascade_lock:
+        if _cascade is None:
+            _cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        return _cascade
+
+
+def limit_size(img, max_dim=FACE_MAX_DIM):
+    """最长边超过 max_dim 时等比缩小"""
+    h, w = img.shape[:2]
+    scale = max_dim / max(h, w)
+    if scale >= 1:
+        return img
+    return cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+def crop_face(img, margin=FACE_CROP_MARGIN):
+    """用 Haar 级联检测最大的人脸并带边距裁剪，未检测到时返回 None"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    faces = _face_cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(48, 48))
+    if len(faces) == 0:
+        return None
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    dx, dy = int(w * margin), int(h * margin)
+    H, W = img.shape[:2]
+    return img[max(0, y - dy):min(H, y + h + dy), max(0, x - dx):min(W, x + w + dx)]
+
+
+def default_threshold(model_name):
+    """与 DeepFace.verify 一致的余弦距离阈值"""
+    try:
+        from deepface.modules.verification import find_threshold
+        return find_threshold(model_name, "cosine")
+    except Exception:
+        return 0.68  # VGG-Face + cosine
+
+
+class FaceIndex:
+    def __init__(self, model_name=MODEL_NAME, index_path=FACE_INDEX_PATH, threshold=None):
+        self.model_name = model_name
+        self.index_path = index_path
+        self.threshold = float(os.getenv("FACE_THRESHOLD", default_threshold(model_name))) \
+            if threshold is None else threshold
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._names = []                 # 人脸库文件名
+        self._versions = {}              # 文件名 -> 版本号（ETag/mtime 等）
+        self._matrix = np.zeros((0, 0), dtype=np.float32)   # 每行一个归一化特征向量
+        self.ready = False               # 模型是否已预热
+        self.load_error = None
+        self._load()
+
+    # ---------- 持久化 ----------
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            data = np.load(self.index_path, allow_pickle=False)
+            if str(data["model"]) != self.model_name or \
+                    "pipeline" not in data.files or str(data["pipeline"]) != FACE_PIPELINE:
+                return  # 模型或预处理流程变了，旧向量不可用
+            self._names = [str(n) for n in data["names"]]
+            self._versions = dict(zip(self._names, (str(v) for v in data["versions"])))
+            self._matrix = data["vectors"].astype(np.float32)
+        except Exception as e:
+            print(f"[警告] 读取人脸特征索引失败，将重新建立: {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = self.index_path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            model=np.array(self.model_name),
+            pipeline=np.array(FACE_PIPELINE),
+            names=np.array(self._names, dtype=str),
+            versions=np.array([self._versions[n] for n in self._names], dtype=str),
+            vectors=self._matrix,
+        )
+        os.replace(tmp_path, self.index_path)
+
+    # ---------- 特征 ----------
+    def warm_up(self):
+        """
+        导入 DeepFace、构建模型并做一次空推理，之后的识别请求不再承担冷启动开销
+        返回是否成功
+        """
+        try:
+            from deepface import DeepFace
+            DeepFace.build_model(self.model_name)
+            self.embed(np.zeros((224, 224, 3), dtype=np.uint8))
+            self.ready = True
+            self.load_error = None
+        except Exception as e:
+            self.load_error = str(e)
+            print(f"[错误] 人脸模型预热失败: {e}")
+        return self.ready
+
+    def embed(self, img):
+        """
+        提取一张人脸的归一化特征向量
+        先缩小并裁出人脸，裁剪成功时跳过 DeepFace 自带的检测；未检测到人脸时退回整图
+        """
+        from deepface import DeepFace
+        img = limit_size(img)
+        face = crop_face(img)
+        if face is not None:
+            reps = DeepFace.represent(img_path=face, model_name=self.model_name, detector_backend="skip")
+        else:
+            reps = DeepFace.represent(img_path=img, model_name=self.model_name, enforce_detection=False)
+        vec = np.asarray(reps[0]["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def __len__(self):
+        return len(self._names)
+
+    def refresh(self, names, fetch):
+        """
+        与人脸库同步：
+        names: 当前人脸库文件名列表
+        fetch(name, known_version) -> (version, img)；img 为 None 表示未变化
+        只对新增/变化的图片提取特征，删除的图片移出索引，有变化时落盘
+        """
+        with self._refresh_lock:
+            return self._refresh(list(names), fetch)
+
+    def _refresh(self, names, fetch):
+        current = dict(zip(self._names, self._matrix))
+        versions = dict(self._versions)
+        changed = set(current) - set(names)
+
+        for name in names:
+            try:
+                version, img = fetch(name, versions.get(name) if name in current else None)
+            except Exception as e:
+                print(f"[警告] 获取人脸图片 {name} 失败: {e}")
+                continue
+            if img is None:
+                continue
+            try:
+                current[name] = self.embed(img)
+                versions[name] = version or ""
+                changed.add(name)
+            except Exception as e:
+                print(f"[警告] 提取人脸特征 {name} 失败: {e}")
+
+        if not changed:
+            return False
+
+        kept = [n for n in names if n in current]
+        matrix = np.stack([current[n] for n in kept]).astype(np.float32) if kept \
+            else np.zeros((0, 0), dtype=np.float32)
+        with self._lock:
+            self._names = kept
+            self._versions = {n: versions[n] for n in kept}
+            self._matrix = matrix
+            self._save()
+        return True
+
+    # ---------- 检索 ----------
+    def search(self, probe_vec):
+        """返回 (最相近的文件名, 余弦距离)；索引为空时返回 (None, None)"""
+        with self._lock:
+            names, matrix = self._names, self._matrix
+        if not names:
+            return None, None
+        distances = 1.0 - matrix @ probe_vec
+        best = int(np.argmin(distances))
+        return names[best], float(distances[best])
+
+    def match(self, probe_img):
+        """
+        对截图提取一次特征并在索引中查找
+        返回 (文件名, 距离)，距离超过阈值时文件名为 None
+        """
+        name, distance = self.search(self.embed(probe_img))
+        if name is None or distance > self.threshold:
+            return None, distance
+        return name, distance
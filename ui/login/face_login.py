@@ -1,20 +1,23 @@
 from flask import Flask, request, jsonify
-from deepface import DeepFace
-import base64, cv2, numpy as np, requests, os, time
-from urllib.parse import urljoin
-from bs4 import BeautifulSoup
+import base64, cv2, numpy as np, requests, os, time, threading
 from requests.adapters import HTTPAdapter, Retry
 from flask_cors import CORS
-from tools.connector import MySQLConnector
+from tools.connector import PooledMySQLConnector
+from face_index import FaceIndex
+from face_gallery import GalleryMirror
+from face_worker import FaceWorkerPool, FaceBusyError
 app = Flask(__name__)
 CORS(app)
 
 # ========= 配置 =========
 FACES_URL = os.getenv("FACES_URL", "http://192.168.1.105/faces/")  # Nginx autoindex 目录
 MODEL_NAME = os.getenv("MODEL_NAME", "VGG-Face")
-DIST_METRIC = os.getenv("DIST_METRIC", "cosine")
 REQUEST_TIMEOUT = 10
-LIST_CACHE_TTL = 30
+GALLERY_SYNC_INTERVAL = 30
+FACE_READY_TIMEOUT = 60   # 模型未就绪时请求排队等待的最长秒数
+# 前端抓拍参数：最长边像素与 JPEG 质量，页面按此缩小后再上传
+CAPTURE_MAX_DIM = int(os.getenv("CAPTURE_MAX_DIM", "480"))
+CAPTURE_QUALITY = float(os.getenv("CAPTURE_QUALITY", "0.8"))
 
 # HTTP 会话（带重试）
 session = requests.Session()
@@ -23,8 +26,61 @@ retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 50
 session.mount("http://", HTTPAdapter(max_retries=retries))
 session.mount("https://", HTTPAdapter(max_retries=retries))
 
-# 目录缓存
-_gallery_cache = {"ts": 0, "files": []}
+# 人脸特征索引（余弦距离）
+face_index = FaceIndex(model_name=MODEL_NAME)
+
+
+def refresh_face_index(gallery):
+    """本地镜像有变化时增量更新特征索引"""
+    if face_index.refresh(gallery.files(), gallery.index_fetcher):
+        log(f"🧬 人脸特征索引已更新，共 {len(face_index)} 条")
+
+
+# 人脸识别工作池：限制并发、排队满时返回繁忙、合并重复截图
+face_pool = FaceWorkerPool(face_index)
+
+
+# 人脸库本地镜像，后台增量同步，登录时不访问网络（模型预热完成后启动）
+gallery = GalleryMirror(FACES_URL, session, interval=GALLERY_SYNC_INTERVAL, timeout=REQUEST_TIMEOUT,
+                        on_change=refresh_face_index)
+
+
+def warm_up_face_service():
+    """启动预热：导入 DeepFace、构建模型并做一次空推理，然后开始同步人脸库"""
+    log(f"⏳ 开始预加载人脸模型 {MODEL_NAME} ...")
+    started = time.time()
+    if face_index.warm_up():
+        log(f"✅ 人脸模型预加载完成，用时 {time.time() - started:.1f}s")
+    else:
+        log(f"❌ 人脸模型预加载失败: {face_index.load_error}")
+    gallery.start()
+
+
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+
+def start_face_service():
+    """后台启动预热（只启动一次）；直接运行时在启动前调用，其它方式加载应用时由第一个请求触发"""
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=warm_up_face_service, daemon=True).start()
+
+
+@app.before_request
+def ensure_face_service():
+    start_face_service()
+
+
+def wait_face_ready(timeout=FACE_READY_TIMEOUT):
+    """模型未就绪时让请求排队等待，超时或加载失败返回 False"""
+    deadline = time.time() + timeout
+    while not face_index.ready and face_index.load_error is None and time.time() < deadline:
+        time.sleep(0.2)
+    return face_index.ready
 
 
 # ---------- 工具函数 ----------
@@ -32,41 +88,32 @@ def log(msg):
     """统一日志输出"""
     print(time.strftime("[%Y-%m-%d %H:%M:%S]"), msg, flush=True)
 
-def decode_data_url(data_url: str):
-    b64 = data_url.split(",", 1)[1]
-    img_bytes = base64.b64decode(b64)
-    arr = np.frombuffer(img_bytes, np.uint8)
-    return cv2.imdecode(arr, cv2.IMREAD_COLOR)
-
-def url_to_cv2(url: str):
-    resp = session.get(url, timeout=REQUEST_TIMEOUT)
-    resp.raise_for_status()
-    arr = np.frombuffer(resp.content, np.uint8)
-    img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+def decode_image_bytes(img_bytes: bytes):
+    """解码 multipart 上传的 JPEG/PNG 二进制图像"""
+    img = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("图像解码失败")
     return img
 
-def list_gallery_autoindex():
-    now = time.time()
-    if _gallery_cache["files"] and now - _gallery_cache["ts"] < LIST_CACHE_TTL:
-        return _gallery_cache["files"]
-
-    log(f"📂 正在从 {FACES_URL} 获取目录列表...")
-    html = session.get(FACES_URL, timeout=REQUEST_TIMEOUT).text
-    soup = BeautifulSoup(html, "html.parser")
-
-    files = []
-    for a in soup.find_all("a"):
-        href = (a.get("href") or "").strip()
-        if not href or href in ("../", "./") or href.endswith("/"):
-            continue
-        low = href.lower()
-        if low.endswith((".jpg", ".jpeg", ".png")):
-            files.append(href.split("/")[-1])
-
-    _gallery_cache["files"] = files
-    _gallery_cache["ts"] = now
-    log(f"✅ 获取到 {len(files)} 张人脸图片")
-    return files
+def decode_data_url(data_url: str):
+    """解析前端传来的Base64图像（兼容旧版页面）"""
+    return decode_image_bytes(base64.b64decode(data_url.split(",", 1)[1]))
+
+def read_probe():
+    """
+    读取上传的截图，返回 (原始数据, 解码函数)
+    优先使用 multipart 二进制字段 image，兼容 JSON 中的 Base64 data URL
+    """
+    upload = request.files.get("image")
+    if upload is not None:
+        return upload.read(), decode_image_bytes
+    data = request.get_json(silent=True) or {}
+    return data.get("image"), decode_data_url
+
+def client_key():
+    """区分浏览器会话：优先使用前端传来的 X-Client-Id，否则用 IP + UA"""
+    return request.headers.get("X-Client-Id") or f"{request.remote_addr}|{request.user_agent.string}"
+
 
 def get_user_info(emp_id: str):
     """
@@ -83,7 +130,7 @@ def get_user_info(emp_id: str):
         }
     若查无结果返回 None
     """
-    db = MySQLConnector()
+    db = PooledMySQLConnector()
     sql = """
     SELECT 
         u.user_id,
@@ -123,59 +170,53 @@ def get_user_info(emp_id: str):
 @app.route("/health", methods=["GET"])
 def health():
     try:
-        flist = list_gallery_autoindex()
-        return jsonify({"ok": True, "faces": len(flist)})
+        return jsonify({"ok": True, "ready": face_index.ready, "model_error": face_index.load_error,
+                        "faces": len(gallery.files()), "indexed": len(face_index),
+                        "last_sync": gallery.last_sync, "workers": face_pool.stats()})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+@app.route("/face_capture_profile", methods=["GET"])
+def face_capture_profile():
+    return jsonify({"max_dim": CAPTURE_MAX_DIM, "quality": CAPTURE_QUALITY, "field": "image"})
+
+
 @app.route("/recognize_face", methods=["POST"])
 def recognize_face():
     try:
-        data = request.get_json(silent=True) or {}
-        data_url = data.get("image")
-        if not data_url:
+        payload, decode = read_probe()
+        if not payload:
             return jsonify({"success": False, "message": "未接收到图像数据"}), 400
 
-        # 解码图像
-        probe = decode_data_url(data_url)
+        if not wait_face_ready():
+            return jsonify({"success": False, "message": "人脸模型加载中，请稍后重试"}), 503
+
         log("🖼️ 收到一帧截图，开始识别...")
 
-        gallery_files = list_gallery_autoindex()
-        if not gallery_files:
+        if not len(face_index):
             log("❌ 无法读取人脸库或人脸库为空")
             return jsonify({"success": False, "message": "人脸库为空或不可访问"}), 500
 
-        # 逐张对比
-        for idx, fname in enumerate(gallery_files, 1):
-            face_url = urljoin(FACES_URL, fname)
-            try:
-                candidate = url_to_cv2(face_url)
-                result = DeepFace.verify(
-                    img1_path=probe,
-                    img2_path=candidate,
-                    model_name=MODEL_NAME,
-                    distance_metric=DIST_METRIC,
-                    enforce_detection=False
-                )
-
-                verified = result.get("verified")
-                distance = result.get("distance")
-                log(f"比对[{idx}/{len(gallery_files)}] {fname} → 结果: {verified} 距离: {distance:.4f}")
-
-                if verified:
-                    emp_id = os.path.splitext(fname)[0]
-                    log(f"✅ 识别成功！匹配工号：{emp_id}")
-                    result = get_user_info(emp_id)
-                    print(result)
-                    return jsonify({"success": True,
-                                    "emp_id": emp_id,
-                                    "role":result['role'],
-                                    "name":result['name']
-                                    })
-
-            except Exception as e:
-                log(f"[警告] 比对 {fname} 出错: {e}")
+        # 在工作池中解码并比对：截图只提取一次特征，与全部人脸向量一次比对
+        try:
+            fname, distance = face_pool.recognize(client_key(), payload, decode)
+        except FaceBusyError as e:
+            log(f"⏳ {e}")
+            return jsonify({"success": False, "busy": True, "message": str(e)}), 429
+        if distance is not None:
+            log(f"最近邻: {fname} 距离: {distance:.4f}")
+        if fname:
+            emp_id = os.path.splitext(fname)[0]
+            log(f"✅ 识别成功！匹配工号：{emp_id}")
+            result = get_user_info(emp_id)
+            print(result)
+            if result:
+                return jsonify({"success": True,
+                                "emp_id": emp_id,
+                                "role": result['role'],
+                                "name": result['name']
+                                })
 
         log("🚫 未匹配到任何人脸")
         return jsonify({"success": False, "message": "未匹配到人脸"})
@@ -186,5 +227,6 @@ def recognize_face():
 
 
 if __name__ == "__main__":
+    start_face_service()
     log(f"🚀 Flask 人脸识别服务启动中 | 端口: 6000 | FACES_URL: {FACES_URL}")
-    app.run(host="0.0.0.0", port=6001)
+    app.run(host="0.0.0.0", port=6001, threaded=True)
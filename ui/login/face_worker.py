@@ -0,0 +1,112 @@
+# face_worker.py
+"""
+人脸识别工作池
+- 解码截图、提取特征、比对都在工作线程中执行（eventlet 下走 tpool 系统线程），不阻塞事件循环
+- 同时进行的识别数有上限，排队数超过上限时直接返回繁忙，避免请求无限堆积
+- 同一客户端重复提交的相同截图合并为一次识别，短时间内直接复用结果；
+  同一客户端上一帧尚未识别完时，新的截图直接返回繁忙
+"""
+
+import hashlib
+import os
+import threading
+
+from tools.ttl_cache import TTLCache
+
+FACE_WORKERS = int(os.getenv("FACE_WORKERS", "2"))          # 同时进行的识别数
+FACE_QUEUE_SIZE = int(os.getenv("FACE_QUEUE_SIZE", "8"))    # 允许排队的识别数
+FACE_QUEUE_TIMEOUT = 30                                     # 排队等待的最长秒数
+FACE_DEDUP_TTL = 10                                         # 相同截图复用结果的秒数
+
+
+class FaceBusyError(Exception):
+    """识别队列已满或同一客户端上一帧仍在识别中"""
+
+
+class _InFlight:
+    """一次正在进行中的识别，供相同截图等待结果"""
+
+    def __init__(self, digest):
+        self.digest = digest
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class FaceWorkerPool:
+    def __init__(self, face_index, run_blocking=None, max_workers=FACE_WORKERS, max_queue=FACE_QUEUE_SIZE,
+                 queue_timeout=FACE_QUEUE_TIMEOUT, dedup_ttl=FACE_DEDUP_TTL):
+        """
+        face_index: FaceIndex 实例
+        run_blocking(fn, *args): 在系统线程中执行阻塞调用；为 None 时在当前线程执行
+        """
+        self.face_index = face_index
+        self.run_blocking = run_blocking or (lambda fn, *args: fn(*args))
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+        self._pending = 0                 # 正在识别 + 排队中的请求数
+        self._inflight = {}               # 客户端 -> _InFlight
+        self._results = TTLCache(ttl=dedup_ttl, max_size=256)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "workers": self.max_workers, "queue": self.max_queue}
+
+    def recognize(self, client_key, payload, decode):
+        """
+        识别一帧截图，返回 (文件名或 None, 距离)
+        client_key: 区分浏览器会话的标识
+        payload: 原始图像数据（str/bytes），用于去重
+        decode(payload) -> 图像，在工作线程中执行
+        队列已满或同一客户端上一帧仍在识别时抛出 FaceBusyError
+        """
+        raw = payload.encode() if isinstance(payload, str) else payload
+        digest = hashlib.sha1(raw).hexdigest()
+        key = (client_key, digest)
+        cached = self._results.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            flight = self._inflight.get(client_key)
+            if flight is not None and flight.digest != digest:
+                raise FaceBusyError("上一帧仍在识别中，请稍候")
+            is_leader = flight is None
+            if is_leader:
+                if self._pending >= self.max_workers + self.max_queue:
+                    raise FaceBusyError("人脸识别请求过多，请稍后重试")
+                self._pending += 1
+                flight = _InFlight(digest)
+                self._inflight[client_key] = flight
+
+        if not is_leader:
+            if not flight.event.wait(self.queue_timeout):
+                raise FaceBusyError("等待识别结果超时")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                raise FaceBusyError("人脸识别排队超时，请稍后重试")
+            try:
+                result = self.run_blocking(self._match, payload, decode)
+            finally:
+                self._slots.release()
+            self._results.set(key, result)
+            flight.result = result
+            return result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._inflight.pop(client_key, None)
+            flight.event.set()
+
+    def _match(self, payload, decode):
+        return self.face_index.match(decode(payload))
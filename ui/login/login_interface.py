@@ -1,21 +1,25 @@
 import os
 import sys
 import time
+import threading
 import base64
+import hmac
 import logging
 import cv2
 import numpy as np
 import requests
 from datetime import datetime
-from urllib.parse import urljoin
-from bs4 import BeautifulSoup
 from requests.adapters import HTTPAdapter, Retry
 from flask import Flask, render_template, request, jsonify, redirect, url_for
 from flask_socketio import SocketIO, emit
 from flask_cors import CORS
 
 # 导入数据库连接器
-from tools.connector import MySQLConnector
+from tools.connector import PooledMySQLConnector
+from tools.ttl_cache import TTLCache
+from face_index import FaceIndex
+from face_gallery import GalleryMirror
+from face_worker import FaceWorkerPool, FaceBusyError
 
 # ===================== 初始化 Flask 应用 =====================
 app = Flask(__name__, template_folder='templates')
@@ -25,9 +29,11 @@ CORS(app)
 # ===================== 初始化 SocketIO =====================
 try:
     import eventlet
+    from eventlet import tpool
     eventlet.monkey_patch()
     socketio = SocketIO(app, async_mode='eventlet')
 except ImportError:
+    tpool = None
     socketio = SocketIO(app)
 
 # ===================== 日志配置 =====================
@@ -48,50 +54,118 @@ logger = logging.getLogger('UnifiedLogin')
 # ===================== 人脸识别配置 =====================
 FACES_URL = os.getenv("FACES_URL", "http://192.168.1.130/faces/")
 MODEL_NAME = os.getenv("MODEL_NAME", "VGG-Face")
-DIST_METRIC = os.getenv("DIST_METRIC", "cosine")
 REQUEST_TIMEOUT = 10
-LIST_CACHE_TTL = 30
+GALLERY_SYNC_INTERVAL = 30
+FACE_READY_TIMEOUT = 60   # 模型未就绪时请求排队等待的最长秒数
+# 前端抓拍参数：最长边像素与 JPEG 质量，页面按此缩小后再上传
+CAPTURE_MAX_DIM = int(os.getenv("CAPTURE_MAX_DIM", "480"))
+CAPTURE_QUALITY = float(os.getenv("CAPTURE_QUALITY", "0.8"))
 
 # HTTP 会话
 session = requests.Session()
 retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
 session.mount("http://", HTTPAdapter(max_retries=retries))
-_gallery_cache = {"ts": 0, "files": []}
+
+# 人脸特征索引（余弦距离）
+face_index = FaceIndex(model_name=MODEL_NAME)
+
+
+def run_blocking(fn, *args):
+    """在系统线程中执行模型加载/推理等阻塞调用，eventlet 下不阻塞事件循环"""
+    if tpool is not None:
+        return tpool.execute(fn, *args)
+    return fn(*args)
+
+
+def refresh_face_index(gallery):
+    """本地镜像有变化时增量更新特征索引"""
+    if run_blocking(face_index.refresh, gallery.files(), gallery.index_fetcher):
+        logger.info(f"人脸特征索引已更新，共 {len(face_index)} 条")
+
+
+# 人脸识别工作池：限制并发、排队满时返回繁忙、合并重复截图
+face_pool = FaceWorkerPool(face_index, run_blocking=run_blocking)
+
+
+# 人脸库本地镜像，后台增量同步，登录时不访问网络（模型预热完成后启动）
+gallery = GalleryMirror(FACES_URL, session, interval=GALLERY_SYNC_INTERVAL, timeout=REQUEST_TIMEOUT,
+                        on_change=refresh_face_index)
+
+
+def warm_up_face_service():
+    """启动预热：导入 DeepFace、构建模型并做一次空推理，然后开始同步人脸库"""
+    logger.info(f"开始预加载人脸模型 {MODEL_NAME} ...")
+    started = time.time()
+    if run_blocking(face_index.warm_up):
+        logger.info(f"人脸模型预加载完成，用时 {time.time() - started:.1f}s")
+    else:
+        logger.error(f"人脸模型预加载失败: {face_index.load_error}")
+    gallery.start()
+
+
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+
+def start_face_service():
+    """后台启动预热（只启动一次）；直接运行时在启动前调用，其它方式加载应用时由第一个请求触发"""
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    socketio.start_background_task(warm_up_face_service)
+
+
+@app.before_request
+def ensure_face_service():
+    start_face_service()
+
+
+def wait_face_ready(timeout=FACE_READY_TIMEOUT):
+    """模型未就绪时让请求排队等待（不占用事件循环），超时或加载失败返回 False"""
+    deadline = time.time() + timeout
+    while not face_index.ready and face_index.load_error is None and time.time() < deadline:
+        socketio.sleep(0.2)
+    return face_index.ready
 
 # ===================== 工具函数 =====================
+def decode_image_bytes(img_bytes: bytes):
+    """解码 multipart 上传的 JPEG/PNG 二进制图像"""
+    img = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("图像解码失败")
+    return img
+
 def decode_data_url(data_url: str):
-    """解析前端传来的Base64图像"""
-    b64 = data_url.split(",", 1)[1]
-    img_bytes = base64.b64decode(b64)
-    arr = np.frombuffer(img_bytes, np.uint8)
-    return cv2.imdecode(arr, cv2.IMREAD_COLOR)
-
-def url_to_cv2(url: str):
-    resp = session.get(url, timeout=REQUEST_TIMEOUT)
-    resp.raise_for_status()
-    return cv2.imdecode(np.frombuffer(resp.content, np.uint8), cv2.IMREAD_COLOR)
-
-def list_gallery_autoindex():
-    """从人脸库服务器中读取图片文件名"""
-    now = time.time()
-    if _gallery_cache["files"] and now - _gallery_cache["ts"] < LIST_CACHE_TTL:
-        return _gallery_cache["files"]
-    html = session.get(FACES_URL, timeout=REQUEST_TIMEOUT).text
-    soup = BeautifulSoup(html, "html.parser")
-    files = []
-    for a in soup.find_all("a"):
-        href = (a.get("href") or "").strip()
-        if not href or href in ("../", "./") or href.endswith("/"):
-            continue
-        low = href.lower()
-        if low.endswith((".jpg", ".jpeg", ".png")):
-            files.append(href.split("/")[-1])
-    _gallery_cache.update({"files": files, "ts": now})
-    return files
+    """解析前端传来的Base64图像（兼容旧版页面）"""
+    return decode_image_bytes(base64.b64decode(data_url.split(",", 1)[1]))
+
+def read_probe():
+    """
+    读取上传的截图，返回 (原始数据, 解码函数)
+    优先使用 multipart 二进制字段 image，兼容 JSON 中的 Base64 data URL
+    """
+    upload = request.files.get("image")
+    if upload is not None:
+        return upload.read(), decode_image_bytes
+    data = request.get_json(silent=True) or {}
+    return data.get("image"), decode_data_url
+
+def client_key():
+    """区分浏览器会话：优先使用前端传来的 X-Client-Id，否则用 IP + UA"""
+    return request.headers.get("X-Client-Id") or f"{request.remote_addr}|{request.user_agent.string}"
+
+# 人脸登录用户信息缓存（按工号），审批/改密后通过 /api/invalidate_credentials 失效
+PROFILE_CACHE_TTL = 60
+_profile_cache = TTLCache(ttl=PROFILE_CACHE_TTL, max_size=4096)
 
 def get_user_info(emp_id: str):
-    """根据工号查询用户信息"""
-    db = MySQLConnector()
+    """根据工号查询用户信息（读穿透缓存，只缓存存在的用户）"""
+    cached = _profile_cache.get(str(emp_id))
+    if cached is not None:
+        return cached
+    db = PooledMySQLConnector()
     sql = """
     SELECT 
         u.user_id,
@@ -111,21 +185,22 @@ def get_user_info(emp_id: str):
         if not results:
             return None
         user_id, role, name = results[0]
-        return {"user_id": user_id, "role": role, "name": name}
+        profile = {"user_id": user_id, "role": role, "name": name}
+        _profile_cache.set(str(emp_id), profile)
+        return profile
     except Exception as e:
         logger.error(f"数据库查询出错: {e}")
         return None
-    finally:
-        db.close()
 
 # ===================== 登录逻辑 =====================
 try:
-    from ui.login.src.loginCheck import loginCheck
+    from ui.login.src.loginCheck import loginCheck, invalidate_credentials
     login_checker = loginCheck()
     logger.info("登录检查模块导入成功")
 except ImportError as e:
     logger.error(f"无法导入登录检查模块: {e}")
     login_checker = None
+    invalidate_credentials = None
 
 face_detection_sessions = {}
 
@@ -200,42 +275,65 @@ def register():
         logger.error(f"注册过程中发生错误: {e}")
         return jsonify({'success': False, 'message': f'系统错误: {str(e)}'})
 
+# ----------- 账号缓存失效（注册审批、修改密码后由教师端调用） -----------
+def _internal_request_allowed():
+    """内部接口只接受本机请求，或携带与全局配置一致的共享令牌（X-Internal-Token）的请求"""
+    if request.remote_addr in ('127.0.0.1', '::1'):
+        return True
+    try:
+        from global_config import Global_Config
+        token = Global_Config.internal_api_token
+    except ImportError:
+        token = os.getenv('INTERNAL_API_TOKEN', '')
+    supplied = request.headers.get('X-Internal-Token', '')
+    return bool(token) and hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8'))
+
+@app.route('/api/invalidate_credentials', methods=['POST'])
+def invalidate_credentials_api():
+    if not _internal_request_allowed():
+        return jsonify({'success': False, 'message': '无权访问'}), 403
+    data = request.get_json(silent=True) or {}
+    user_nos = data.get('user_nos') or ([data['user_no']] if data.get('user_no') else [])
+    identity = data.get('identity')
+    for user_no in user_nos:
+        _profile_cache.invalidate(str(user_no))
+        if invalidate_credentials is not None:
+            invalidate_credentials(user_no, identity)
+    return jsonify({'success': True, 'invalidated': len(user_nos)})
+
 # ----------- 人脸识别登录 -----------
+@app.route("/face_capture_profile", methods=["GET"])
+def face_capture_profile():
+    """前端抓拍参数：截图按最长边缩小、按该质量压缩为 JPEG 后以 multipart 上传"""
+    return jsonify({"max_dim": CAPTURE_MAX_DIM, "quality": CAPTURE_QUALITY, "field": "image"})
+
 @app.route("/recognize_face", methods=["POST"])
 def recognize_face():
-    from deepface import DeepFace
     try:
-        data = request.get_json(silent=True) or {}
-        data_url = data.get("image")
-        if not data_url:
+        payload, decode = read_probe()
+        if not payload:
             return jsonify({"success": False, "message": "未接收到图像数据"}), 400
-        probe = decode_data_url(data_url)
-        gallery_files = list_gallery_autoindex()
-        if not gallery_files:
+        if not wait_face_ready():
+            return jsonify({"success": False, "message": "人脸模型加载中，请稍后重试"}), 503
+        if not len(face_index):
             return jsonify({"success": False, "message": "人脸库为空或不可访问"}), 500
-        for fname in gallery_files:
-            try:
-                candidate = url_to_cv2(urljoin(FACES_URL, fname))
-                result = DeepFace.verify(
-                    img1_path=probe,
-                    img2_path=candidate,
-                    model_name=MODEL_NAME,
-                    distance_metric=DIST_METRIC,
-                    enforce_detection=False
-                )
-                if result.get("verified"):
-                    emp_id = os.path.splitext(fname)[0]
-                    user = get_user_info(emp_id)
-                    if user:
-                        logger.warning(f"匹配成功："+str(user))
-                        return jsonify({
-                            "success": True,
-                            "emp_id": emp_id,
-                            "role": user["role"],
-                            "name": user["name"]
-                        })
-            except Exception as e:
-                logger.warning(f"比对 {fname} 出错: {e}")
+        # 在工作池中解码并比对：截图只提取一次特征，与全部人脸向量一次比对
+        try:
+            fname, distance = face_pool.recognize(client_key(), payload, decode)
+        except FaceBusyError as e:
+            logger.info(f"人脸识别繁忙: {e}")
+            return jsonify({"success": False, "busy": True, "message": str(e)}), 429
+        if fname:
+            emp_id = os.path.splitext(fname)[0]
+            user = get_user_info(emp_id)
+            if user:
+                logger.warning(f"匹配成功（距离 {distance:.4f}）："+str(user))
+                return jsonify({
+                    "success": True,
+                    "emp_id": emp_id,
+                    "role": user["role"],
+                    "name": user["name"]
+                })
         return jsonify({"success": False, "message": "未匹配到人脸"})
     except Exception as e:
         logger.error(f"人脸识别错误: {e}")
@@ -260,8 +358,9 @@ def teacher_redirect():
 @app.route('/health', methods=['GET'])
 def health():
     try:
-        flist = list_gallery_autoindex()
-        return jsonify({"ok": True, "faces": len(flist)})
+        return jsonify({"ok": True, "ready": face_index.ready, "model_error": face_index.load_error,
+                        "faces": len(gallery.files()), "indexed": len(face_index),
+                        "last_sync": gallery.last_sync, "workers": face_pool.stats()})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -278,4 +377,5 @@ def handle_disconnect():
 if __name__ == '__main__':
     logger.info("✅ 启动统一登录服务（账号密码 + 人脸识别）")
     logger.info("访问地址: http://localhost:5000/login_page")
+    start_face_service()
     socketio.run(app, host='0.0.0.0', port=5000, debug=False, allow_unsafe_werkzeug=True)
@@ -1,114 +1,113 @@
 # auth_service.py
 
 import hashlib
+import hmac
 import logging
 
 from global_config import Login_Session
-from tools.connector import MySQLConnector
+from tools.connector import PooledMySQLConnector
+from tools.ttl_cache import TTLCache
 
 # 配置日志
 logger = logging.getLogger('LoginCheck')
 
+CREDENTIAL_CACHE_TTL = 60   # 账号信息缓存秒数，审批/改密后主动失效
+
+# 按身份查询账号，sno / tno 为主键，走索引精确匹配
+ACCOUNT_SQL = {
+    'student': "SELECT sno, student_password, name FROM student WHERE sno = %s",
+    'teacher': "SELECT tno, teacher_password, name FROM teacher WHERE tno = %s",
+}
+
+# 账号缓存：(身份, 学号/工号) -> {'id', 'name', 'password_digest'}，只缓存存在的账号，不保存明文密码
+_account_cache = TTLCache(ttl=CREDENTIAL_CACHE_TTL, max_size=4096)
+
+
+def invalidate_credentials(user_no=None, identity=None):
+    """
+    注册审批通过、修改密码后调用，使缓存的账号信息失效
+    不指定身份时两种身份都失效；不指定账号时清空全部
+    """
+    if user_no is None:
+        _account_cache.clear()
+        return
+    for ident in ([identity] if identity else ACCOUNT_SQL):
+        _account_cache.invalidate((ident, str(user_no).strip()))
+
 
 class loginCheck:
     def __init__(self):
-        try:
-            self.db = MySQLConnector()
-        except Exception as e:
-            logger.error(f"初始化数据库连接失败: {e}")
-            self.db = None
+        # 连接池在首次查询时创建，各请求共享
+        self.db = PooledMySQLConnector()
 
     def hash_password(self, password):
         """对密码进行哈希加密"""
         return hashlib.sha256(password.encode()).hexdigest()
 
+    def get_account(self, user_no, identity):
+        """
+        读取账号信息（读穿透缓存），账号不存在时返回 None
+        返回: {'id', 'name', 'password_digest'}
+        """
+        key = (identity, str(user_no).strip())
+        account = _account_cache.get(key)
+        if account is not None:
+            return account
+        sql = ACCOUNT_SQL[identity]
+        logger.info(f"执行{'学生' if identity == 'student' else '教师'}账号查询: {sql}, 参数: {key[1]}")
+        results = self.db.query(sql, (key[1],))
+        if not results:
+            return None
+        user_data = results[0]
+        account = {
+            'id': user_data[0],
+            'name': user_data[2],
+            'password_digest': self.hash_password(str(user_data[1])),
+        }
+        _account_cache.set(key, account)
+        return account
+
     def verify_user(self, username, password, identity):
         """
         验证用户登录信息
         返回: (success, user_info, message)
         """
+        identity = 'student' if identity == 'student' else 'teacher'
         try:
-            # 检查数据库连接
-            if self.db is None:
-                self.db = MySQLConnector()
-                if self.db is None:
-                    raise Exception("无法初始化数据库连接")
-
-            # 根据身份选择不同的查询逻辑
-            if identity == 'student':
-                # 学生登录逻辑 - 使用student表，包含name字段
-                sql = "SELECT sno, student_password, name FROM student WHERE sno = %s"
-                logger.info(f"执行学生登录查询: {sql}, 参数: {username}")
-                results = self.db.query(sql, (username,))
-
-                if not results:
-                    return False, None, "学号不存在"
-
-                user_data = results[0]
-                stored_password = user_data[1]
-
-                # 验证密码
-                if password == stored_password:
-                    user_info = {
-                        'id': user_data[0],
-                        'username': user_data[0],  # 使用学号作为用户名
-                        'identity': 'student',
-                        'name': user_data[2]  # 包含姓名信息
-                    }
-                    # 设置会话信息
-                    Login_Session.user_id = user_data[0]
-                    Login_Session.username = user_data[0]
-                    Login_Session.account_name = user_data[2]  # 设置为真实姓名
-                    Login_Session.sno = int(user_data[0])
-                    return True, user_info, "登录成功"
-                else:
-                    return False, None, "密码错误"
-            else:
-                # 教师登录逻辑 - 使用teacher表，包含name字段
-                sql = "SELECT tno, teacher_password, name FROM teacher WHERE tno = %s"
-                logger.info(f"执行教师登录查询: {sql}, 参数: {username}")
-                results = self.db.query(sql, (username,))
-
-                if not results:
-                    return False, None, "教师账号不存在"
-
-                user_data = results[0]
-                stored_password = user_data[1]
-
-                # 验证密码
-                if password == stored_password:
-                    user_info = {
-                        'id': user_data[0],
-                        'username': user_data[0],  # 使用教师ID作为用户名
-                        'identity': 'teacher',
-                        'name': user_data[2]  # 包含姓名信息
-                    }
-                    # 设置会话信息
-                    Login_Session.user_id = user_data[0]
-                    Login_Session.username = user_data[0]
-                    Login_Session.account_name = user_data[2]  # 设置为真实姓名
-                    return True, user_info, "登录成功"
-                else:
-                    return False, None, "密码错误"
-
+            account = self.get_account(username, identity)
         except Exception as e:
             logger.error(f"数据库查询错误：{e}")
             return False, None, "系统错误，请稍后重试"
-        finally:
-            # 确保关闭数据库连接
-            if hasattr(self, 'db') and self.db:
-                try:
-                    self.db.close()
-                except Exception as e:
-                    logger.error(f"关闭数据库连接失败: {e}")
 
-    def register_user(self, user_id, password, user_type, user_name, user_approve):
+        if account is None:
+            return False, None, "学号不存在" if identity == 'student' else "教师账号不存在"
+
+        # 验证密码
+        if not hmac.compare_digest(self.hash_password(password), account['password_digest']):
+            return False, None, "密码错误"
+
         try:
-            if self.db is None:
-                self.db = MySQLConnector()
-                if self.db is None:
-                    raise Exception("Failed to initialize database connection")
+            sno = int(account['id']) if identity == 'student' else None
+        except (TypeError, ValueError) as e:
+            logger.error(f"学号格式错误：{account['id']!r}，{e}")
+            return False, None, "系统错误，请稍后重试"
+
+        user_info = {
+            'id': account['id'],
+            'username': account['id'],  # 使用学号/教师ID作为用户名
+            'identity': identity,
+            'name': account['name']  # 包含姓名信息
+        }
+        # 设置会话信息
+        Login_Session.user_id = account['id']
+        Login_Session.username = account['id']
+        Login_Session.account_name = account['name']  # 设置为真实姓名
+        if sno is not None:
+            Login_Session.sno = sno
+        return True, user_info, "登录成功"
 
+    def register_user(self, user_id, password, user_type, user_name, user_approve):
+        try:
             check_sql = "SELECT user_id FROM register WHERE user_id = %s"
             existing_user = self.db.query(check_sql, (user_id,))
 
@@ -122,19 +121,9 @@ class loginCheck:
         except Exception as e:
             logger.error(f"User registration error: {e}")
             return False, "Registration failed, please try again later"
-        finally:
-            if hasattr(self, 'db') and self.db:
-                try:
-                    self.db.close()
-                except Exception as e:
-                    logger.error(f"Failed to close database connection: {e}")
+
     def verify_approving_teacher(self, teacher_id):
         try:
-            if self.db is None:
-                self.db = MySQLConnector()
-                if self.db is None:
-                    raise Exception("Failed to initialize database connection")
-
             sql = "SELECT tno FROM teacher WHERE tno = %s"
             results = self.db.query(sql, (teacher_id,))
 
@@ -146,92 +135,37 @@ class loginCheck:
         except Exception as e:
             logger.error(f"Approving teacher verification error: {e}")
             return False, "System error, please try again later"
-        finally:
-            if hasattr(self, 'db') and self.db:
-                try:
-                    self.db.close()
-                except Exception as e:
-                    logger.error(f"Failed to close database connection: {e}")
 
     def verify_face_id(self, face_id):
         """
         验证人脸ID
+        face_id 格式为 "student_face_<学号>" 或 "teacher_face_<工号>"
         返回: (success, user_info, message)
         """
-        try:
-            # 检查数据库连接
-            if self.db is None:
-                self.db = MySQLConnector()
-                if self.db is None:
-                    raise Exception("无法初始化数据库连接")
-
-            # 实际应用中应该有一个人脸数据表，这里只是一个临时实现
-            # 假设face_id的格式为 "student_face_123" 或 "teacher_face_123"
-            # 其中123是学号或教师ID
-
-            # 解析face_id，提取身份和ID信息
-            parts = face_id.split('_')
-            if len(parts) < 3:
-                return False, None, "无效的人脸ID格式"
-
-            identity = parts[0]  # student或teacher
-            if identity not in ['student', 'teacher']:
-                return False, None, "无效的身份类型"
-
-            # 尝试从face_id中提取用户ID
-            user_id_part = face_id.replace(f"{identity}_face_", "")
-
-            if identity == 'student':
-                # 学生人脸验证逻辑
-                # 假设face_id中的最后部分是学号的一部分或完整学号
-                # 这里需要根据实际的人脸数据表结构修改
-                sql = "SELECT student_id, student_password, name FROM student WHERE student_id LIKE %s"
-                logger.info(f"执行学生人脸验证查询: {sql}, 参数: %{user_id_part}%")
-                results = self.db.query(sql, (f"%{user_id_part}%",))
-
-                if not results:
-                    return False, None, "未找到匹配的学生信息"
-
-                # 如果找到多个匹配，取第一个
-                user_data = results[0]
-                user_info = {
-                    'id': user_data[0],
-                    'username': user_data[0],  # 使用学号作为用户名
-                    'identity': 'student',
-                    'face_id': face_id,
-                    'name': user_data[2]  # 包含姓名信息
-                }
-                return True, user_info, "人脸识别验证成功"
-            else:
-                # 教师人脸验证逻辑
-                # 使用teacher表，根据face_id匹配教师信息
-                # 实际应用中应该有一个人脸数据表关联face_id和teacher_id
-                # 这里假设face_id中的最后部分与教师ID相关
-                sql = "SELECT teacher_id, teacher_password, name FROM teacher WHERE teacher_id LIKE %s"
-                logger.info(f"执行教师人脸验证查询: {sql}, 参数: %{user_id_part}%")
-                results = self.db.query(sql, (f"%{user_id_part}%",))
-
-                if not results:
-                    return False, None, "未找到匹配的教师信息"
-
-                # 如果找到多个匹配，取第一个
-                user_data = results[0]
-                user_info = {
-                    'id': user_data[0],
-                    'username': user_data[0],  # 使用教师ID作为用户名
-                    'identity': 'teacher',
-                    'face_id': face_id,
-                    'name': user_data[2]  # 包含姓名信息
-                }
-                return True, user_info, "人脸识别验证成功"
+        # 解析face_id，提取身份和ID信息
+        parts = face_id.split('_')
+        if len(parts) < 3:
+            return False, None, "无效的人脸ID格式"
 
+        identity = parts[0]  # student或teacher
+        if identity not in ['student', 'teacher']:
+            return False, None, "无效的身份类型"
+
+        user_no = face_id.replace(f"{identity}_face_", "")
+        try:
+            account = self.get_account(user_no, identity)
         except Exception as e:
             logger.error(f"人脸验证错误：{e}")
             return False, None, "系统错误，请稍后重试"
-        finally:
-            # 确保关闭数据库连接
-            if hasattr(self, 'db') and self.db:
-                try:
-                    self.db.close()
-                except Exception as e:
-                    logger.error(f"关闭数据库连接失败: {e}")
\ No newline at end of file
+
+        if account is None:
+            return False, None, "未找到匹配的学生信息" if identity == 'student' else "未找到匹配的教师信息"
+
+        user_info = {
+            'id': account['id'],
+            'username': account['id'],  # 使用学号/教师ID作为用户名
+            'identity': identity,
+            'face_id': face_id,
+            'name': account['name']  # 包含姓名信息
+        }
+        return True, user_info, "人脸识别验证成功"
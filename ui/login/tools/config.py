@@ -8,3 +8,8 @@ DB_CONFIG = {
     'database': 'multivideo',
     'auth_plugin': 'mysql_native_password'
 }
+
+
+# 连接池配置
+DB_POOL_SIZE = 10        # 连接池大小（mysql.connector 上限为 32）
+DB_POOL_TIMEOUT = 5      # 连接池耗尽时等待空闲连接的秒数
@@ -1,11 +1,157 @@
 # 简单测试示例 - 只需复制这两个函数到你的项目中使用
+"""
+向学生端 UI 窗口发送消息
+调用方只把消息放入队列立即返回，后台线程负责发送：
+- 线路格式与 UI 端保持一致：每条消息一次连接，发送 UTF-8 JSON 后读取回执再关闭
+- 发送失败时消息留在队列中，按退避间隔重试
+- 得分更新只保留最新一次，快速连续接线时不会把中间的得分逐条发出
+"""
 
 import socket
 import json
+import threading
 import time
 import os
+import atexit
+from collections import deque
+
+UI_HOST = 'localhost'
+UI_PORT = 9999
+CONNECT_TIMEOUT = 3
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 5
+MAX_PENDING = 1000        # UI 不可达期间最多缓存的消息数，超出丢弃最早的
+
+
+def encode_message(message_data):
+    return json.dumps(message_data, ensure_ascii=False).encode('utf-8')
+
+
+class UIMessageClient:
+    """到 UI 窗口的异步消息发送器"""
+
+    def __init__(self, host=UI_HOST, port=UI_PORT):
+        self.host = host
+        self.port = port
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=MAX_PENDING)   # 按顺序发送的消息
+        self._score = None                         # 最新的得分更新（只保留最后一次）
+        self._sending = 0                          # 正在发送的消息数
+        self._thread = None
+        self.connected = threading.Event()         # 最近一次发送是否成功
+
+    # ---------- 入队 ----------
+    def post(self, message_data):
+        """放入发送队列后立即返回"""
+        with self._cond:
+            self._events.append(message_data)
+            self._cond.notify()
+        self._ensure_worker()
+        return True
+
+    def post_score(self, message_data):
+        """得分更新：覆盖尚未发送的旧得分"""
+        with self._cond:
+            self._score = message_data
+            self._cond.notify()
+        self._ensure_worker()
+        return True
+
+    def flush(self, timeout=3):
+        """等待队列中的消息发送完毕，返回是否全部发出"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._events or self._score is not None or self._sending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
 
-def send_ui_message(message, host='localhost', port=9999):
+    def wait_connected(self, timeout=CONNECT_TIMEOUT):
+        self._ensure_worker()
+        return self.connected.wait(timeout)
+
+    # ---------- 后台发送 ----------
+    def _ensure_worker(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _send_one(self, message_data):
+        """按 UI 端的约定发送一条消息：连接、发送 JSON、读取回执、关闭"""
+        with socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT) as sock:
+            sock.sendall(encode_message(message_data))
+            sock.recv(1024)
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._events and self._score is None:
+                self._cond.wait()
+            batch = list(self._events)
+            self._events.clear()
+            if self._score is not None:
+                batch.append(self._score)
+                self._score = None
+            self._sending = len(batch)
+            return batch
+
+    def _requeue(self, batch):
+        """未发出的消息放回队首；期间又有新得分时丢弃旧得分"""
+        with self._cond:
+            for message_data in reversed(batch):
+                if message_data.get('type') == 'update_score':
+                    if self._score is None:
+                        self._score = message_data
+                else:
+                    self._events.appendleft(message_data)
+            self._sending = 0
+            self._cond.notify_all()
+
+    def _run(self):
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            batch = self._take_batch()
+            sent = 0
+            try:
+                for message_data in batch:
+                    self._send_one(message_data)
+                    sent += 1
+                self.connected.set()
+                delay = RECONNECT_MIN_DELAY
+                with self._cond:
+                    self._sending = 0
+                    self._cond.notify_all()
+            except Exception as e:
+                # 任何异常都不能让发送线程退出，否则之后的消息只会堆在队列里
+                print(f"发送到UI窗口失败，{delay:.1f}s 后重试: {e}")
+                self.connected.clear()
+                self._requeue(batch[sent:])
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(host=UI_HOST, port=UI_PORT):
+    """同一地址共享一个常驻连接"""
+    with _clients_lock:
+        client = _clients.get((host, port))
+        if client is None:
+            client = _clients[(host, port)] = UIMessageClient(host, port)
+        return client
+
+
+@atexit.register
+def _flush_all():
+    for client in list(_clients.values()):
+        client.flush(timeout=1)
+
+
+def send_ui_message(message, host=UI_HOST, port=UI_PORT):
     """
     向UI窗口发送消息
 
@@ -13,33 +159,17 @@ def send_ui_message(message, host='localhost', port=9999):
         message (str): 要发送的消息内容
 
     Returns:
-        bool: 发送是否成功
+        bool: 是否已放入发送队列
     """
-    try:
-        print(f"尝试发送消息到 {host}:{port}: {message}")
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client_socket.settimeout(3)
-        client_socket.connect((host, port))
-
-        message_data = {
-            'type': 'info',
-            'content': message
-        }
-
-        json_message = json.dumps(message_data, ensure_ascii=False)
-        client_socket.send(json_message.encode('utf-8'))
-        response = client_socket.recv(1024)
-        client_socket.close()
-        print(f"消息发送成功，收到响应: {response.decode('utf-8')}")
-        return True
-    except Exception as e:
-        print(f"发送失败: {e}")
-        return False
+    return get_client(host, port).post({
+        'type': 'info',
+        'content': message
+    })
 
 
-def update_score(score, host='localhost', port=9999):
+def update_score(score, host=UI_HOST, port=UI_PORT):
     """
-    更新UI界面中的得分显示
+    更新UI界面中的得分显示（未发出的旧得分会被覆盖）
 
     Args:
         score (int): 新的得分值
@@ -47,32 +177,16 @@ def update_score(score, host='localhost', port=9999):
         port (int): 服务器端口，默认为9999
 
     Returns:
-        bool: 更新是否成功
+        bool: 是否已放入发送队列
     """
-    try:
-        print(f"尝试更新得分到 {host}:{port}: {score}分")
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client_socket.settimeout(3)
-        client_socket.connect((host, port))
-
-        message_data = {
-            'type': 'update_score',
-            'score': score,
-            'content': f'得分更新为 {score}分'
-        }
-
-        json_message = json.dumps(message_data, ensure_ascii=False)
-        client_socket.send(json_message.encode('utf-8'))
-        response = client_socket.recv(1024)
-        client_socket.close()
-        print(f"得分更新成功，收到响应: {response.decode('utf-8')}")
-        return True
-    except Exception as e:
-        print(f"更新得分失败: {e}")
-        return False
+    return get_client(host, port).post_score({
+        'type': 'update_score',
+        'score': score,
+        'content': f'得分更新为 {score}分'
+    })
 
 
-def send_wiring_result(end1, end2, score, host='localhost', port=9999):
+def send_wiring_result(end1, end2, score, host=UI_HOST, port=UI_PORT):
     """
     发送接线结果到UI界面
 
@@ -84,90 +198,48 @@ def send_wiring_result(end1, end2, score, host='localhost', port=9999):
         port (int): 服务器端口，默认为9999
 
     Returns:
-        bool: 发送是否成功
+        bool: 是否已放入发送队列
     """
-    try:
-        print(f"尝试发送接线结果到 {host}:{port}: {end1} -> {end2} (得分: {score})")
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client_socket.settimeout(3)
-        client_socket.connect((host, port))
-
-        message_data = {
-            'type': 'wiring_result',
-            'end1': end1,
-            'end2': end2,
-            'score': score,
-            'content': f'接线结果: {end1} -> {end2} (得分: {score})'
-        }
-
-        json_message = json.dumps(message_data, ensure_ascii=False)
-        client_socket.send(json_message.encode('utf-8'))
-        response = client_socket.recv(1024)
-        client_socket.close()
-        print(f"接线结果发送成功，收到响应: {response.decode('utf-8')}")
-        return True
-    except Exception as e:
-        print(f"发送接线结果失败: {e}")
-        return False
+    return get_client(host, port).post({
+        'type': 'wiring_result',
+        'end1': end1,
+        'end2': end2,
+        'score': score,
+        'content': f'接线结果: {end1} -> {end2} (得分: {score})'
+    })
 
 
-def restore_loading_effect(host='localhost', port=9999):
+def restore_loading_effect(host=UI_HOST, port=UI_PORT):
     """
     恢复按钮的动态"正在检测中"效果
 
     Returns:
-        bool: 操作是否成功
+        bool: 是否已放入发送队列
     """
-    try:
-        print(f"尝试恢复动态效果到 {host}:{port}")
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client_socket.settimeout(3)
-        client_socket.connect((host, port))
-
-        message_data = {
-            'type': 'restore_loading',
-            'content': '恢复动态检测效果'
-        }
-
-        json_message = json.dumps(message_data, ensure_ascii=False)
-        client_socket.send(json_message.encode('utf-8'))
-        response = client_socket.recv(1024)
-        client_socket.close()
-        print(f"动态效果恢复成功，收到响应: {response.decode('utf-8')}")
-        return True
-    except Exception as e:
-        print(f"恢复动态效果失败: {e}")
-        return False
+    return get_client(host, port).post({
+        'type': 'restore_loading',
+        'content': '恢复动态检测效果'
+    })
 
 
-def test_connection(host='localhost', port=9999):
+def test_connection(host=UI_HOST, port=UI_PORT):
     """
     测试与UI界面的连接是否正常
     
     Returns:
         bool: 连接是否成功
     """
-    try:
-        print(f"测试连接到 {host}:{port}")
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client_socket.settimeout(3)
-        client_socket.connect((host, port))
-        
-        # 发送测试消息
-        test_data = {
-            'type': 'test_connection',
-            'content': '连接测试'
-        }
-        json_message = json.dumps(test_data, ensure_ascii=False)
-        client_socket.send(json_message.encode('utf-8'))
-        response = client_socket.recv(1024)
-        client_socket.close()
-        
-        print(f"连接测试成功，收到响应: {response.decode('utf-8')}")
+    print(f"测试连接到 {host}:{port}")
+    client = get_client(host, port)
+    client.post({
+        'type': 'test_connection',
+        'content': '连接测试'
+    })
+    if client.wait_connected(CONNECT_TIMEOUT) and client.flush(CONNECT_TIMEOUT):
+        print("连接测试成功")
         return True
-    except Exception as e:
-        print(f"连接测试失败: {e}")
-        return False
+    print("连接测试失败")
+    return False
 
 
 # 测试函数
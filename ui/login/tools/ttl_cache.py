@@ -0,0 +1,62 @@
+# ttl_cache.py
+
+import threading
+import time
+
+
+class TTLCache:
+    """
+    线程安全的过期缓存：读穿透（未命中时调用 loader 加载）+ 写入时主动失效
+    用法：
+        cache = TTLCache(ttl=30)
+        value = cache.get_or_load(key, lambda: query_db(key))
+        cache.invalidate(key)   # 数据被修改后调用
+    """
+
+    def __init__(self, ttl=30, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.max_size and key not in self._data:
+                self._evict()
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_load(self, key, loader):
+        """命中直接返回；未命中调用 loader() 加载并写入缓存"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _evict(self):
+        """先清理过期项，仍然满则丢弃最早写入的一项（调用方需持有锁）"""
+        now = time.monotonic()
+        for k in [k for k, (expires_at, _) in self._data.items() if expires_at < now]:
+            del self._data[k]
+        if len(self._data) >= self.max_size:
+            self._data.pop(next(iter(self._data)))
@@ -2,7 +2,9 @@ import os
 import sys
 import time
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request, send_from_directory
+import json
+from collections import Counter
+from flask import Flask, render_template, jsonify, request, send_from_directory, Response, stream_with_context
 from flask_socketio import SocketIO
 
 # 添加项目根目录到Python路径
@@ -20,7 +22,10 @@ import global_config
 
 # 添加tools目录到Python路径
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../tools')))
-from tools.connector import MySQLConnector
+from tools.connector import PooledMySQLConnector
+from tools.ttl_cache import TTLCache
+from tools.ollama_gateway import ollama_gateway, OllamaBusyError
+from question_bank import QuestionBank, KNOWLEDGE_LIST, DEFAULT_SUBJECT
 
 # 导入项目模块 - 使用延迟导入提高启动速度
 detect_module = None
@@ -130,6 +135,19 @@ student_info = {
 detection_thread = None
 detector = None
 
+# 预生成题库，默认的Ollama配置用于启动时预热
+question_bank = QuestionBank()
+QUESTION_BANK_OLLAMA = {
+    'ip': os.getenv('OLLAMA_IP', '127.0.0.1'),
+    'port': int(os.getenv('OLLAMA_PORT', '11434')),
+    'model_name': os.getenv('OLLAMA_MODEL', 'qwen2.5:1.5b')
+}
+
+
+def start_question_bank():
+    """启动后台题库生成，为所有知识点预生成题目"""
+    question_bank.prefill(QUESTION_BANK_OLLAMA)
+
 
 @app.route('/api/start_detection', methods=['POST'])
 def start_detection():
@@ -209,6 +227,15 @@ def get_student_info():
     })
 
 
+def build_chat_prompt(question):
+    """组装对话prompt"""
+    return f"""你是一个智能的AI助手，专门帮助学生解答问题。请用友好、专业的态度回答以下问题：
+
+问题：{question}
+
+请提供详细、准确的回答："""
+
+
 @app.route('/api/ai_chat', methods=['POST'])
 def ai_chat():
     """AI对话接口 - 使用Ollama模型"""
@@ -224,28 +251,11 @@ def ai_chat():
         if not question:
             return jsonify({'success': False, 'message': '请输入问题'})
 
-        # 组装对话prompt
-        prompt = f"""你是一个智能的AI助手，专门帮助学生解答问题。请用友好、专业的态度回答以下问题：
-
-问题：{question}
-
-请提供详细、准确的回答："""
-
-        # 调用Ollama API
-        url = f"http://{ip}:{port}/api/generate"
-        payload = {
-            "model": model_name,
-            "prompt": prompt,
-            "stream": False
-        }
+        prompt = build_chat_prompt(question)
 
+        # 通过网关调用Ollama API（连接复用、并发限制、相同问题合并与缓存）
         try:
-            response = requests.post(url, json=payload, timeout=60)
-            response.raise_for_status()
-            result = response.json()
-
-            # 获取生成的回答
-            answer = result.get('response', '抱歉，我暂时无法回答这个问题。')
+            answer = ollama_gateway.generate(ip, port, model_name, prompt) or '抱歉，我暂时无法回答这个问题。'
 
             return jsonify({
                 'success': True,
@@ -253,6 +263,8 @@ def ai_chat():
                 'timestamp': datetime.now().strftime('%H:%M:%S')
             })
 
+        except OllamaBusyError as e:
+            return jsonify({'success': False, 'message': str(e)})
         except requests.exceptions.RequestException as e:
             return jsonify({'success': False, 'message': f'Ollama服务连接失败: {str(e)}'})
         except Exception as e:
@@ -262,6 +274,35 @@ def ai_chat():
         return jsonify({'success': False, 'message': f'AI对话出错: {str(e)}'})
 
 
+@app.route('/api/ai_chat_stream', methods=['POST'])
+def ai_chat_stream():
+    """AI对话接口（流式）- 以 SSE 格式逐段返回Ollama生成的内容"""
+    data = request.get_json(silent=True) or {}
+    question = data.get('question', '').strip()
+    ip = data.get('ip', '192.168.1.130')
+    port = data.get('port', 11434)
+    model_name = data.get('model_name', 'qwen2.5:1.5b')
+
+    if not question:
+        return jsonify({'success': False, 'message': '请输入问题'})
+
+    def sse(payload):
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    def events():
+        try:
+            for token in ollama_gateway.stream_generate(ip, port, model_name, build_chat_prompt(question)):
+                yield sse({'token': token})
+            yield sse({'done': True, 'timestamp': datetime.now().strftime('%H:%M:%S')})
+        except OllamaBusyError as e:
+            yield sse({'error': str(e)})
+        except Exception as e:
+            yield sse({'error': f'Ollama调用失败: {str(e)}'})
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 # 新增：题目生成相关路由
 @app.route('/api/get_subjects', methods=['GET'])
 def get_subjects():
@@ -345,101 +386,38 @@ def generate_multiple_questions():
 # 新增：使用Ollama生成题目
 @app.route('/api/generate_question_by_ollama', methods=['POST'])
 def generate_question_by_ollama():
-    """使用Ollama大模型生成题目"""
+    """
+    从预生成题库取题，大模型生成只在后台补充题库时进行，不在请求中同步调用
+    题库收录默认学科下 KNOWLEDGE_LIST 中的知识点，页面选择的学科名不参与取题
+    """
     try:
-        import requests
-
         data = request.get_json()
         ip = data.get('ip', '127.0.0.1')
         port = data.get('port', 11434)
         model_name = data.get('model_name', 'qwen2.5:1.5b')
-        subject_filter = data.get('subject', '电力拖动系统')  # 默认学科为电力拖动系统
-        knowledge_filter = data.get('knowledge', '')  # 可选的知识点过滤
+        knowledge_filter = (data.get('knowledge') or '').strip()  # 可选的知识点过滤
 
         # 如果没有指定知识点，使用默认知识点
         if not knowledge_filter:
             knowledge_filter = '电力拖动系统'
-
-        # 组装prompt - 生成2道选择题+2道填空题+1道简答题
-        prompt = f"""请根据以下知识点为电力拖动系统专业学生生成2道选择题、2道填空题和1道简答题：
-
-学科：{subject_filter}
-知识点：{knowledge_filter}
-
-请严格按照以下格式生成题目，**不要添加任何额外的分隔符、标记或解释性文字**：
-
-选择题1：
-题目：题干内容
-A. 选项A
-B. 选项B
-C. 选项C
-D. 选项D
-答案：A/B/C/D
-解析：详细解析
-
-选择题2：
-题目：题干内容
-A. 选项A
-B. 选项B
-C. 选项C
-D. 选项D
-答案：A/B/C/D
-解析：详细解析
-
-填空题1：
-题目：题干内容
-答案：参考答案
-解析：详细解析
-
-填空题2：
-题目：题干内容
-答案：参考答案
-解析：详细解析
-
-简答题：
-题目：题干内容
-答案：参考答案
-解析：详细解析
-
-要求：
-1. 题目要专业准确，符合电力拖动系统教学要求
-2. 选择题选项要合理，有干扰性
-3. 填空题要考察学生对知识点的记忆和理解
-4. 简答题要考察学生对知识点的深入理解和应用能力
-5. 解析要详细，帮助学生理解知识点
-6. **非常重要：不要生成任何额外的分隔符（如###、===等）或装饰性文本，只生成符合上述格式的题目内容**"""
-
-        # 调用Ollama API
-        url = f"http://{ip}:{port}/api/generate"
-        payload = {
-            "model": model_name,
-            "prompt": prompt,
-            "stream": False
-        }
-
-        try:
-            response = requests.post(url, json=payload, timeout=60)
-            response.raise_for_status()
-            result = response.json()
-
-            # 解析返回的题目内容
-            generated_text = result.get('response', '')
-
-            # 简单的格式解析
-            question_data = {
-                'subject': subject_filter,
-                'knowledge': knowledge_filter,
-                'question': generated_text,
-                'raw_response': generated_text
-            }
-
-            return jsonify({'success': True, 'question': question_data})
-
-        except requests.exceptions.RequestException as e:
-            return jsonify({'success': False, 'message': f'Ollama服务连接失败: {str(e)}'})
-        except Exception as e:
-            return jsonify({'success': False, 'message': f'Ollama调用失败: {str(e)}'})
-
+        if knowledge_filter not in KNOWLEDGE_LIST:
+            return jsonify({'success': False, 'message': f'未知的知识点: {knowledge_filter}'}), 400
+
+        # 余量不足时 take 已把该知识点加入后台补充队列
+        ollama_config = {'ip': ip, 'port': port, 'model_name': model_name}
+        banked = question_bank.take(DEFAULT_SUBJECT, knowledge_filter, ollama_config)
+        if not banked:
+            return jsonify({'success': False, 'refilling': True,
+                            'message': f'题库补充中，请稍后再试（知识点：{knowledge_filter}）'})
+
+        return jsonify({'success': True, 'question': {
+            'subject': DEFAULT_SUBJECT,
+            'knowledge': knowledge_filter,
+            'question': banked['raw_text'],
+            'raw_response': banked['raw_text'],
+            'items': banked['items'],
+            'from_bank': True
+        }})
     except Exception as e:
         return jsonify({'success': False, 'message': f'生成题目失败: {str(e)}'})
 
@@ -592,21 +570,8 @@ def get_knowledge_analysis():
 def get_knowledge_list():
     """获取所有知识点列表"""
     try:
-        # 直接返回用户提供的知识点列表
-        knowledge_list = [
-            '电力拖动系统', '负载转矩', '电磁转矩', '机械特性', '固有机械特性', '人为机械特性',
-            '启动', '直接启动', '降压启动', '星 - 三角启动', '自耦变压器降压启动', '软启动',
-            '调速', '无级调速', '有级调速', '变极调速', '变频调速', '变转差率调速', '串级调速',
-            '制动', '能耗制动', '反接制动', '回馈制动', '直流电动机拖动', '交流异步电动机拖动',
-            '交流同步电动机拖动', '伺服拖动系统', '步进电动机拖动', '拖动系统稳定性', '电机选型',
-            '传动比', '飞轮矩', '动态响应', '静态转速降', '调速范围', '稳速精度', '电枢回路',
-            '励磁回路', '变压调速（直流）', '弱磁调速（直流）', 'V/F 控制', '矢量控制',
-            '直接转矩控制（DTC）', '负载特性', '恒转矩负载', '恒功率负载', '通风机类负载',
-            '启动转矩', '最大转矩', '转差率', '同步转速', '额定转速', '过载能力', '启动电流',
-            '制动电阻', '调速装置', '变频器', '伺服驱动器', '电枢电阻调速', '电磁制动',
-            '机械制动', '拖动系统效率', '动态调速性能', '静态调速性能', '电机正反转控制',
-            '拖动系统建模', '仿真分析', '实际运行调试', '负载匹配', '节能控制'
-        ]
+        # 知识点列表与题库共用
+        knowledge_list = KNOWLEDGE_LIST
         return jsonify({'success': True, 'knowledge_list': knowledge_list})
     except Exception as e:
         return jsonify({'success': False, 'message': f'获取知识点列表失败: {str(e)}'})
@@ -655,32 +620,44 @@ def get_score_and_contact():
 
 @app.route('/api/get_wiring_status', methods=['GET'])
 def get_wiring_status():
-    """获取完整的接线情况数据"""
+    """获取接线情况数据，接线历史按 since 游标增量返回"""
     try:
-        from global_config import Global_Config
+        from global_config import Global_Config, get_wiring_results_since
+
+        since = request.args.get('since', 0, type=int)
+        epoch = request.args.get('epoch', type=int)
+        limit = min(request.args.get('limit', 100, type=int), 500)
 
         # 获取最新的接线结果
         latest_contacts = []
         if Global_Config.current_A is not None and Global_Config.current_B is not None:
             latest_contacts = [Global_Config.current_A, Global_Config.current_B]
 
-        # 获取所有接线结果历史
+        # 只返回序号大于 since 的接线记录；epoch 变化（分数已重置）时从头返回
+        results, oldest_seq, latest_seq, epoch = get_wiring_results_since(since, limit, epoch)
         wiring_results = []
-        for result in Global_Config.wiring_results:
+        for result in results:
             wiring_results.append({
-                'id': len(wiring_results) + 1,
+                'id': result['seq'],
                 'end1': result['end1'],
                 'end2': result['end2'],
                 'score': result['score'],
                 'timestamp': result['timestamp']
             })
 
+        # 没有返回记录说明已读到最新
+        next_since = wiring_results[-1]['id'] if wiring_results else latest_seq
+
         return jsonify({
             'success': True,
             'airSwitchClosed': Global_Config.switch_status,
             'errorWiringCount': Global_Config.error_wiring_count,
             'currentContacts': latest_contacts,
             'wiringResults': wiring_results,
+            'nextSince': next_since,
+            'epoch': epoch,
+            'oldestSeq': oldest_seq,
+            'hasMore': next_since < latest_seq,
             'totalScore': Global_Config.total_score
         })
     except Exception as e:
@@ -688,6 +665,98 @@ def get_wiring_status():
 
 
 # 新的学生成绩可视化API
+# 学生成绩查询缓存（按学号），考试结果写入后调用 invalidate_student_cache 失效
+# 数据库出错时查询返回空列表，空结果不缓存，避免一次故障让学生在 ttl 内都看到“没有成绩”
+STUDENT_CACHE_TTL = 60
+_student_exams_cache = TTLCache(ttl=STUDENT_CACHE_TTL)
+_student_scores_cache = TTLCache(ttl=STUDENT_CACHE_TTL)
+_student_knowledge_cache = TTLCache(ttl=STUDENT_CACHE_TTL)
+
+# 易错知识点在 exam_result 中以中文逗号分隔存储；按 (学号, 考试, 知识点) 预先拆分计数存入
+# exam_result_knowledge，考试结果写入（调用 invalidate_student_cache）时刷新该学生的计数，
+# 查询时直接在库内 GROUP BY 汇总
+KNOWLEDGE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS exam_result_knowledge (
+    student_no VARCHAR(64) NOT NULL,
+    test_id VARCHAR(64) NOT NULL,
+    knowledge VARCHAR(255) NOT NULL,
+    cnt INT NOT NULL,
+    PRIMARY KEY (student_no, test_id, knowledge)
+)
+"""
+STUDENT_KNOWLEDGE_SQL = """
+SELECT knowledge, SUM(cnt) AS total FROM exam_result_knowledge
+WHERE student_no = %s
+GROUP BY knowledge
+ORDER BY total DESC
+"""
+_knowledge_table_ready = False
+_knowledge_refreshed = set()   # 本进程内已刷新过计数的学号，未刷新过的学生首次查询时补算
+
+
+def _ensure_knowledge_table(connector):
+    global _knowledge_table_ready
+    if not _knowledge_table_ready:
+        _knowledge_table_ready = connector.execute(KNOWLEDGE_TABLE_SQL)
+    return _knowledge_table_ready
+
+
+def refresh_student_knowledge(student_no):
+    """按 exam_result 重新计算该学生各次考试的易错知识点计数，整体替换旧计数"""
+    connector = PooledMySQLConnector()
+    if not _ensure_knowledge_table(connector):
+        return False
+    try:
+        with connector.transaction() as tx:
+            rows = tx.query(
+                "SELECT test_id, knowledge FROM exam_result "
+                "WHERE student_no = %s AND knowledge IS NOT NULL AND knowledge != ''",
+                (student_no,)
+            )
+            counts = Counter()
+            for test_id, knowledge in rows:
+                counts.update((str(test_id), name.strip()) for name in str(knowledge).split('，') if name.strip())
+            tx.execute("DELETE FROM exam_result_knowledge WHERE student_no = %s", (student_no,))
+            tx.executemany(
+                "INSERT INTO exam_result_knowledge (student_no, test_id, knowledge, cnt) VALUES (%s, %s, %s, %s)",
+                [(student_no, test_id, name, cnt) for (test_id, name), cnt in counts.items()]
+            )
+    except Exception as e:
+        print(f"❌ 刷新易错知识点计数失败：{e}")
+        return False
+    _knowledge_refreshed.add(str(student_no))
+    return True
+
+
+def invalidate_student_cache(student_no):
+    """学生考试结果变化后刷新易错知识点计数并清除其缓存"""
+    refresh_student_knowledge(student_no)
+    for cache in (_student_exams_cache, _student_scores_cache, _student_knowledge_cache):
+        cache.invalidate(str(student_no))
+
+
+def _load_student_exams(student_no):
+    connector = PooledMySQLConnector()
+    sql = "SELECT DISTINCT test_id, test_name FROM exam_result WHERE student_no = %s ORDER BY test_id"
+    results = connector.query(sql, (student_no,))
+    return [{'test_id': row[0], 'test_name': row[1]} for row in results]
+
+
+def _load_student_scores(student_no):
+    connector = PooledMySQLConnector()
+    sql = "SELECT test_id, test_name, test_score FROM exam_result WHERE student_no = %s ORDER BY test_id"
+    results = connector.query(sql, (student_no,))
+    return [{'test_id': row[0], 'test_name': row[1], 'score': int(row[2])} for row in results]
+
+
+def _load_student_knowledge(student_no):
+    if str(student_no) not in _knowledge_refreshed:
+        refresh_student_knowledge(student_no)
+    connector = PooledMySQLConnector()
+    results = connector.query(STUDENT_KNOWLEDGE_SQL, (student_no,))
+    return [{'name': row[0], 'count': int(row[1])} for row in results]
+
+
 @app.route('/api/student/exams', methods=['GET'])
 def get_student_exams():
     """获取学生参加过的所有考试"""
@@ -699,18 +768,8 @@ def get_student_exams():
         if not student_no:
             return jsonify({'success': False, 'message': '未获取到学生学号'})
 
-        # 连接数据库查询学生参加过的考试
-        connector = MySQLConnector()
-        sql = "SELECT DISTINCT test_id, test_name FROM exam_result WHERE student_no = %s ORDER BY test_id"
-        results = connector.query(sql, (student_no,))
-
-        # 格式化结果
-        exams = []
-        for row in results:
-            exams.append({
-                'test_id': row[0],
-                'test_name': row[1]
-            })
+        exams = _student_exams_cache.get_or_load(str(student_no), lambda: _load_student_exams(student_no),
+                                                 cache_empty=False)
 
         return jsonify({'success': True, 'exams': exams})
     except Exception as e:
@@ -728,19 +787,8 @@ def get_student_score():
         if not student_no:
             return jsonify({'success': False, 'message': '未获取到学生学号'})
 
-        # 连接数据库查询学生成绩
-        connector = MySQLConnector()
-        sql = "SELECT test_id, test_name, test_score FROM exam_result WHERE student_no = %s ORDER BY test_id"
-        results = connector.query(sql, (student_no,))
-
-        # 格式化结果
-        scores = []
-        for row in results:
-            scores.append({
-                'test_id': row[0],
-                'test_name': row[1],
-                'score': int(row[2])
-            })
+        scores = _student_scores_cache.get_or_load(str(student_no), lambda: _load_student_scores(student_no),
+                                                   cache_empty=False)
 
         return jsonify({'success': True, 'scores': scores})
     except Exception as e:
@@ -758,31 +806,26 @@ def get_student_knowledge():
         if not student_no:
             return jsonify({'success': False, 'message': '未获取到学生学号'})
 
-        # 连接数据库查询学生易错知识点
-        connector = MySQLConnector()
-        sql = "SELECT knowledge FROM exam_result WHERE student_no = %s AND knowledge IS NOT NULL AND knowledge != ''"
-        results = connector.query(sql, (student_no,))
-
-        # 统计知识点出现频率
-        knowledge_count = {}
-        for row in results:
-            # 分割知识点（如果有多个）
-            knowledge_list = row[0].split('，')
-            for knowledge in knowledge_list:
-                knowledge = knowledge.strip()
-                if knowledge:
-                    knowledge_count[knowledge] = knowledge_count.get(knowledge, 0) + 1
-
-        # 转换为列表格式
-        knowledge_list = [{'name': k, 'count': v} for k, v in knowledge_count.items()]
-        # 按出现次数排序
-        knowledge_list.sort(key=lambda x: x['count'], reverse=True)
+        # 知识点频率已在库内汇总并按出现次数排序
+        knowledge_list = _student_knowledge_cache.get_or_load(
+            str(student_no), lambda: _load_student_knowledge(student_no), cache_empty=False)
 
         return jsonify({'success': True, 'knowledge': knowledge_list})
     except Exception as e:
         return jsonify({'success': False, 'message': f'获取易错知识点失败: {str(e)}'})
 
 
+@app.route('/api/student/invalidate_cache', methods=['POST'])
+def invalidate_student_cache_api():
+    """考试结果写入后通知清除学生成绩缓存"""
+    data = request.get_json(silent=True) or {}
+    student_no = data.get('student_no')
+    if not student_no:
+        return jsonify({'success': False, 'message': '未指定学生学号'})
+    invalidate_student_cache(student_no)
+    return jsonify({'success': True})
+
+
 @app.route('/api/get_current_score', methods=['GET'])
 def get_current_score():
     """获取当前实时分数"""
@@ -842,12 +885,25 @@ def set_rule():
         if not os.path.exists(source_file):
             return jsonify({'success': False, 'message': f'规则文件 {selected_rule} 不存在'})
         
-        # 复制文件，覆盖目标文件
-        shutil.copy2(source_file, target_file)
-        
+        # 先复制到临时文件再替换，评分进程的规则监视线程不会读到复制了一半的文件；
+        # 不保留源文件的修改时间，监视线程和规则包的新旧判断都依赖它
+        tmp_file = target_file + '.tmp'
+        shutil.copyfile(source_file, tmp_file)
+        os.replace(tmp_file, target_file)
+
+        # 同时编译规则包（final_rule.rpk），评分时直接按触点序号查表
+        message = f'已成功设置规则文件: {selected_rule}'
+        try:
+            from rule_pack import compile_rule_file
+            compile_rule_file(target_file)
+        except Exception as e:
+            print(f"⚠️ 规则包编译失败: {e}")
+            message += f'（规则包编译失败: {e}）'
+        # 规则切换由检测进程中的规则监视线程完成（发现 final_rule.json 变化后加载并重新评分），这里不必通知
+
         return jsonify({
             'success': True,
-            'message': f'已成功设置规则文件: {selected_rule}'
+            'message': message
         })
     except Exception as e:
         return jsonify({'success': False, 'message': f'设置规则文件失败: {str(e)}'})
@@ -986,6 +1042,7 @@ def test_set_wiring_data():
 if __name__ == '__main__':
     # 启动模拟线程
     reset_contact_status()
+    start_question_bank()
     print("? 启动Web服务器...")
     print("? 请在浏览器中访问: http://localhost:8088")
     print("=" * 50)
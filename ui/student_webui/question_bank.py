@@ -0,0 +1,265 @@
+# question_bank.py
+"""
+预生成题库
+后台线程按 (学科, 知识点, 模型) 调用 Ollama 生成题目，解析后存入本地 SQLite；
+请求到来时直接从题库取题，余量不足时自动补充，大模型生成不再阻塞请求
+只为默认学科下 KNOWLEDGE_LIST 中的知识点建题库，其它取值不取题也不补充
+"""
+
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from global_config import Global_Config
+from tools.ollama_gateway import ollama_gateway
+
+DEFAULT_SUBJECT = '电力拖动系统'
+
+KNOWLEDGE_LIST = [
+    '电力拖动系统', '负载转矩', '电磁转矩', '机械特性', '固有机械特性', '人为机械特性',
+    '启动', '直接启动', '降压启动', '星 - 三角启动', '自耦变压器降压启动', '软启动',
+    '调速', '无级调速', '有级调速', '变极调速', '变频调速', '变转差率调速', '串级调速',
+    '制动', '能耗制动', '反接制动', '回馈制动', '直流电动机拖动', '交流异步电动机拖动',
+    '交流同步电动机拖动', '伺服拖动系统', '步进电动机拖动', '拖动系统稳定性', '电机选型',
+    '传动比', '飞轮矩', '动态响应', '静态转速降', '调速范围', '稳速精度', '电枢回路',
+    '励磁回路', '变压调速（直流）', '弱磁调速（直流）', 'V/F 控制', '矢量控制',
+    '直接转矩控制（DTC）', '负载特性', '恒转矩负载', '恒功率负载', '通风机类负载',
+    '启动转矩', '最大转矩', '转差率', '同步转速', '额定转速', '过载能力', '启动电流',
+    '制动电阻', '调速装置', '变频器', '伺服驱动器', '电枢电阻调速', '电磁制动',
+    '机械制动', '拖动系统效率', '动态调速性能', '静态调速性能', '电机正反转控制',
+    '拖动系统建模', '仿真分析', '实际运行调试', '负载匹配', '节能控制'
+]
+
+BANK_TARGET_SIZE = 3     # 每个知识点保持的题目套数
+BANK_LOW_WATER = 1       # 余量低于该值时触发补充
+RETRY_DELAY = 30         # 生成失败后暂停的秒数
+
+
+
+def is_bank_topic(subject, knowledge):
+    """是否为题库收录的 (学科, 知识点)"""
+    return subject == DEFAULT_SUBJECT and knowledge in KNOWLEDGE_LIST
+
+
+_SECTION_RE = re.compile(r'^\s*((?:选择题|填空题|简答题)\d*)\s*[:：]\s*$', re.MULTILINE)
+_OPTION_RE = re.compile(r'^\s*([A-D])\s*[.．、]\s*(.*)$')
+
+
+def build_question_prompt(subject, knowledge):
+    """组装出题prompt - 生成2道选择题+2道填空题+1道简答题"""
+    return f"""请根据以下知识点为电力拖动系统专业学生生成2道选择题、2道填空题和1道简答题：
+
+学科：{subject}
+知识点：{knowledge}
+
+请严格按照以下格式生成题目，**不要添加任何额外的分隔符、标记或解释性文字**：
+
+选择题1：
+题目：题干内容
+A. 选项A
+B. 选项B
+C. 选项C
+D. 选项D
+答案：A/B/C/D
+解析：详细解析
+
+选择题2：
+题目：题干内容
+A. 选项A
+B. 选项B
+C. 选项C
+D. 选项D
+答案：A/B/C/D
+解析：详细解析
+
+填空题1：
+题目：题干内容
+答案：参考答案
+解析：详细解析
+
+填空题2：
+题目：题干内容
+答案：参考答案
+解析：详细解析
+
+简答题：
+题目：题干内容
+答案：参考答案
+解析：详细解析
+
+要求：
+1. 题目要专业准确，符合电力拖动系统教学要求
+2. 选择题选项要合理，有干扰性
+3. 填空题要考察学生对知识点的记忆和理解
+4. 简答题要考察学生对知识点的深入理解和应用能力
+5. 解析要详细，帮助学生理解知识点
+6. **非常重要：不要生成任何额外的分隔符（如###、===等）或装饰性文本，只生成符合上述格式的题目内容**"""
+
+
+def parse_questions(text):
+    """
+    把大模型按约定格式输出的文本解析为题目列表：
+    [{"type": "选择题1", "title": str, "options": [...], "answer": str, "analysis": str}, ...]
+    缺少题干的段落会被丢弃
+    """
+    parts = _SECTION_RE.split(text or '')
+    questions = []
+    # split 结果为 [前言, 标题1, 内容1, 标题2, 内容2, ...]
+    for header, body in zip(parts[1::2], parts[2::2]):
+        item = {'type': header, 'title': '', 'options': [], 'answer': '', 'analysis': ''}
+        field = None
+        for line in body.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            option = _OPTION_RE.match(line)
+            if line.startswith(('题目：', '题目:')):
+                field, item['title'] = 'title', line[3:].strip()
+            elif line.startswith(('答案：', '答案:')):
+                field, item['answer'] = 'answer', line[3:].strip()
+            elif line.startswith(('解析：', '解析:')):
+                field, item['analysis'] = 'analysis', line[3:].strip()
+            elif option and field in ('title', 'options'):
+                field = 'options'
+                item['options'].append(f"{option.group(1)}. {option.group(2).strip()}")
+            elif field in ('title', 'answer', 'analysis'):
+                # 多行内容续接到上一个字段
+                item[field] += '\n' + line
+        if item['title']:
+            questions.append(item)
+    return questions
+
+
+class QuestionBank:
+    def __init__(self, db_path=Global_Config.question_bank_db, target_size=BANK_TARGET_SIZE,
+                 low_water=BANK_LOW_WATER):
+        self.db_path = str(db_path)
+        self.target_size = target_size
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._worker = None
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        """with 块结束时提交（出错回滚）并关闭连接；sqlite3 连接自身的 with 只提交不关闭"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS question_bank (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    subject TEXT NOT NULL,
+                    knowledge TEXT NOT NULL,
+                    model TEXT,
+                    raw_text TEXT NOT NULL,
+                    items TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("DROP INDEX IF EXISTS idx_bank_topic")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bank_topic_model "
+                         "ON question_bank (subject, knowledge, model, id)")
+
+    def count(self, subject, knowledge, model):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM question_bank WHERE subject = ? AND knowledge = ? AND model = ?",
+                (subject, knowledge, model)
+            ).fetchone()[0]
+
+    def take(self, subject, knowledge, ollama_config):
+        """
+        按 ollama_config 中的模型取出一套题目（取出即删除），余量不足时在后台补充
+        题库为空或不收录该知识点时返回 None；其它模型生成的题目不会被取出
+        """
+        if not is_bank_topic(subject, knowledge):
+            return None
+        model = ollama_config['model_name']
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, raw_text, items, model FROM question_bank "
+                "WHERE subject = ? AND knowledge = ? AND model = ? ORDER BY id LIMIT 1",
+                (subject, knowledge, model)
+            ).fetchone()
+            if row:
+                conn.execute("DELETE FROM question_bank WHERE id = ?", (row[0],))
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM question_bank WHERE subject = ? AND knowledge = ? AND model = ?",
+                (subject, knowledge, model)
+            ).fetchone()[0]
+
+        if remaining < self.low_water:
+            self.request_refill(subject, knowledge, ollama_config)
+        if row is None:
+            return None
+        return {'raw_text': row[1], 'items': json.loads(row[2]), 'model': row[3]}
+
+    def add(self, subject, knowledge, model, raw_text, items):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO question_bank (subject, knowledge, model, raw_text, items, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (subject, knowledge, model, raw_text, json.dumps(items, ensure_ascii=False), time.time())
+            )
+
+    def request_refill(self, subject, knowledge, ollama_config):
+        """
+        把 (学科, 知识点, 模型) 加入后台补充队列，重复请求和题库不收录的知识点会被忽略
+        ollama_config: {'ip': ..., 'port': ..., 'model_name': ...}
+        """
+        if not is_bank_topic(subject, knowledge):
+            return
+        key = (subject, knowledge, ollama_config['model_name'])
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._queue.put((subject, knowledge, dict(ollama_config)))
+        self.start()
+
+    def prefill(self, ollama_config, subject=DEFAULT_SUBJECT, knowledge_list=KNOWLEDGE_LIST):
+        """启动时为所有知识点预生成题目"""
+        for knowledge in knowledge_list:
+            self.request_refill(subject, knowledge, ollama_config)
+
+    def start(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._refill_worker, daemon=True)
+                self._worker.start()
+
+    def _refill_worker(self):
+        while True:
+            subject, knowledge, config = self._queue.get()
+            try:
+                while self.count(subject, knowledge, config['model_name']) < self.target_size:
+                    raw_text = ollama_gateway.generate(
+                        config['ip'], config['port'], config['model_name'],
+                        build_question_prompt(subject, knowledge), use_cache=False
+                    )
+                    items = parse_questions(raw_text)
+                    if not items:
+                        print(f"⚠️ 题库生成结果无法解析，跳过：{subject}/{knowledge}")
+                        break
+                    self.add(subject, knowledge, config['model_name'], raw_text, items)
+                    print(f"✅ 题库已补充：{subject}/{knowledge}")
+            except Exception as e:
+                print(f"❌ 题库生成失败：{subject}/{knowledge}，{e}")
+                time.sleep(RETRY_DELAY)
+            finally:
+                with self._lock:
+                    self._pending.discard((subject, knowledge, config['model_name']))
+                self._queue.task_done()
@@ -42,7 +42,8 @@ def main():
 
     try:
         # 导入并运行Flask应用
-        from app import app, socketio
+        from app import app, socketio, start_question_bank
+        start_question_bank()
         socketio.run(app, host='127.0.0.1', port=8088, debug=False)
     except KeyboardInterrupt:
         print("\n? 服务器已停止")
@@ -1,19 +1,25 @@
 from flask import Flask, render_template, request, jsonify, send_from_directory
 import os
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 import json
+import math
 import sys
 import threading
 import time
+import urllib.request
 from datetime import datetime
 
+from student_roster import StudentRoster, DuplicateSnoError, DEFAULT_PAGE_SIZE
+from score_board import ScoreBoard, DEFAULT_TOP_K
+from score_fanout import ScoreFanout, room_name
+
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.insert(0, parent_dir)
 
 # 导入数据库连接器
 try:
-    from tools.connector import MySQLConnector
+    from tools.connector import MySQLConnector, PooledMySQLConnector
     from tools.config import DB_CONFIG
 
     DB_AVAILABLE = True
@@ -24,13 +30,17 @@ except ImportError as e:
 
 # 创建数据库连接实例
 db_connector = None
+# 事务专用：每个事务从连接池借出独立连接，不与其它请求共用 db_connector 的连接（eventlet 下共用会串入别的提交）
+db_pool = None
 try:
     if DB_AVAILABLE:
         db_connector = MySQLConnector(config=DB_CONFIG)
+        db_pool = PooledMySQLConnector(config=DB_CONFIG)
         print("数据库连接初始化成功")
 except Exception as e:
     print(f"数据库连接初始化失败：{e}")
     db_connector = None
+    db_pool = None
 
 detect_module = None
 rag_module = None
@@ -120,15 +130,29 @@ socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
 
 # 全局变量
 current_score = 0
-student_scores = {}
+# 课堂成绩榜：成绩更新时增量维护统计，看板接口直接读取
+score_board = ScoreBoard()
+# 各班级房间自己的成绩榜（房间名 -> ScoreBoard），默认房间直接使用全局成绩榜
+room_boards = {}
+_room_boards_lock = threading.Lock()
+
+
+def board_for(room):
+    if room == room_name():
+        return score_board
+    with _room_boards_lock:
+        return room_boards.setdefault(room, ScoreBoard())
+
+
+# 成绩/上线事件按班级房间合并，每 250ms 推送一次增量
+score_fanout = ScoreFanout(socketio, board_for)
 connected_students = {}
 
 
 # 添加一些模拟成绩数据用于演示
 def init_demo_data():
     """初始化演示数据"""
-    global student_scores
-    if not student_scores:  # 只在第一次调用时初始化
+    if not len(score_board):  # 只在第一次调用时初始化
         demo_scores = {
             'S001': 85,
             'S002': 92,
@@ -141,26 +165,27 @@ def init_demo_data():
             'S009': 87,
             'S010': 83
         }
-        student_scores.update(demo_scores)
-        print(f"已初始化 {len(student_scores)} 个学生的演示成绩数据")
+        for sno, score in demo_scores.items():
+            score_board.update(sno, score)
+        print(f"已初始化 {len(score_board)} 个学生的演示成绩数据")
 
 
+# 旧版学生名单文件，仅在名册为空时导入一次
 STUDENTS_FILE = 'students.json'
 
 
-def load_students():
-    """从文件加载学生数据"""
+
+def _student_roster_db():
+    """名册数据库路径：优先取全局配置，无法导入时使用项目 data 目录下的同名文件"""
     try:
-        with open(STUDENTS_FILE, 'r') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return []
+        from global_config import Global_Config
+        return Global_Config.student_roster_db
+    except ImportError:
+        return os.path.join(os.path.dirname(parent_dir), 'data', 'student_roster.db')
 
 
-def save_students(students):
-    """将学生数据保存到文件"""
-    with open(STUDENTS_FILE, 'w') as file:
-        json.dump(students, file)
+# 学生名册（SQLite，学号/姓名/班级带索引，分页查询、单行增删改）
+student_roster = StudentRoster(_student_roster_db(), legacy_file=STUDENTS_FILE)
 
 
 @app.route('/')
@@ -226,22 +251,19 @@ def get_teacher_info():
 
 @app.route('/api/students', methods=['GET'])
 def get_students():
-    """获取所有学生信息"""
-    students = load_students()
-    # 获取排序参数
+    """分页获取学生信息"""
     sort_by = request.args.get('sort_by', 'sno')  # 默认按学号排序
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int)
+    class_name = request.args.get('class_name') or None
 
-    # 实现排序逻辑
-    if sort_by == 'name':
-        students.sort(key=lambda x: x.get('name', ''))
-    elif sort_by == 'class':
-        students.sort(key=lambda x: x.get('class_name', ''))
-    else:  # 默认按学号排序
-        students.sort(key=lambda x: x.get('sno', ''))
-
+    students, total = student_roster.list(sort_by=sort_by, page=page, page_size=page_size,
+                                          class_name=class_name)
     return jsonify({
         'students': students,
-        'total': len(students)
+        'total': total,
+        'page': max(1, page),
+        'page_size': page_size
     })
 
 
@@ -259,25 +281,18 @@ def add_student():
             'message': '学号和姓名不能为空'
         }), 400
 
-    students = load_students()
-    # 检查学号是否已存在
-    if any(student['sno'] == sno for student in students):
+    try:
+        student_id = student_roster.add(sno, name, class_name)
+    except DuplicateSnoError:
         return jsonify({
             'success': False,
             'message': '学号已存在'
         }), 400
 
-    students.append({
-        'id': len(students) + 1,
-        'sno': sno,
-        'name': name,
-        'class_name': class_name  # 添加班级信息
-    })
-    save_students(students)
-
     return jsonify({
         'success': True,
-        'message': '学生添加成功'
+        'message': '学生添加成功',
+        'id': student_id
     })
 
 
@@ -331,6 +346,86 @@ def get_registration_requests():
         }), 500
 
 
+# 统一登录服务地址，账号变更后通知其刷新账号缓存
+LOGIN_SERVICE_URL = os.getenv("LOGIN_SERVICE_URL", "http://127.0.0.1:5000")
+
+
+def _internal_api_token():
+    """服务间内部接口的共享令牌：优先取全局配置，无法导入时读环境变量"""
+    try:
+        from global_config import Global_Config
+        return Global_Config.internal_api_token
+    except ImportError:
+        return os.getenv('INTERNAL_API_TOKEN', '')
+
+
+def notify_credentials_changed(user_nos):
+    """
+    通知登录服务使这些账号的缓存失效（审批通过、修改密码后调用）
+    后台发送，失败只记录日志，登录服务的缓存到期后也会自动失效
+    """
+    payload = json.dumps({'user_nos': [str(u) for u in user_nos]}).encode('utf-8')
+
+    def _send():
+        try:
+            req = urllib.request.Request(
+                f"{LOGIN_SERVICE_URL}/api/invalidate_credentials", data=payload,
+                headers={'Content-Type': 'application/json', 'X-Internal-Token': _internal_api_token()}
+            )
+            urllib.request.urlopen(req, timeout=3).close()
+        except Exception as e:
+            print(f"通知登录服务刷新账号缓存失败：{e}")
+
+    threading.Thread(target=_send, daemon=True).start()
+
+
+def _approve_registrations(user_ids):
+    """
+    在一个事务中批准一批注册请求：
+    写入 users 表 -> 写入 student/teacher 表 -> 删除 register 记录，任一步失败整体回滚
+    返回实际批准的 user_id 列表
+    """
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    with db_pool.transaction() as tx:
+        # 1. 从register表获取用户信息
+        rows = tx.query(
+            f"SELECT user_id, user_name, user_password, user_type FROM register WHERE user_id IN ({placeholders})",
+            tuple(user_ids)
+        )
+        if not rows:
+            return []
+
+        # 2. 写入users表（user_id作为user_no字段的值），取得自增ID
+        sql_add_user = "INSERT INTO users (user_no, password, role) VALUES (%s, %s, %s)"
+        if len(rows) == 1:
+            users_ids = {str(rows[0][0]): tx.execute(sql_add_user, (rows[0][0], rows[0][2], rows[0][3]))}
+        else:
+            tx.executemany(sql_add_user, [(row[0], row[2], row[3]) for row in rows])
+            user_nos = tuple(row[0] for row in rows)
+            users_ids = {
+                str(user_no): users_user_id
+                for user_no, users_user_id in tx.query(
+                    f"SELECT user_no, user_id FROM users WHERE user_no IN ({', '.join(['%s'] * len(user_nos))})",
+                    user_nos
+                )
+            }
+
+        # 3. 根据用户类型批量写入相应的表，包含user_id字段
+        students = [(row[0], row[1], row[2], users_ids[str(row[0])]) for row in rows if row[3] == 'student']
+        teachers = [(row[0], row[1], row[2], users_ids[str(row[0])]) for row in rows if row[3] != 'student']
+        tx.executemany("INSERT INTO student (sno, name, student_password, user_id) VALUES (%s, %s, %s, %s)", students)
+        tx.executemany("INSERT INTO teacher (tno, name, teacher_password, user_id) VALUES (%s, %s, %s, %s)", teachers)
+
+        # 4. 从register表中删除记录（因为已批准）
+        approved = [row[0] for row in rows]
+        tx.execute(
+            f"DELETE FROM register WHERE user_id IN ({', '.join(['%s'] * len(approved))})",
+            tuple(approved)
+        )
+    notify_credentials_changed(approved)
+    return approved
+
+
 @app.route('/api/approve_registration', methods=['POST'])
 def approve_registration():
     """批准注册请求"""
@@ -351,89 +446,57 @@ def approve_registration():
                 'message': '数据库连接不可用'
             }), 500
 
-        # 1. 从register表获取用户信息
-        sql_get_user = "SELECT user_id, user_name, user_password, user_type FROM register WHERE user_id = %s"
-        user_result = db_connector.query(sql_get_user, (user_id,))
-
-        if not user_result:
+        if not _approve_registrations([user_id]):
             return jsonify({
                 'success': False,
                 'message': '用户不存在'
             }), 404
 
-        user_data = user_result[0]
-
-        # 2. 先将用户信息插入到users表中
-        user_no = user_data[0]  # user_id作为user_no字段的值
-        password = user_data[2]
-        role = user_data[3]
+        return jsonify({
+            'success': True,
+            'message': '注册请求已批准'
+        })
+    except Exception as e:
+        print(f"批准注册请求失败：{e}")
+        return jsonify({
+            'success': False,
+            'message': f'批准注册请求失败：{str(e)}'
+        }), 500
 
-        sql_add_user = "INSERT INTO users (user_no, password, role) VALUES (%s, %s, %s)"
-        success = db_connector.execute(sql_add_user, (user_no, password, role))
 
-        if not success:
-            return jsonify({
-                'success': False,
-                'message': '添加用户到users表失败'
-            }), 500
+@app.route('/api/approve_registrations', methods=['POST'])
+def approve_registrations():
+    """批量批准注册请求（单个事务）"""
+    try:
+        data = request.get_json()
+        user_ids = data.get('user_ids') or []
 
-        # 获取刚刚插入到users表的自增ID
-        # 假设db_connector有一个方法可以获取最后插入的ID
-        try:
-            # 尝试使用MySQL特有的方法获取最后插入的ID
-            last_insert_id_result = db_connector.query("SELECT LAST_INSERT_ID()")
-            if last_insert_id_result and len(last_insert_id_result) > 0:
-                users_user_id = last_insert_id_result[0][0]
-            else:
-                # 如果无法获取，尝试通过user_no查询
-                sql_get_user_id = "SELECT user_id FROM users WHERE user_no = %s"
-                user_id_result = db_connector.query(sql_get_user_id, (user_no,))
-                if user_id_result and len(user_id_result) > 0:
-                    users_user_id = user_id_result[0][0]
-                else:
-                    raise Exception("无法获取插入的用户ID")
-        except Exception as e:
-            print(f"获取用户ID失败：{e}")
+        if not user_ids:
             return jsonify({
                 'success': False,
-                'message': f'获取用户ID失败：{str(e)}'
-            }), 500
-
-        # 3. 根据用户类型将用户添加到相应的表
-        if user_data[3] == 'student':
-            # 添加到student表，包含user_id字段
-            sql_add_student = "INSERT INTO student (sno, name, student_password, user_id) VALUES (%s, %s, %s, %s)"
-            success = db_connector.execute(sql_add_student, (user_data[0], user_data[1], user_data[2], users_user_id))
-        else:
-            # 添加到teacher表，包含user_id字段
-            sql_add_teacher = "INSERT INTO teacher (tno, name, teacher_password, user_id) VALUES (%s, %s, %s, %s)"
-            success = db_connector.execute(sql_add_teacher, (user_data[0], user_data[1], user_data[2], users_user_id))
+                'message': '用户ID列表不能为空'
+            }), 400
 
-        if not success:
+        # 检查数据库连接
+        if not DB_AVAILABLE or db_connector is None:
             return jsonify({
                 'success': False,
-                'message': '添加用户到正式表失败'
+                'message': '数据库连接不可用'
             }), 500
 
-        # 4. 从register表中删除记录（因为已批准）
-        sql_delete = "DELETE FROM register WHERE user_id = %s"
-        success = db_connector.execute(sql_delete, (user_id,))
-
-        if not success:
-            return jsonify({
-                'success': False,
-                'message': '更新注册状态失败'
-            }), 500
+        approved = _approve_registrations(user_ids)
 
         return jsonify({
             'success': True,
-            'message': '注册请求已批准'
+            'approved': approved,
+            'total': len(approved),
+            'message': f'已批准 {len(approved)} 个注册请求'
         })
     except Exception as e:
-        print(f"批准注册请求失败：{e}")
+        print(f"批量批准注册请求失败：{e}")
         return jsonify({
             'success': False,
-            'message': f'批准注册请求失败：{str(e)}'
+            'message': f'批量批准注册请求失败：{str(e)}'
         }), 500
 
 
@@ -482,13 +545,12 @@ def reject_registration():
 
 @app.route('/api/student/<int:student_id>', methods=['DELETE'])
 def delete_student(student_id):
-    """删除学生"""
-    students = load_students()
-    students = [student for student in students if student['id'] != student_id]
-    # 重新分配ID以保持连续性
-    for i, student in enumerate(students):
-        student['id'] = i + 1
-    save_students(students)
+    """删除学生（其余学生 id 不变）"""
+    if not student_roster.delete(student_id):
+        return jsonify({
+            'success': False,
+            'message': '学生不存在'
+        }), 404
 
     return jsonify({
         'success': True,
@@ -511,38 +573,20 @@ def edit_student(student_id):
             'message': '学号和姓名不能为空'
         }), 400
 
-    students = load_students()
-
-    # 查找要编辑的学生
-    student_index = None
-    for i, student in enumerate(students):
-        if student['id'] == student_id:
-            student_index = i
-            break
+    try:
+        updated = student_roster.update(student_id, sno_new, name, class_name)
+    except DuplicateSnoError:
+        return jsonify({
+            'success': False,
+            'message': '学号已存在'
+        }), 400
 
-    if student_index is None:
+    if not updated:
         return jsonify({
             'success': False,
             'message': '学生不存在'
         }), 404
 
-    # 检查学号是否已存在
-    for student in students:
-        if student['sno'] == sno_new and student['id'] != student_id:
-            return jsonify({
-                'success': False,
-                'message': '学号已存在'
-            }), 400
-
-    # 更新学生信息
-    students[student_index].update({
-        'sno': sno_new,
-        'name': name,
-        'class_name': class_name
-    })
-
-    save_students(students)
-
     return jsonify({
         'success': True,
         'message': '学生信息更新成功'
@@ -553,9 +597,9 @@ def edit_student(student_id):
 def get_student_score(sno):
     """获取特定学生的成绩"""
     # 确保在需要时初始化演示数据
-    if not student_scores:
+    if not len(score_board):
         init_demo_data()
-    score = student_scores.get(sno, 0)
+    score = score_board.get(sno, 0)
     return jsonify({
         'sno': sno,
         'score': score
@@ -564,31 +608,27 @@ def get_student_score(sno):
 
 @app.route('/api/get_score_summary', methods=['GET'])
 def get_score_summary():
-    """获取成绩统计摘要"""
+    """获取成绩统计摘要（增量维护，O(1) 读取）"""
     # 确保在需要时初始化演示数据
-    if not student_scores:
+    if not len(score_board):
         init_demo_data()
 
-    if not student_scores:
-        return jsonify({
-            'success': True,
-            'summary': {
-                'average': 0,
-                'highest': 0,
-                'lowest': 0,
-                'total': 0
-            }
-        })
+    return jsonify({
+        'success': True,
+        'summary': score_board.summary()
+    })
 
-    scores = list(student_scores.values())
+
+@app.route('/api/get_leaderboard', methods=['GET'])
+def get_leaderboard():
+    """获取成绩排行榜前 k 名"""
+    if not len(score_board):
+        init_demo_data()
+    k = request.args.get('k', DEFAULT_TOP_K, type=int)
     return jsonify({
         'success': True,
-        'summary': {
-            'average': round(sum(scores) / len(scores), 1),
-            'highest': max(scores),
-            'lowest': min(scores),
-            'total': len(scores)
-        }
+        'leaderboard': score_board.top(max(0, min(k, 100))),
+        'version': score_board.version
     })
 
 
@@ -596,7 +636,7 @@ def get_score_summary():
 def get_students_scores():
     """获取所有学生成绩列表"""
     # 确保在需要时初始化演示数据
-    if not student_scores:
+    if not len(score_board):
         init_demo_data()
 
     # 基础学生信息
@@ -641,7 +681,7 @@ def get_students_scores():
     students_data = []
     for student in base_students:
         student_id = student['id']
-        score = student_scores.get(student_id, 0)  # 从实际成绩数据中获取分数
+        score = score_board.get(student_id, 0)  # 从实际成绩数据中获取分数
         student['score'] = score
         student['weak_points'] = student_weak_points.get(student_id, [])  # 添加错误知识点
         students_data.append(student)
@@ -654,22 +694,14 @@ def get_students_scores():
 
 @app.route('/api/get_score_distribution', methods=['GET'])
 def get_score_distribution():
-    """获取成绩分布数据"""
+    """获取成绩分布数据（各分数段人数随成绩更新增量维护）"""
     # 确保在需要时初始化演示数据
-    if not student_scores:
+    if not len(score_board):
         init_demo_data()
 
-    distribution = [
-        {'range': '90-100分', 'count': 3},
-        {'range': '80-89分', 'count': 4},
-        {'range': '70-79分', 'count': 2},
-        {'range': '60-69分', 'count': 1},
-        {'range': '0-59分', 'count': 0}
-    ]
-
     return jsonify({
         'success': True,
-        'distribution': distribution
+        'distribution': score_board.distribution()
     })
 
 
@@ -721,29 +753,14 @@ def create_exam():
             teacher_id
         )
 
-        success = db_connector.execute(sql, params)
+        exam_id = db_connector.insert(sql, params)
 
-        if not success:
+        if exam_id is None:
             return jsonify({
                 'success': False,
                 'message': '创建考试失败'
             }), 500
 
-        # 获取刚刚插入的考试ID
-        try:
-            # 尝试使用MySQL的LAST_INSERT_ID()函数获取最后插入的ID
-            last_insert_id_result = db_connector.query("SELECT LAST_INSERT_ID()")
-            if last_insert_id_result and len(last_insert_id_result) > 0:
-                exam_id = last_insert_id_result[0][0]
-            else:
-                raise Exception("无法获取插入的考试ID")
-        except Exception as e:
-            print(f"获取考试ID失败：{e}")
-            return jsonify({
-                'success': False,
-                'message': f'获取考试ID失败：{str(e)}'
-            }), 500
-
         return jsonify({
             'success': True,
             'exam_id': exam_id,
@@ -887,6 +904,91 @@ def handle_disconnect():
     print(f"教师 {teacher_id} 已断开连接")
 
 
+# 考台上报去重：(考台, 启动标识) -> 已处理的最大序号
+_bench_seq = {}
+_bench_seq_lock = threading.Lock()
+
+
+def _parse_score(score):
+    """成绩转为有限数值，无法转换或为 NaN/Infinity 时返回 None"""
+    try:
+        score = float(score)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(score):
+        return None
+    return int(score) if score.is_integer() else score
+
+
+def _apply_score(sno, score, room):
+    """写入成绩榜，有变化时合并推送给教师端；成绩无效时返回 False"""
+    score = _parse_score(score)
+    if score is None:
+        return False
+    _, changed = score_board.update(sno, score)
+    if room != room_name():
+        _, room_changed = board_for(room).update(sno, score)
+        changed = changed or room_changed
+    if changed:
+        score_fanout.push_score(room, sno, score)
+    return True
+
+
+@app.route('/api/bench/events', methods=['POST'])
+def receive_bench_events():
+    """接收考台批量上报的成绩/接线事件，重复事件（重试造成）按序号丢弃"""
+    data = request.get_json(silent=True) or {}
+    bench_id = data.get('bench_id')
+    events = data.get('events') or []
+    if not bench_id:
+        return jsonify({'success': False, 'message': '缺少考台标识'}), 400
+    if not isinstance(events, list) or not all(isinstance(e, dict) for e in events):
+        return jsonify({'success': False, 'message': '事件格式错误'}), 400
+
+    # 序号用于去重，缺少序号的事件无法判断是否重复，整批拒绝而不是静默丢弃
+    no_seq = [i for i, e in enumerate(events)
+              if not isinstance(e.get('seq'), int) or isinstance(e.get('seq'), bool) or e['seq'] <= 0]
+    if no_seq:
+        return jsonify({'success': False, 'message': f'事件缺少有效序号，位置: {no_seq}'}), 400
+
+    invalid = [e.get('seq') for e in events
+               if e.get('score') is not None and _parse_score(e['score']) is None]
+    if invalid:
+        return jsonify({'success': False, 'message': f'成绩必须是有限数值，序号: {invalid}'}), 400
+
+    key = (bench_id, data.get('boot_id'))
+    room = room_name(data.get('class_id') or data.get('exam_id'))
+    with _bench_seq_lock:
+        last_seq = _bench_seq.get(key, 0)
+        fresh = [e for e in sorted(events, key=lambda e: e['seq']) if e['seq'] > last_seq]
+        if fresh:
+            _bench_seq[key] = fresh[-1]['seq']
+
+    for event in fresh:
+        sno = event.get('sno')
+        if not sno:
+            continue
+        if event.get('type') == 'wiring':
+            score_fanout.push_wiring(room, sno, event.get('add') or [], event.get('undo') or [])
+        if event.get('score') is not None:
+            _apply_score(sno, event['score'], room)
+
+    return jsonify({'success': True, 'accepted': len(fresh), 'last_seq': _bench_seq.get(key, 0)})
+
+
+@socketio.on('join_class')
+def handle_join_class(data):
+    """教师端加入班级/考试房间，只接收该房间的成绩增量"""
+    data = data or {}
+    room = room_name(data.get('class_id') or data.get('exam_id'))
+    for joined in rooms():
+        if joined.startswith('class:') and joined != room:
+            leave_room(joined)
+    join_room(room)
+    board = board_for(room)
+    emit('class_joined', {'room': room, 'summary': board.summary(), 'version': board.version})
+
+
 @socketio.on('student_connect')
 def handle_student_connect(data):
     """处理学生连接事件"""
@@ -899,8 +1001,9 @@ def handle_student_connect(data):
             'connected_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         print(f"学生 {sno} ({student_name}) 已连接")
-        # 广播给所有教师客户端
-        socketio.emit('student_connected', connected_students[sno])
+        # 合并后推送给该班级房间的教师端
+        score_fanout.push_connected(room_name(data.get('class_id') or data.get('exam_id')),
+                                    sno, student_name, connected_students[sno]['connected_at'])
 
 
 @socketio.on('update_score')
@@ -909,13 +1012,9 @@ def handle_update_score(data):
     sno = data.get('sno')
     score = data.get('score')
     if sno and score is not None:
-        student_scores[sno] = score
-        print(f"更新学生 {sno} 的成绩为 {score}")
-        # 广播给所有教师客户端
-        socketio.emit('score_updated', {
-            'sno': sno,
-            'score': score
-        })
+        # 合并后推送给该班级房间的教师端
+        if not _apply_score(sno, score, room_name(data.get('class_id') or data.get('exam_id'))):
+            emit('score_rejected', {'sno': sno, 'message': '成绩必须是有限数值'})
 
 
 @app.route('/api/rule-server/start', methods=['POST'])
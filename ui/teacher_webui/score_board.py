@@ -0,0 +1,104 @@
+# score_board.py
+"""
+课堂成绩榜
+每次成绩更新时增量维护人数、总分、最高/最低分、分数段人数和有序成绩表，
+看板接口直接读取聚合结果，不再每次遍历全部学生重新统计
+"""
+
+import bisect
+import math
+import threading
+
+# 分数段（与看板展示一致），按下限从高到低
+SCORE_BUCKETS = [
+    ('90-100分', 90),
+    ('80-89分', 80),
+    ('70-79分', 70),
+    ('60-69分', 60),
+    ('0-59分', float('-inf')),
+]
+DEFAULT_TOP_K = 10
+
+
+def bucket_of(score):
+    for index, (_, lower) in enumerate(SCORE_BUCKETS):
+        if score >= lower:
+            return index
+    return len(SCORE_BUCKETS) - 1
+
+
+class ScoreBoard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scores = {}                          # 学号 -> 成绩
+        self._ranked = []                          # 按 (成绩, 学号) 升序的有序表
+        self._sum = 0
+        self._buckets = [0] * len(SCORE_BUCKETS)
+        self.version = 0                           # 每次变化加一，便于客户端判断是否需要刷新
+
+    def __len__(self):
+        return len(self._scores)
+
+    def update(self, sno, score):
+        """
+        写入一个学生的最新成绩（二分查找定位，替换旧成绩）
+        返回 (旧成绩或 None, 是否有变化)
+        成绩必须是有限数值：NaN 无法参与比较，会破坏有序表的二分查找
+        """
+        if not math.isfinite(score):
+            raise ValueError(f"成绩必须是有限数值: {score!r}")
+        sno = str(sno)
+        with self._lock:
+            old = self._scores.get(sno)
+            if old == score:
+                return old, False
+            if old is not None:
+                del self._ranked[bisect.bisect_left(self._ranked, (old, sno))]
+                self._sum -= old
+                self._buckets[bucket_of(old)] -= 1
+            bisect.insort(self._ranked, (score, sno))
+            self._scores[sno] = score
+            self._sum += score
+            self._buckets[bucket_of(score)] += 1
+            self.version += 1
+            return old, True
+
+    def remove(self, sno):
+        sno = str(sno)
+        with self._lock:
+            old = self._scores.pop(sno, None)
+            if old is None:
+                return False
+            del self._ranked[bisect.bisect_left(self._ranked, (old, sno))]
+            self._sum -= old
+            self._buckets[bucket_of(old)] -= 1
+            self.version += 1
+            return True
+
+    def get(self, sno, default=0):
+        return self._scores.get(str(sno), default)
+
+    def summary(self):
+        """平均分、最高分、最低分、人数"""
+        with self._lock:
+            total = len(self._ranked)
+            if not total:
+                return {'average': 0, 'highest': 0, 'lowest': 0, 'total': 0}
+            return {
+                'average': round(self._sum / total, 1),
+                'highest': self._ranked[-1][0],
+                'lowest': self._ranked[0][0],
+                'total': total
+            }
+
+    def distribution(self):
+        """各分数段人数"""
+        with self._lock:
+            counts = list(self._buckets)
+        return [{'range': label, 'count': count} for (label, _), count in zip(SCORE_BUCKETS, counts)]
+
+    def top(self, k=DEFAULT_TOP_K):
+        """成绩前 k 名（同分时学号大的在前）"""
+        with self._lock:
+            tail = self._ranked[-k:] if k > 0 else []
+        return [{'rank': i + 1, 'sno': sno, 'score': score} for i, (score, sno) in enumerate(reversed(tail))]
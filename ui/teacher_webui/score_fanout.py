@@ -0,0 +1,100 @@
+# score_fanout.py
+"""
+成绩推送合并器
+考台上报的成绩/上线事件先按房间（班级或考试）暂存，每个窗口期（默认 250ms）
+每个房间只推送一条合并后的增量消息，且只发给加入该房间的教师端，
+不再每个事件都广播给所有连接
+- 班级房间的统计来自该班级自己的成绩榜
+- 默认房间是全部考台的总览：所有房间的事件都会合并进来，统计来自全局成绩榜
+
+增量消息格式（键名尽量短）：
+    {
+        "r": 房间名,
+        "v": 成绩榜版本号,
+        "s": [[学号, 成绩], ...],              # 窗口内每个学生只保留最后一次成绩
+        "c": [[学号, 姓名, 上线时间], ...],     # 新上线的考台
+        "w": [[学号, 新增触点对, 撤回触点对], ...], # 考台上报的接线变化
+        "a": [平均分, 最高分, 最低分, 人数],    # 该房间的统计
+        "d": [各分数段人数, ...]                # 与 /api/get_score_distribution 顺序一致
+    }
+"""
+
+import threading
+
+FANOUT_WINDOW = 0.25
+DEFAULT_ROOM = 'default'
+DELTA_EVENT = 'score_delta'
+
+
+def room_name(room_id=None):
+    return f"class:{room_id or DEFAULT_ROOM}"
+
+
+class ScoreFanout:
+    def __init__(self, socketio, board_for, window=FANOUT_WINDOW):
+        """board_for(room) 返回该房间的成绩榜"""
+        self.socketio = socketio
+        self.board_for = board_for
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = {}      # 房间 -> {"s": {学号: 成绩}, "c": [...]}
+        self._task = None
+
+    def _room_pending(self, room):
+        """该房间及总览房间的待推送增量（调用方需持有锁）"""
+        targets = {room, room_name()}
+        return [self._pending.setdefault(r, {'s': {}, 'c': [], 'w': []}) for r in targets]
+
+    def push_score(self, room, sno, score):
+        with self._lock:
+            for pending in self._room_pending(room):
+                pending['s'][str(sno)] = score
+        self._ensure_task()
+
+    def push_connected(self, room, sno, student_name, connected_at):
+        with self._lock:
+            for pending in self._room_pending(room):
+                pending['c'].append([str(sno), student_name, connected_at])
+        self._ensure_task()
+
+    def push_wiring(self, room, sno, add_pairs, undo_pairs):
+        with self._lock:
+            for pending in self._room_pending(room):
+                pending['w'].append([str(sno), add_pairs, undo_pairs])
+        self._ensure_task()
+
+    def _ensure_task(self):
+        with self._lock:
+            if self._task is None:
+                self._task = self.socketio.start_background_task(self._flush_loop)
+
+    def _flush_loop(self):
+        while True:
+            self.socketio.sleep(self.window)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"推送成绩增量失败：{e}")
+
+    def flush(self):
+        """发出每个房间在本窗口内累积的增量"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        for room, delta in pending.items():
+            board = self.board_for(room)
+            summary = board.summary()
+            payload = {
+                'r': room,
+                'v': board.version,
+                'a': [summary['average'], summary['highest'], summary['lowest'], summary['total']],
+                'd': [bucket['count'] for bucket in board.distribution()],
+            }
+            if delta['s']:
+                payload['s'] = [[sno, score] for sno, score in delta['s'].items()]
+            if delta['c']:
+                payload['c'] = delta['c']
+            if delta['w']:
+                payload['w'] = delta['w']
+            self.socketio.emit(DELTA_EVENT, payload, to=room)
@@ -0,0 +1,133 @@
+# student_roster.py
+"""
+教师端学生名册
+存放在本地 SQLite，学号唯一索引，姓名、班级建有索引；
+列表查询在库内排序分页，增删改只影响单行，不再每次读写整个 students.json
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# 排序字段 -> ORDER BY 子句（学号作为次序键保证分页稳定）
+SORT_COLUMNS = {
+    'sno': 'sno',
+    'name': 'name, sno',
+    'class': 'class_name, sno',
+}
+
+
+class DuplicateSnoError(Exception):
+    """学号已存在"""
+
+
+class StudentRoster:
+    def __init__(self, db_path, legacy_file=None):
+        """
+        db_path: SQLite 文件路径（通常为 Global_Config.student_roster_db）
+        legacy_file: 旧版 students.json，名册为空时一次性导入
+        """
+        self.db_path = str(db_path)
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._init_db()
+        if legacy_file:
+            self._import_legacy(legacy_file)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS students (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sno TEXT NOT NULL UNIQUE,
+                    name TEXT NOT NULL,
+                    class_name TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_students_name ON students (name, sno)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_students_class ON students (class_name, sno)")
+
+    def _import_legacy(self, legacy_file):
+        if not os.path.exists(legacy_file) or self.count():
+            return
+        try:
+            with open(legacy_file, 'r') as f:
+                students = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 读取旧版学生名单失败：{e}")
+            return
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO students (sno, name, class_name) VALUES (?, ?, ?)",
+                [(str(s['sno']), s.get('name', ''), s.get('class_name', '')) for s in students if s.get('sno')]
+            )
+        print(f"✅ 已从 {legacy_file} 导入 {len(students)} 名学生")
+
+    # ---------- 查询 ----------
+    def count(self, class_name=None):
+        with self._connect() as conn:
+            if class_name:
+                return conn.execute("SELECT COUNT(*) FROM students WHERE class_name = ?", (class_name,)).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+
+    def list(self, sort_by='sno', page=1, page_size=DEFAULT_PAGE_SIZE, class_name=None):
+        """
+        排序分页查询，可按班级筛选
+        返回 (当前页学生列表, 总数)
+        """
+        order = SORT_COLUMNS.get(sort_by, SORT_COLUMNS['sno'])
+        page = max(1, int(page))
+        page_size = min(max(1, int(page_size)), MAX_PAGE_SIZE)
+        where, params = ("WHERE class_name = ?", [class_name]) if class_name else ("", [])
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, sno, name, class_name FROM students {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size]
+            ).fetchall()
+        return [dict(row) for row in rows], self.count(class_name)
+
+    def get(self, student_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, sno, name, class_name FROM students WHERE id = ?", (student_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    # ---------- 修改 ----------
+    def add(self, sno, name, class_name=''):
+        """添加学生，返回新 id；学号重复时抛出 DuplicateSnoError"""
+        try:
+            with self._lock, self._connect() as conn:
+                cur = conn.execute(
+                    "INSERT INTO students (sno, name, class_name) VALUES (?, ?, ?)", (str(sno), name, class_name)
+                )
+                return cur.lastrowid
+        except sqlite3.IntegrityError:
+            raise DuplicateSnoError(sno)
+
+    def update(self, student_id, sno, name, class_name=''):
+        """更新单个学生，返回是否存在；学号与其他学生重复时抛出 DuplicateSnoError"""
+        try:
+            with self._lock, self._connect() as conn:
+                cur = conn.execute(
+                    "UPDATE students SET sno = ?, name = ?, class_name = ? WHERE id = ?",
+                    (str(sno), name, class_name, student_id)
+                )
+                return cur.rowcount > 0
+        except sqlite3.IntegrityError:
+            raise DuplicateSnoError(sno)
+
+    def delete(self, student_id):
+        """删除单个学生，返回是否存在；其余学生的 id 保持不变"""
+        with self._lock, self._connect() as conn:
+            return conn.execute("DELETE FROM students WHERE id = ?", (student_id,)).rowcount > 0